@@ -0,0 +1,141 @@
+"""
+Agrégats d'une analyse VisionTrack, précalculés à la fin de l'analyse
+À partir des boxes de la zone (colonnes de tracks.py), en opérations vectorisées :
+- occupation de la zone seconde par seconde (maximum et moyenne de personnes par
+  frame, personnes suivies distinctes) ;
+- résumé par track (premier et dernier frame, temps de présence, passages) ;
+- événements d'entrée et de sortie de la zone.
+Les tableaux de bord lisent ces agrégats au lieu de parcourir les boxes frame par frame.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from tracks import NO_TRACK_ID, TrackTable
+
+
+def aggregate(table: TrackTable, fps: float, total_frames: Optional[int],
+              min_track_seconds: float, exit_grace_seconds: float) -> Dict:
+    """
+    Agrégats des boxes d'une zone
+
+    Args:
+        table: Boxes retenues dans la zone
+        fps: FPS de la vidéo
+        total_frames: Nombre de frames de la vidéo (déduit du dernier frame détecté si absent)
+        min_track_seconds: Présence minimale d'un track compté (même seuil que les statistiques)
+        exit_grace_seconds: Absence tolérée avant de considérer qu'une personne est sortie
+            (boxes manquées par le détecteur, occlusions)
+    """
+    fps = fps or 30.0
+    frame = np.asarray(table.frame, dtype=np.int64)
+    track_id = np.asarray(table.track_id, dtype=np.int64)
+    total_frames = max(total_frames or 0, int(frame.max()) + 1 if len(frame) else 0)
+    min_track_frames = max(1, round(min_track_seconds * fps))
+    exit_grace_frames = max(1, round(exit_grace_seconds * fps))
+
+    return {
+        "fps": fps,
+        "total_frames": total_frames,
+        "min_track_frames": min_track_frames,
+        "exit_grace_frames": exit_grace_frames,
+        "occupancy": occupancy_per_second(frame, track_id, fps, total_frames),
+        **track_summaries(frame, track_id, fps, min_track_frames, exit_grace_frames),
+    }
+
+
+def occupancy_per_second(frame: np.ndarray, track_id: np.ndarray, fps: float, total_frames: int) -> Dict:
+    """Personnes dans la zone pour chaque seconde de la vidéo (frame n dans la seconde floor(n / fps))"""
+    if total_frames == 0:
+        return {"seconds": 0, "max_people": [], "mean_people": [], "tracks": []}
+
+    people_per_frame = np.bincount(frame, minlength=total_frames)
+    second_of_frame = np.floor(np.arange(total_frames) / fps).astype(np.int64)
+    seconds = int(second_of_frame[-1]) + 1
+    # Sous 1 fps, certaines secondes ne contiennent aucun frame : elles valent 0
+    frames_per_second = np.bincount(second_of_frame, minlength=seconds)
+    people_per_second = np.bincount(second_of_frame, weights=people_per_frame, minlength=seconds)
+    max_people = np.zeros(seconds, dtype=np.int64)
+    np.maximum.at(max_people, second_of_frame, people_per_frame)
+    mean_people = np.divide(people_per_second, frames_per_second,
+                            out=np.zeros(seconds), where=frames_per_second > 0)
+
+    # Personnes suivies distinctes : couples (seconde, track_id) uniques
+    tracked = track_id != NO_TRACK_ID
+    tracks_per_second = np.zeros(seconds, dtype=np.int64)
+    if tracked.any():
+        id_span = int(track_id[tracked].max()) + 1
+        pairs = np.unique(second_of_frame[frame[tracked]] * id_span + track_id[tracked])
+        tracks_per_second = np.bincount(pairs // id_span, minlength=seconds)
+
+    return {
+        "seconds": seconds,
+        "max_people": max_people.tolist(),
+        "mean_people": np.round(mean_people, 3).tolist(),
+        "tracks": tracks_per_second.tolist(),
+    }
+
+
+def track_summaries(frame: np.ndarray, track_id: np.ndarray, fps: float,
+                    min_track_frames: int, exit_grace_frames: int) -> Dict:
+    """
+    Résumé par track et événements d'entrée / sortie
+
+    Un passage est une suite de présences d'un track sans absence de plus de
+    exit_grace_frames frames : il commence par une entrée et finit par une sortie.
+    Seuls les tracks comptés (présents au moins min_track_frames frames) produisent
+    des événements ; une personne déjà présente au premier frame (ou encore
+    présente au dernier) a son entrée (sa sortie) à ce frame.
+    """
+    tracked = track_id != NO_TRACK_ID
+    order = np.lexsort((frame[tracked], track_id[tracked]))
+    frames = frame[tracked][order]
+    tracks = track_id[tracked][order]
+    if len(frames) == 0:
+        return {"tracks": [], "events": []}
+
+    # Limites des tracks, puis des passages (nouveau track ou absence trop longue)
+    new_track = np.concatenate(([True], tracks[1:] != tracks[:-1]))
+    new_visit = new_track | np.concatenate(([True], np.diff(frames) > exit_grace_frames))
+    track_starts = np.flatnonzero(new_track)
+    track_ends = np.append(track_starts[1:], len(frames)) - 1
+    visit_starts = np.flatnonzero(new_visit)
+    visit_ends = np.append(visit_starts[1:], len(frames)) - 1
+
+    present_frames = track_ends - track_starts + 1
+    counted = present_frames >= min_track_frames
+    visits = np.add.reduceat(new_visit.astype(np.int64), track_starts)
+
+    summaries = [
+        {
+            "track_id": track,
+            "first_frame": first,
+            "last_frame": last,
+            "first_seen": round(first / fps, 3),
+            "last_seen": round(last / fps, 3),
+            "frames": present,
+            "dwell_seconds": round(present / fps, 3),
+            "visits": visit_count,
+            "counted": is_counted,
+        }
+        for track, first, last, present, visit_count, is_counted in zip(
+            tracks[track_starts].tolist(), frames[track_starts].tolist(), frames[track_ends].tolist(),
+            present_frames.tolist(), visits.tolist(), counted.tolist())
+    ]
+
+    # Événements des passages des tracks comptés, triés par frame puis track (entrée avant sortie)
+    counted_tracks = tracks[track_starts][counted]
+    visit_counted = np.isin(tracks[visit_starts], counted_tracks)
+    event_frames = np.concatenate((frames[visit_starts][visit_counted], frames[visit_ends][visit_counted]))
+    event_tracks = np.concatenate((tracks[visit_starts][visit_counted], tracks[visit_ends][visit_counted]))
+    is_entry = np.repeat([True, False], int(visit_counted.sum()))
+    event_order = np.lexsort((~is_entry, event_tracks, event_frames))
+
+    events = [
+        {"type": "entry" if entry else "exit", "track_id": track, "frame": event_frame,
+         "time": round(event_frame / fps, 3)}
+        for entry, track, event_frame in zip(is_entry[event_order].tolist(), event_tracks[event_order].tolist(),
+                                             event_frames[event_order].tolist())
+    ]
+    return {"tracks": summaries, "events": events}
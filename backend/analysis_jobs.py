@@ -0,0 +1,121 @@
+"""
+Suivi des analyses asynchrones du backend VisionTrack
+Registre en mémoire des jobs d'analyse et diffusion de leur progression
+(Server-Sent Events) aux clients abonnés
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+
+# Statuts possibles d'une analyse
+ANALYSIS_QUEUED = "queued"
+ANALYSIS_RUNNING = "running"
+ANALYSIS_COMPLETED = "completed"
+ANALYSIS_FAILED = "failed"
+
+TERMINAL_STATUSES = {ANALYSIS_COMPLETED, ANALYSIS_FAILED}
+
+# Intervalle d'envoi d'un commentaire SSE pour garder la connexion ouverte
+SSE_KEEPALIVE_SECONDS = 15.0
+
+
+class AnalysisJobRegistry:
+    """
+    Registre des analyses en cours et terminées
+
+    Chaque mise à jour est poussée dans les files asyncio des abonnés :
+    un flux SSE ne coûte qu'une coroutine en attente, pas une requête HTTP
+    ouverte vers le service IA.
+    """
+
+    def __init__(self, retention: int = 200):
+        self.retention = retention
+        self._jobs: Dict[str, Dict] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._tasks = set()
+
+    def create(self, video_id: str) -> Dict:
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "video_id": video_id,
+            "status": ANALYSIS_QUEUED,
+            "created_at": time.time(),
+            "finished_at": None,
+            "ia_job_id": None,
+            "progress": {"frame": 0, "total_frames": 0, "percent": 0.0},
+            "stats": None,
+            "error": None,
+        }
+        self._jobs[job["job_id"]] = job
+        self._prune()
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self._jobs.get(job_id)
+
+    def run(self, job: Dict, coroutine) -> None:
+        """Lance la coroutine d'analyse en tâche de fond (référence conservée jusqu'à la fin)"""
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+
+        def on_done(finished: asyncio.Task) -> None:
+            self._tasks.discard(finished)
+            # Filet de sécurité : une exception imprévue ne doit pas laisser le job "running"
+            if not finished.cancelled() and finished.exception() and job["status"] not in TERMINAL_STATUSES:
+                print(f"ERREUR : Analyse {job['job_id']} interrompue - {finished.exception()}")
+                self.update(job, status=ANALYSIS_FAILED, error={
+                    "status_code": 500,
+                    "detail": f"Erreur interne du serveur : {finished.exception()}",
+                })
+
+        task.add_done_callback(on_done)
+
+    def update(self, job: Dict, **changes) -> None:
+        """Applique des changements au job et notifie les abonnés"""
+        job.update(changes)
+        if job["status"] in TERMINAL_STATUSES and job["finished_at"] is None:
+            job["finished_at"] = time.time()
+
+        for subscriber in self._subscribers.get(job["job_id"], []):
+            subscriber.put_nowait(dict(job))
+
+    async def events(self, job_id: str) -> AsyncIterator[str]:
+        """
+        Générateur de messages SSE pour un job
+
+        Envoie l'état courant, puis chaque mise à jour, et se termine
+        quand le job atteint un statut final.
+        """
+        job = self._jobs[job_id]
+        subscriber: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, []).append(subscriber)
+
+        try:
+            state = dict(job)
+            yield _format_sse(state)
+
+            while state["status"] not in TERMINAL_STATUSES:
+                try:
+                    state = await asyncio.wait_for(subscriber.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _format_sse(state)
+        finally:
+            self._subscribers[job_id].remove(subscriber)
+            if not self._subscribers[job_id]:
+                del self._subscribers[job_id]
+
+    def _prune(self) -> None:
+        """Oublie les jobs terminés les plus anciens au-delà de la rétention"""
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in TERMINAL_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
+
+
+def _format_sse(state: Dict) -> str:
+    """Formate un état de job en message SSE"""
+    return f"data: {json.dumps(state)}\n\n"
@@ -0,0 +1,136 @@
+"""
+Benchmarks du backend VisionTrack
+
+Usage (dans le conteneur backend) :
+    python benchmark.py storage --minutes 10 --people 8
+
+Les détections sont synthétiques (personnes en mouvement, un track_id par
+personne) : seules leur quantité et leur forme comptent pour le stockage.
+"""
+
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+from tracks import TrackTable, zone_mask, zone_statistics
+
+
+def synthetic_detections(frames: int, people: int, seed: int = 0) -> List[Dict]:
+    """Détections au format du service IA : `people` personnes suivies sur chaque frame"""
+    rng = np.random.default_rng(seed)
+    start = rng.uniform([0, 0], [1700, 900], size=(people, 2))
+    speed = rng.uniform(-2, 2, size=(people, 2))
+    confidence = rng.uniform(0.3, 0.95, size=(frames, people))
+
+    detections = []
+    for frame in range(frames):
+        position = (start + speed * frame) % [1700, 900]
+        detections.append({
+            "frame": frame,
+            "boxes": [
+                {
+                    "x1": float(x), "y1": float(y), "x2": float(x + 60), "y2": float(y + 160),
+                    "confidence": float(confidence[frame, person]), "track_id": person + 1
+                }
+                for person, (x, y) in enumerate(position)
+            ]
+        })
+    return detections
+
+
+def timed(function: Callable, repeat: int) -> Tuple[float, object]:
+    """Meilleur temps (ms) sur `repeat` appels, et le résultat du dernier"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def directory_size(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.iterdir())
+
+
+def bench_storage(args) -> None:
+    """Taille, écriture et lecture : JSON indenté (ancien format) vs colonnes .npy mappées"""
+    frames = int(args.minutes * 60 * args.fps)
+    detections = synthetic_detections(frames, args.people)
+    zone = {"x1": 400, "y1": 200, "x2": 1200, "y2": 800}
+    print(f"\n{frames} frames ({args.minutes} min à {args.fps} FPS), {frames * args.people} boxes")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        json_path = Path(work_dir) / "results.json"
+        tracks_dir = Path(work_dir) / "tracks"
+
+        def write_json():
+            with open(json_path, "w") as f:
+                json.dump({"detections": detections}, f, indent=2)
+
+        def load_json():
+            with open(json_path, "r") as f:
+                return json.load(f)["detections"]
+
+        table = TrackTable.from_detections(detections)
+        json_write, _ = timed(write_json, args.repeat)
+        npy_write, _ = timed(lambda: table.save(tracks_dir), args.repeat)
+
+        json_load, _ = timed(load_json, args.repeat)
+        npy_load, _ = timed(lambda: TrackTable.load(tracks_dir), args.repeat)
+
+        # Statistiques d'une zone : ce que fait /results/{id}/zones
+        def zone_stats():
+            tracks = TrackTable.load(tracks_dir)
+            return zone_statistics(tracks.select(zone_mask(tracks, zone)), args.fps, 0.67)
+
+        npy_stats, _ = timed(zone_stats, args.repeat)
+
+        # Réponse complète de GET /results : lecture + sérialisation
+        json_endpoint, old_body = timed(lambda: json.dumps(load_json()), args.repeat)
+        npy_endpoint, new_body = timed(lambda: json.dumps(TrackTable.load(tracks_dir).to_detections()), args.repeat)
+
+        print(f"{'':>26} | {'JSON indenté':>14} | {'colonnes .npy':>14}")
+        print(f"{'taille':>26} | {json_path.stat().st_size / 1e6:>11.2f} MB | "
+              f"{directory_size(tracks_dir) / 1e6:>11.2f} MB")
+        print(f"{'écriture (ms)':>26} | {json_write:>14.1f} | {npy_write:>14.1f}")
+        print(f"{'chargement (ms)':>26} | {json_load:>14.1f} | {npy_load:>14.1f}")
+        print(f"{'stats par zone (ms)':>26} | {'-':>14} | {npy_stats:>14.1f}")
+        print(f"{'réponse GET /results (ms)':>26} | {json_endpoint:>14.1f} | {npy_endpoint:>14.1f}")
+
+        # Coordonnées stockées en float32 : écart maximal par rapport au JSON d'origine
+        old_boxes = [(detection["frame"], box) for detection in json.loads(old_body) for box in detection["boxes"]]
+        new_boxes = [(detection["frame"], box) for detection in json.loads(new_body) for box in detection["boxes"]]
+        same_tracks = [(frame, box["track_id"]) for frame, box in old_boxes] == \
+                      [(frame, box["track_id"]) for frame, box in new_boxes]
+        max_error = max(abs(old_box[name] - new_box[name])
+                        for (_, old_box), (_, new_box) in zip(old_boxes, new_boxes)
+                        for name in ("x1", "y1", "x2", "y2"))
+        print(f"Frames et track_ids identiques : {same_tracks}, écart maximal des coordonnées : {max_error:.1e} px")
+
+        shutil.rmtree(tracks_dir)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks du backend VisionTrack")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    storage_parser = subparsers.add_parser("storage", help="Stockage des détections : JSON vs colonnes NumPy")
+    storage_parser.add_argument("--minutes", type=float, default=10, help="Durée de la vidéo simulée")
+    storage_parser.add_argument("--fps", type=float, default=30, help="FPS de la vidéo simulée")
+    storage_parser.add_argument("--people", type=int, default=8, help="Personnes par frame")
+    storage_parser.add_argument("--repeat", type=int, default=3, help="Mesures par opération (meilleur temps)")
+    storage_parser.set_defaults(func=bench_storage)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
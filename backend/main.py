@@ -3,17 +3,57 @@ Backend FastAPI pour VisionTrack
 Gère l'upload de vidéos, l'orchestration de l'analyse et le stockage des résultats
 """
 
+import asyncio
+import hashlib
 import os
 import json
+import math
+import shutil
+import time
 import uuid
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Annotated, Callable, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
 import httpx
+import numpy as np
+
+from aggregation import aggregate
+from analysis_jobs import (
+    ANALYSIS_COMPLETED,
+    ANALYSIS_FAILED,
+    ANALYSIS_QUEUED,
+    ANALYSIS_RUNNING,
+    TERMINAL_STATUSES,
+    AnalysisJobRegistry,
+)
+from result_cache import ResultCache, file_sha256, link_or_copy
+from spatial import density_heatmap, heatmap_png, trajectories, trajectories_png
+from streaming import file_response
+from tracks import (
+    FrameIndex,
+    TrackTable,
+    MAX_POLYGON_ZONES,
+    contains_zone,
+    frame_counts,
+    polygon_bounds,
+    polygon_zone_tables,
+    query_detections,
+    zone_mask,
+    zone_statistics,
+)
+from uploads import (
+    BodySizeLimitMiddleware,
+    RequestTooLarge,
+    ResumableUploadStore,
+    read_file_chunks,
+    write_stream,
+)
 
 # Initialisation de l'application FastAPI
 app = FastAPI(
@@ -29,6 +69,27 @@ UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "/app/shared/uploads"))
 RESULTS_DIR = Path(os.getenv("RESULTS_DIR", "/app/shared/results"))
 ANNOTATED_DIR = Path(os.getenv("ANNOTATED_DIR", "/app/shared/annotated"))
 MAX_VIDEO_SIZE_MB = int(os.getenv("MAX_VIDEO_SIZE_MB", "500"))
+MAX_VIDEO_SIZE_BYTES = MAX_VIDEO_SIZE_MB * 1024 * 1024
+# Taille des blocs écrits sur disque pendant un upload (mémoire constante par upload)
+UPLOAD_WRITE_CHUNK_BYTES = 1024 * 1024
+# Upload reprenable : taille conseillée des morceaux, durée de vie d'une session inachevée
+UPLOAD_CHUNK_SIZE_MB = max(1, int(os.getenv("UPLOAD_CHUNK_SIZE_MB", "8")))
+UPLOAD_SESSION_TTL_HOURS = float(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+# Cache des résultats (volume partagé) : taille maximale, 0 = désactivé
+RESULT_CACHE_DIR = Path(os.getenv("RESULT_CACHE_DIR", "/app/shared/cache"))
+RESULT_CACHE_MAX_MB = max(0, int(os.getenv("RESULT_CACHE_MAX_MB", "2048")))
+IA_POLL_INTERVAL = float(os.getenv("IA_POLL_INTERVAL", "1.0"))
+# Durée minimale de présence d'un track pour être compté (secondes, ~20 frames à 30 FPS)
+MIN_TRACK_SECONDS = float(os.getenv("MIN_TRACK_SECONDS", "0.67"))
+# Absence tolérée avant qu'une personne soit considérée sortie de la zone (secondes)
+ZONE_EXIT_GRACE_SECONDS = float(os.getenv("ZONE_EXIT_GRACE_SECONDS", "1.0"))
+# Carte de chaleur : taille des cellules (pixels) ; trajectoires : points conservés par track
+HEATMAP_CELL_PIXELS = max(1, int(os.getenv("HEATMAP_CELL_PIXELS", "16")))
+TRAJECTORY_MAX_POINTS = max(2, int(os.getenv("TRAJECTORY_MAX_POINTS", "300")))
+
+# Taille des uploads vérifiée pendant la réception (413 avant d'avoir tout reçu) ;
+# ajouté avant CORS pour que les réponses 413 portent les en-têtes CORS
+app.add_middleware(BodySizeLimitMiddleware, max_bytes=MAX_VIDEO_SIZE_BYTES)
 
 # Configuration CORS pour permettre les requêtes du frontend
 app.add_middleware(
@@ -44,6 +105,29 @@ UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
 ANNOTATED_DIR.mkdir(parents=True, exist_ok=True)
 
+# Sessions d'upload reprenable
+resumable_uploads = ResumableUploadStore(
+    UPLOAD_DIR, MAX_VIDEO_SIZE_BYTES, UPLOAD_CHUNK_SIZE_MB * 1024 * 1024, UPLOAD_SESSION_TTL_HOURS * 3600
+)
+
+# Cache des résultats d'analyse, indexé par empreinte du contenu et paramètres
+result_cache = ResultCache(RESULT_CACHE_DIR, RESULT_CACHE_MAX_MB * 1024 * 1024)
+
+# Empreinte SHA-256 des vidéos uploadées, calculée pendant l'upload et enregistrée à côté
+# de la vidéo (.hashes/<video_id>.sha256) : elle disparaît avec la vidéo ou l'analyse
+UPLOAD_HASHES_DIR = UPLOAD_DIR / ".hashes"
+UPLOAD_HASHES_DIR.mkdir(parents=True, exist_ok=True)
+
+# Registre des analyses lancées en tâche de fond
+analysis_jobs = AnalysisJobRegistry()
+
+# Rendus à la demande en cours : video_id -> job_id
+render_jobs: Dict[str, str] = {}
+
+
+# Types MIME des fichiers HLS servis
+HLS_MEDIA_TYPES = {".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t"}
+
 
 # ========== Modèles Pydantic pour la validation des données ==========
 
@@ -55,10 +139,53 @@ class Zone(BaseModel):
     y2: float
 
 
+# Coordonnée d'un sommet de zone polygonale (pixels du frame, jusqu'à la 8K)
+Coordinate = Annotated[float, Field(ge=0, le=8192)]
+
+
+class PolygonZone(BaseModel):
+    """Zone nommée de forme quelconque (polygone fermé, sommets en pixels)"""
+    name: str = Field(min_length=1, max_length=64)
+    points: List[Tuple[Coordinate, Coordinate]] = Field(min_length=3, max_length=64)
+
+
+class UploadInitRequest(BaseModel):
+    """Ouverture d'un upload reprenable"""
+    filename: str
+    size: int = Field(ge=1)
+    content_type: str
+
+
+class ZoneQuery(BaseModel):
+    """Zones à évaluer sur les détections d'une analyse terminée (sans nouvelle inférence)"""
+    zones: List[Zone] = Field(default_factory=list, max_length=32)
+    # Zones polygonales nommées, évaluées ensemble en une passe
+    polygons: List[PolygonZone] = Field(default_factory=list, max_length=MAX_POLYGON_ZONES)
+    # Renvoyer aussi les détections de chaque zone (sinon statistiques seules)
+    include_detections: bool = False
+
+
 class AnalyzeRequest(BaseModel):
     """Requête pour lancer une analyse"""
     video_id: str
     zone: Optional[Zone] = None
+    # Zones polygonales nommées (portes, allées...) : statistiques par zone issues de la même inférence
+    zones: Optional[List[PolygonZone]] = Field(default=None, max_length=MAX_POLYGON_ZONES)
+    # Inférence restreinte à la zone (+ marge en pixels), transmis au service IA
+    crop_to_zone: Optional[bool] = None
+    zone_margin: Optional[int] = None
+    # Générer la vidéo annotée (défaut du service IA si absent) ; sinon rendu à la demande
+    render_video: Optional[bool] = None
+    # Échantillonnage des frames (un sur frame_stride, ou cadence visée analysis_fps, pas adaptatif)
+    frame_stride: Optional[int] = None
+    analysis_fps: Optional[float] = None
+    adaptive_stride: Optional[bool] = None
+    # Sauter l'inférence sur les frames sans mouvement
+    motion_gate: Optional[bool] = None
+    # Taille d'entrée du modèle adaptée à la taille des personnes
+    adaptive_imgsz: Optional[bool] = None
+    # Nombre de segments traités en parallèle par le service IA (0 = un par worker)
+    chunks: Optional[int] = None
 
 
 class DetectionBox(BaseModel):
@@ -127,32 +254,113 @@ async def upload_video(file: UploadFile = File(...)):
     # Chemin de sauvegarde
     video_path = UPLOAD_DIR / f"{video_id}{file_extension}"
 
-    # Sauvegarder le fichier
+    # Sauvegarder le fichier par blocs (jamais entièrement en mémoire), empreinte calculée au passage
+    hasher = hashlib.sha256()
     try:
-        with open(video_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        size = await write_stream(read_file_chunks(file, UPLOAD_WRITE_CHUNK_BYTES), video_path, MAX_VIDEO_SIZE_BYTES,
+                                  hasher=hasher)
+    except RequestTooLarge:
+        video_path.unlink(missing_ok=True)
+        raise
     except Exception as e:
+        video_path.unlink(missing_ok=True)
         raise HTTPException(status_code=500, detail=f"Erreur lors de la sauvegarde : {str(e)}")
 
+    save_upload_hash(video_id, hasher.hexdigest())
+
     return {
         "video_id": video_id,
         "filename": file.filename,
-        "size": len(content),
+        "size": size,
         "message": "Vidéo uploadée avec succès"
     }
 
 
-@app.post("/analyze")
+# ========== Upload reprenable (gros fichiers, connexions instables) ==========
+
+@app.post("/uploads", status_code=201)
+async def init_upload(request: UploadInitRequest):
+    """
+    Ouvre un upload reprenable
+
+    Le fichier est ensuite envoyé par morceaux (PUT /uploads/{upload_id}?offset=N,
+    corps brut), puis finalisé par POST /uploads/{upload_id}/complete.
+
+    Returns:
+        upload_id, octets reçus (0) et taille conseillée des morceaux
+    """
+    session = resumable_uploads.create(request.filename, request.size, request.content_type)
+    print(f"✓ Upload {session['upload_id']} ouvert : {request.filename} ({request.size} octets)")
+    return session
+
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """
+    État d'un upload reprenable
+
+    Returns:
+        Octets reçus : offset à partir duquel reprendre après une coupure
+    """
+    return resumable_uploads.status(resumable_uploads.get(upload_id))
+
+
+@app.put("/uploads/{upload_id}")
+async def put_upload_chunk(upload_id: str, offset: int, request: Request):
+    """
+    Reçoit un morceau du fichier, écrit sur disque à mesure qu'il arrive
+
+    Args:
+        offset: Position du morceau dans le fichier (doit égaler les octets déjà reçus, sinon 409)
+
+    Returns:
+        État de l'upload après réception
+    """
+    try:
+        return await resumable_uploads.append(upload_id, offset, request.stream())
+    except ClientDisconnect:
+        # Les octets déjà reçus sont conservés : le client reprendra à l'offset courant
+        print(f"INFO : Connexion interrompue pendant l'upload {upload_id}")
+        return Response(status_code=400)
+
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    """
+    Finalise un upload reprenable entièrement reçu (409 sinon)
+
+    Returns:
+        Même réponse que POST /upload-video (video_id utilisable par /analyze)
+    """
+    result = resumable_uploads.complete(upload_id)
+    content_hash = result.pop("content_hash")
+    if content_hash:
+        save_upload_hash(result["video_id"], content_hash)
+    print(f"✓ Upload {upload_id} terminé : {result['filename']} ({result['size']} octets)")
+    return result
+
+
+@app.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Abandonne un upload reprenable et supprime les octets reçus"""
+    resumable_uploads.abort(upload_id)
+    return {"message": "Upload abandonné"}
+
+
+@app.post("/analyze", status_code=202)
 async def analyze_video(request: AnalyzeRequest):
     """
     Endpoint pour lancer l'analyse d'une vidéo
 
+    L'analyse s'exécute en tâche de fond : la réponse contient un job_id
+    à suivre via GET /analysis-jobs/{job_id} ou le flux SSE
+    GET /analysis-jobs/{job_id}/events.
+
     Args:
         request: Contient video_id et zone d'analyse
 
     Returns:
-        Dict avec les statistiques d'analyse
+        Dict avec le job_id de l'analyse
     """
     print("\n" + "="*80)
     print("BACKEND - DÉBUT DE L'ANALYSE")
@@ -166,6 +374,8 @@ async def analyze_video(request: AnalyzeRequest):
         print(f"Zone reçue : x1={zone.x1}, y1={zone.y1}, x2={zone.x2}, y2={zone.y2}")
     else:
         print("Zone : VIDÉO ENTIÈRE (aucune zone spécifiée)")
+    if request.zones:
+        print(f"Zones polygonales reçues : {', '.join(polygon.name for polygon in request.zones)}")
 
     # Trouver le fichier vidéo
     video_files = list(UPLOAD_DIR.glob(f"{video_id}.*"))
@@ -176,11 +386,143 @@ async def analyze_video(request: AnalyzeRequest):
     video_path = str(video_files[0])
     print(f"✓ Vidéo trouvée : {video_path}")
 
+    # Même contenu déjà analysé avec les mêmes paramètres : réponse immédiate depuis le cache
+    cache_key = await analysis_cache_key(video_id, video_path, request)
+    cached = result_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        job = await restore_cached_analysis(video_id, video_path, cached)
+        return {
+            "message": "Analyse servie depuis le cache",
+            "job_id": job["job_id"],
+            "video_id": video_id,
+            "status": job["status"],
+            "cached": True
+        }
+
+    job = analysis_jobs.create(video_id)
+    analysis_jobs.run(job, process_analysis(job, video_path, request, cache_key))
+    print(f"✓ Analyse {job['job_id']} lancée en tâche de fond")
+
+    return {
+        "message": "Analyse lancée",
+        "job_id": job["job_id"],
+        "video_id": video_id,
+        "status": job["status"],
+        "cached": False
+    }
+
+
+async def analysis_cache_key(video_id: str, video_path: str, request: AnalyzeRequest) -> Optional[str]:
+    """
+    Clé de cache de l'analyse demandée (None si le cache est désactivé ou indisponible)
+
+    Combine l'empreinte du contenu (calculée pendant l'upload, sinon relue sur
+    disque), la zone et les paramètres effectifs de la détection : configuration
+    du service IA (modèle, seuil de confiance, tracker...) et options de la requête.
+    """
+    if not result_cache.enabled:
+        return None
+
+    try:
+        async with httpx.AsyncClient(timeout=5.0) as client:
+            response = await client.get(f"{IA_SERVICE_URL}/config")
+            response.raise_for_status()
+            detection_config = response.json()
+    except httpx.HTTPError as e:
+        print(f"ATTENTION : Configuration du service IA indisponible, cache ignoré - {str(e)}")
+        return None
+
+    # Options non précisées : valeurs par défaut du service IA (même résultat, même clé)
+    for option in ("crop_to_zone", "zone_margin", "frame_stride", "analysis_fps", "adaptive_stride", "motion_gate",
+                   "adaptive_imgsz"):
+        value = getattr(request, option)
+        if value is not None:
+            detection_config[option] = value
+
+    content_hash = load_upload_hash(video_id)
+    if content_hash is None:
+        content_hash = await run_in_threadpool(file_sha256, Path(video_path))
+        save_upload_hash(video_id, content_hash)
+
+    zone = request.zone.model_dump() if request.zone else None
+    polygons = [polygon.model_dump() for polygon in request.zones] if request.zones else None
+    return ResultCache.make_key(content_hash, zone, detection_config, polygons)
+
+
+async def restore_cached_analysis(video_id: str, video_path: str, cached: Dict) -> Dict:
+    """
+    Publie une analyse issue du cache sous le video_id courant
+
+    Les résultats et la vidéo annotée (lien physique) sont recopiés comme à la fin
+    d'une analyse, et un job déjà terminé est créé pour le suivi habituel.
+    """
+    results = {**cached["results"], "video_id": video_id, "annotated_video_path": None, "hls_playlist_path": None}
+    if cached["annotated_video"] is not None:
+        annotated_path = ANNOTATED_DIR / f"{video_id}_annotated.mp4"
+        await run_in_threadpool(link_or_copy, cached["annotated_video"], annotated_path)
+        results["annotated_video_path"] = str(annotated_path)
+        if cached["hls"] is not None:
+            await run_in_threadpool(link_or_copy, cached["hls"], hls_dir_for(video_id))
+            results["hls_playlist_path"] = str(hls_dir_for(video_id) / "index.m3u8")
+
+    with open(RESULTS_DIR / f"{video_id}.json", "w") as f:
+        json.dump(results, f, indent=2)
+    if cached["tracks"] is not None:
+        await run_in_threadpool(link_or_copy, cached["tracks"], tracks_dir_for(video_id))
+
+    # Comme après une analyse : la vidéo source n'est conservée que pour un rendu à la demande
+    if results["annotated_video_path"]:
+        delete_upload(video_path)
+
+    job = analysis_jobs.create(video_id)
+    analysis_jobs.update(
+        job,
+        status=ANALYSIS_COMPLETED,
+        stats=results["stats"],
+        progress={"frame": 0, "total_frames": 0, "percent": 100.0}
+    )
+    print(f"✓ Analyse {job['job_id']} servie depuis le cache ({results['cache_key'][:12]})")
+    return job
+
+
+async def process_analysis(job: Dict, video_path: str, request: AnalyzeRequest,
+                           cache_key: Optional[str] = None) -> None:
+    """
+    Déroule une analyse complète en tâche de fond
+
+    Soumet la détection au service IA, relaie sa progression, calcule
+    les statistiques, sauvegarde les résultats (et les met en cache sous
+    cache_key) et supprime la vidéo originale.
+    Les erreurs sont enregistrées dans le job (statut "failed").
+    """
+    video_id = job["video_id"]
+    zone = request.zone
+
     # Préparer la requête pour le service IA
     ia_request_data = {
         "video_path": video_path
     }
 
+    # Options d'inférence transmises telles quelles (valeurs par défaut du service IA sinon)
+    if request.crop_to_zone is not None:
+        ia_request_data["crop_to_zone"] = request.crop_to_zone
+    if request.zone_margin is not None:
+        ia_request_data["zone_margin"] = request.zone_margin
+    if request.render_video is not None:
+        ia_request_data["render_video"] = request.render_video
+    if request.frame_stride is not None:
+        ia_request_data["frame_stride"] = request.frame_stride
+    if request.analysis_fps is not None:
+        ia_request_data["analysis_fps"] = request.analysis_fps
+    if request.adaptive_stride is not None:
+        ia_request_data["adaptive_stride"] = request.adaptive_stride
+    if request.motion_gate is not None:
+        ia_request_data["motion_gate"] = request.motion_gate
+    if request.adaptive_imgsz is not None:
+        ia_request_data["adaptive_imgsz"] = request.adaptive_imgsz
+    if request.chunks is not None:
+        ia_request_data["chunks"] = request.chunks
+
     # Ajouter la zone seulement si elle est spécifiée
     if zone:
         ia_request_data["zone"] = {
@@ -189,69 +531,438 @@ async def analyze_video(request: AnalyzeRequest):
             "x2": zone.x2,
             "y2": zone.y2
         }
+    if request.zones:
+        ia_request_data["zones"] = [polygon.model_dump() for polygon in request.zones]
 
-    # Appeler le service IA
+    # Soumettre le job au service IA puis suivre son avancement
     print(f"Appel du service IA : {IA_SERVICE_URL}/detect")
     try:
-        async with httpx.AsyncClient(timeout=300.0) as client:  # Timeout de 5 minutes
-            response = await client.post(
-                f"{IA_SERVICE_URL}/detect",
-                json=ia_request_data
-            )
-            response.raise_for_status()
-            detections_data = response.json()
+        detections_data = await run_ia_job(ia_request_data, relay_ia_progress(job))
 
         print(f"✓ Réponse reçue du service IA")
         print(f"  Clés dans la réponse : {list(detections_data.keys())}")
     except httpx.RequestError as e:
         print(f"ERREUR : Communication avec le service IA impossible - {str(e)}")
-        raise HTTPException(status_code=503, detail=f"Erreur de communication avec le service IA : {str(e)}")
+        fail_analysis(job, 503, f"Erreur de communication avec le service IA : {str(e)}")
+        return
     except httpx.HTTPStatusError as e:
         print(f"ERREUR : Le service IA a renvoyé une erreur HTTP {e.response.status_code}")
-        raise HTTPException(status_code=e.response.status_code, detail=f"Erreur du service IA : {str(e)}")
+        fail_analysis(job, e.response.status_code, f"Erreur du service IA : {str(e)}")
+        return
+    except HTTPException as e:
+        fail_analysis(job, e.status_code, e.detail)
+        return
 
-    # Extraire les détections, le FPS et le chemin de la vidéo annotée
-    detections = detections_data.get("detections", [])
+    # Extraire les détections (tout le frame), le FPS et le chemin de la vidéo annotée
     fps = detections_data.get("fps", 30.0)  # Fallback à 30 FPS si non fourni
-    annotated_video_path = detections_data.get("annotated_video_path", "")
+    annotated_video_path = detections_data.get("annotated_video_path")
+
+    # Note: Remapping désactivé : chaque vidéo a son propre tracker et son propre compteur
+    # de track_ids côté service IA (même avec plusieurs vidéos par worker), à partir de 1
+    # detections = remap_track_ids(detections)
+
+    # Tracks plein cadre sauvegardés en colonnes : la zone est appliquée ici, et
+    # une autre zone pourra être évaluée plus tard sans nouvelle inférence
+    tracks = await run_in_threadpool(TrackTable.from_detections, detections_data.get("detections", []))
+    zone_tracks = tracks.select(zone_mask(tracks, ia_request_data.get("zone")))
 
-    print(f"Détections extraites : {len(detections)} frames avec détections")
+    print(f"Détections extraites : {len(tracks)} boxes, dont {len(zone_tracks)} dans la zone")
     print(f"FPS de la vidéo : {fps}")
     print(f"Vidéo annotée : {annotated_video_path}")
 
-    # Note: Remapping désactivé car le service IA réinitialise le tracker proprement
-    # Les track_ids commencent toujours à 1 grâce au reset en fin d'analyse
-    # detections = remap_track_ids(detections)
-
-    # Calculer les statistiques
-    stats = calculate_statistics(detections)
+    # Calculer les statistiques et les agrégats (occupation, tracks, entrées / sorties)
+    stats = zone_statistics(zone_tracks, fps, MIN_TRACK_SECONDS)
+    # Zones polygonales : boxes de la zone d'analyse situées dans chaque polygone, en une passe
+    polygon_zones = [
+        {**polygon, "stats": zone_statistics(polygon_tracks, fps, MIN_TRACK_SECONDS)}
+        for polygon, polygon_tracks in zip(ia_request_data.get("zones", []),
+                                           polygon_zone_tables(zone_tracks, ia_request_data.get("zones", [])))
+    ]
+    aggregates = await run_in_threadpool(aggregate, zone_tracks, fps, detections_data.get("total_frames"),
+                                         MIN_TRACK_SECONDS, ZONE_EXIT_GRACE_SECONDS)
 
     print(f"Statistiques calculées :")
     print(f"  - Total personnes : {stats['total_people']}")
     print(f"  - Max simultané : {stats['max_people_simultaneous']}")
     print(f"  - Frame du max : {stats['frame_of_max']}")
+    for polygon in polygon_zones:
+        print(f"  - Zone {polygon['name']} : {polygon['stats']['total_people']} personnes, "
+              f"max simultané {polygon['stats']['max_people_simultaneous']}")
 
-    # Préparer les résultats complets
+    # Préparer les résultats (les détections sont stockées en colonnes à côté)
+    # La zone est conservée pour pouvoir générer la vidéo annotée plus tard
     results = {
         "video_id": video_id,
         "fps": fps,
+        "total_frames": detections_data.get("total_frames"),
+        # Repère des coordonnées (dimensions du frame), utilisé par la carte de chaleur
+        "frame_size": {"width": detections_data["width"], "height": detections_data["height"]}
+        if detections_data.get("width") else None,
         "stats": stats,
-        "detections": detections,
-        "annotated_video_path": annotated_video_path
+        "annotated_video_path": annotated_video_path,
+        # Playlist HLS de la vidéo annotée (None si le découpage HLS est désactivé)
+        "hls_playlist_path": detections_data.get("hls_playlist_path"),
+        "zone": ia_request_data.get("zone"),
+        # Zones polygonales et leurs statistiques (liste vide sans zone polygonale)
+        "zones": polygon_zones,
+        # Région réellement inférée (analyse recadrée) : limite des zones évaluables après coup
+        "inference_region": detections_data.get("inference_region"),
+        # Taille d'entrée du modèle retenue et ses changements (taille adaptative)
+        "imgsz": detections_data.get("imgsz"),
+        "imgsz_changes": detections_data.get("imgsz_changes"),
+        # Temps par étape du service IA (décodage, inférence, suivi, annotation, encodage)
+        "timings": detections_data.get("timings"),
+        "cache_key": cache_key
     }
 
-    # Sauvegarder les résultats dans un fichier JSON
+    # Sauvegarder les tracks plein cadre en colonnes, puis les résultats dans un fichier JSON
     results_path = RESULTS_DIR / f"{video_id}.json"
     print(f"Sauvegarde des résultats dans : {results_path}")
+    try:
+        await run_in_threadpool(tracks.save, tracks_dir_for(video_id))
+        with open(aggregates_path_for(video_id), "w") as f:
+            json.dump(aggregates, f)
+        with open(results_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Résultats sauvegardés ({len(tracks)} boxes en colonnes)")
+    except Exception as e:
+        print(f"ERREUR : Impossible de sauvegarder les résultats - {str(e)}")
+        fail_analysis(job, 500, f"Erreur lors de la sauvegarde des résultats : {str(e)}")
+        return
+
+    if cache_key:
+        await store_in_cache(cache_key, results, annotated_video_path, tracks_dir_for(video_id))
+
+    # Supprimer la vidéo originale pour économiser de l'espace, sauf en mode
+    # détection seule : elle sert à générer la vidéo annotée à la demande
+    if annotated_video_path:
+        delete_upload(video_path)
+    else:
+        print(f"INFO : Vidéo originale conservée pour un rendu à la demande : {video_path}")
+
+    analysis_jobs.update(
+        job,
+        status=ANALYSIS_COMPLETED,
+        stats=stats,
+        progress={**job["progress"], "percent": 100.0}
+    )
+
+    print("="*80)
+    print("BACKEND - FIN DE L'ANALYSE")
+    print("="*80 + "\n")
+
+
+@app.post("/annotated-videos/{video_id}/render", status_code=202)
+async def render_annotated_video(video_id: str):
+    """
+    Endpoint pour générer à la demande la vidéo annotée d'une analyse en mode détection seule
+
+    La vidéo est rendue par le service IA à partir des détections sauvegardées
+    (sans nouvelle inférence). Le suivi se fait comme pour une analyse :
+    GET /analysis-jobs/{job_id} ou le flux SSE GET /analysis-jobs/{job_id}/events.
+
+    Args:
+        video_id: ID de la vidéo
+
+    Returns:
+        Dict avec le job_id du rendu
+    """
+    results_path = RESULTS_DIR / f"{video_id}.json"
+    if not results_path.exists():
+        raise HTTPException(status_code=404, detail="Résultats non trouvés")
+
+    with open(results_path, "r") as f:
+        results = json.load(f)
+
+    if results.get("annotated_video_path"):
+        raise HTTPException(status_code=409, detail="Vidéo annotée déjà disponible")
+
+    # Un seul rendu à la fois par vidéo : renvoyer le job en cours s'il existe
+    running_job = analysis_jobs.get(render_jobs.get(video_id, ""))
+    if running_job is not None and running_job["status"] not in TERMINAL_STATUSES:
+        return {
+            "message": "Rendu déjà en cours",
+            "job_id": running_job["job_id"],
+            "video_id": video_id,
+            "status": running_job["status"]
+        }
+
+    video_files = list(UPLOAD_DIR.glob(f"{video_id}.*"))
+    if not video_files:
+        raise HTTPException(status_code=404, detail="Vidéo source non disponible pour le rendu")
+    detections, _ = await run_in_threadpool(load_detections, video_id, results)
+
+    job = analysis_jobs.create(video_id)
+    render_jobs[video_id] = job["job_id"]
+    analysis_jobs.run(job, process_render(job, str(video_files[0]), results, detections))
+    print(f"✓ Rendu {job['job_id']} lancé en tâche de fond pour {video_id}")
+
+    return {
+        "message": "Rendu lancé",
+        "job_id": job["job_id"],
+        "video_id": video_id,
+        "status": job["status"]
+    }
+
+
+async def process_render(job: Dict, video_path: str, results: Dict, detections: List[Dict]) -> None:
+    """
+    Génère la vidéo annotée via le service IA puis met à jour les résultats sauvegardés
+
+    La vidéo originale est supprimée une fois la vidéo annotée produite.
+    """
+    video_id = job["video_id"]
+    ia_request_data = {
+        "video_path": video_path,
+        "zone": results.get("zone"),
+        "zones": [{"name": polygon["name"], "points": polygon["points"]} for polygon in results.get("zones", [])],
+        "detections": detections
+    }
+
+    print(f"Appel du service IA : {IA_SERVICE_URL}/render")
+    try:
+        render_data = await run_ia_job(ia_request_data, relay_ia_progress(job), endpoint="/render")
+    except httpx.RequestError as e:
+        print(f"ERREUR : Communication avec le service IA impossible - {str(e)}")
+        fail_analysis(job, 503, f"Erreur de communication avec le service IA : {str(e)}")
+        return
+    except httpx.HTTPStatusError as e:
+        print(f"ERREUR : Le service IA a renvoyé une erreur HTTP {e.response.status_code}")
+        fail_analysis(job, e.response.status_code, f"Erreur du service IA : {str(e)}")
+        return
+    except HTTPException as e:
+        fail_analysis(job, e.status_code, e.detail)
+        return
+
+    results["annotated_video_path"] = render_data["annotated_video_path"]
+    results["hls_playlist_path"] = render_data.get("hls_playlist_path")
+    results_path = RESULTS_DIR / f"{video_id}.json"
     try:
         with open(results_path, "w") as f:
             json.dump(results, f, indent=2)
-        print(f"✓ Résultats sauvegardés ({results_path.stat().st_size} bytes)")
+        print(f"✓ Résultats mis à jour avec la vidéo annotée : {results['annotated_video_path']}")
     except Exception as e:
         print(f"ERREUR : Impossible de sauvegarder les résultats - {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la sauvegarde des résultats : {str(e)}")
+        fail_analysis(job, 500, f"Erreur lors de la sauvegarde des résultats : {str(e)}")
+        return
+
+    if results.get("cache_key") and result_cache.enabled:
+        try:
+            await run_in_threadpool(result_cache.add_annotated_video, results["cache_key"],
+                                    Path(results["annotated_video_path"]))
+        except Exception as e:
+            print(f"ATTENTION : Vidéo annotée non ajoutée au cache - {str(e)}")
+
+    delete_upload(video_path)
+
+    analysis_jobs.update(
+        job,
+        status=ANALYSIS_COMPLETED,
+        stats=results.get("stats"),
+        progress={**job["progress"], "percent": 100.0}
+    )
+
+
+def relay_ia_progress(job: Dict) -> Callable[[Dict], None]:
+    """Callback de run_ia_job recopiant le statut et la progression du job IA dans le job backend"""
+    def on_progress(ia_job: Dict) -> None:
+        status = ANALYSIS_RUNNING if ia_job["status"] == "running" else ANALYSIS_QUEUED
+        progress = ia_job.get("progress", job["progress"])
+        # Ne notifier les abonnés que si quelque chose a changé
+        if status != job["status"] or progress != job["progress"]:
+            analysis_jobs.update(job, status=status, ia_job_id=ia_job["job_id"], progress=progress)
+
+    return on_progress
+
+
+def tracks_dir_for(video_id: str) -> Path:
+    """Tracks plein cadre d'une analyse (un fichier .npy par colonne, voir tracks.py)"""
+    return RESULTS_DIR / f"{video_id}_tracks"
+
+
+def aggregates_path_for(video_id: str) -> Path:
+    """Agrégats d'une analyse (occupation par seconde, tracks, entrées / sorties, voir aggregation.py)"""
+    return RESULTS_DIR / f"{video_id}_aggregates.json"
+
+
+def hls_dir_for(video_id: str) -> Path:
+    """Découpage HLS de la vidéo annotée (index.m3u8 + segments, écrit par le service IA)"""
+    return ANNOTATED_DIR / f"{video_id}_annotated_hls"
 
-    # Supprimer la vidéo originale pour économiser de l'espace
+
+def spatial_dir_for(video_id: str) -> Path:
+    """Carte de chaleur et trajectoires d'une analyse (tableaux et PNG, voir spatial.py)"""
+    return RESULTS_DIR / f"{video_id}_spatial"
+
+
+def read_results(video_id: str) -> Dict:
+    """Résultats sauvegardés d'une analyse (404 s'ils n'existent pas ou plus)"""
+    results_path = RESULTS_DIR / f"{video_id}.json"
+    if not results_path.exists():
+        raise HTTPException(status_code=404, detail="Résultats non trouvés")
+    with open(results_path, "r") as f:
+        return json.load(f)
+
+
+def load_aggregates(video_id: str, results: Dict) -> Dict:
+    """
+    Agrégats précalculés d'une analyse
+
+    Absents pour une analyse servie depuis le cache ou antérieure aux agrégats :
+    ils sont alors calculés à partir des colonnes puis sauvegardés. Des agrégats
+    contenant des valeurs non finies (vidéos sous 1 fps avant correction) sont
+    recalculés.
+    """
+    aggregates_path = aggregates_path_for(video_id)
+    if aggregates_path.exists():
+        with open(aggregates_path, "r") as f:
+            text = f.read()
+        try:
+            return json.loads(text, parse_constant=reject_json_constant)
+        except ValueError:
+            print(f"ATTENTION : Agrégats de {video_id} invalides (valeurs non finies), recalculés")
+
+    tracks, _ = load_tracks(video_id, results)
+    zone_tracks = tracks.select(zone_mask(tracks, results.get("zone")))
+    aggregates = aggregate(zone_tracks, results.get("fps", 30.0), results.get("total_frames"),
+                           MIN_TRACK_SECONDS, ZONE_EXIT_GRACE_SECONDS)
+    with open(aggregates_path, "w") as f:
+        json.dump(aggregates, f, allow_nan=False)
+    return aggregates
+
+
+def reject_json_constant(name: str):
+    """Refuse NaN / Infinity à la lecture d'un JSON (non servables par JSONResponse)"""
+    raise ValueError(f"Valeur JSON non finie : {name}")
+
+
+def load_spatial(video_id: str, results: Dict) -> Path:
+    """
+    Répertoire des analyses spatiales d'une analyse, calculées au premier appel
+
+    Carte de chaleur (heatmap.npy, heatmap.png), trajectoires (trajectories.json,
+    trajectories.png) et leurs paramètres (spatial.json), à partir des boxes de la
+    zone : quelques millisecondes, sans relire la vidéo. Recalculées si
+    HEATMAP_CELL_PIXELS ou TRAJECTORY_MAX_POINTS ont changé.
+    """
+    spatial_dir = spatial_dir_for(video_id)
+    settings = {"cell_size": HEATMAP_CELL_PIXELS, "max_points": TRAJECTORY_MAX_POINTS}
+    try:
+        with open(spatial_dir / "spatial.json", "r") as f:
+            if {name: value for name, value in json.load(f).items() if name in settings} == settings:
+                return spatial_dir
+    except (OSError, ValueError):
+        pass
+
+    tracks, _ = load_tracks(video_id, results)
+    zone_tracks = tracks.select(zone_mask(tracks, results.get("zone")))
+    width, height = frame_size(results, tracks)
+    fps = results.get("fps", 30.0)
+
+    started = time.perf_counter()
+    heatmap = density_heatmap(zone_tracks, width, height, HEATMAP_CELL_PIXELS, fps)
+    polylines = trajectories(zone_tracks, fps, TRAJECTORY_MAX_POINTS)
+
+    # Écriture dans un répertoire temporaire puis renommage (requêtes concurrentes)
+    work_dir = spatial_dir.with_name(f".{spatial_dir.name}.tmp-{uuid.uuid4()}")
+    work_dir.mkdir()
+    try:
+        np.save(work_dir / "heatmap.npy", heatmap)
+        (work_dir / "heatmap.png").write_bytes(heatmap_png(heatmap, width, height, HEATMAP_CELL_PIXELS))
+        with open(work_dir / "trajectories.json", "w") as f:
+            json.dump(polylines, f)
+        (work_dir / "trajectories.png").write_bytes(trajectories_png(polylines, width, height))
+        with open(work_dir / "spatial.json", "w") as f:
+            json.dump({**settings, "width": width, "height": height}, f)
+        shutil.rmtree(spatial_dir, ignore_errors=True)
+        work_dir.rename(spatial_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"✓ Carte de chaleur et {len(polylines)} trajectoires calculées pour {video_id} en {elapsed_ms:.1f} ms")
+    return spatial_dir
+
+
+def frame_size(results: Dict, tracks: TrackTable) -> Tuple[int, int]:
+    """
+    Dimensions du frame d'une analyse
+
+    Renvoyées par le service IA ; pour une analyse antérieure, déduites de la
+    région inférée ou, à défaut, de l'étendue des boxes.
+    """
+    if results.get("frame_size"):
+        return results["frame_size"]["width"], results["frame_size"]["height"]
+    if results.get("inference_region"):
+        return math.ceil(results["inference_region"]["x2"]), math.ceil(results["inference_region"]["y2"])
+    if len(tracks) == 0:
+        return 1, 1
+    return max(1, math.ceil(float(tracks.x2.max()))), max(1, math.ceil(float(tracks.y2.max())))
+
+
+def load_tracks(video_id: str, results: Dict) -> Tuple[TrackTable, FrameIndex]:
+    """
+    Colonnes (mémoire mappée) et index des frames d'une analyse
+
+    Les résultats écrits avant le stockage en colonnes contiennent encore leurs
+    détections : elles sont converties en mémoire.
+    """
+    if "detections" in results:
+        tracks = TrackTable.from_detections(results["detections"])
+        return tracks, FrameIndex.build(tracks)
+
+    tracks_dir = tracks_dir_for(video_id)
+    if not tracks_dir.exists():
+        raise HTTPException(status_code=404, detail="Détections non trouvées")
+    tracks = TrackTable.load(tracks_dir)
+    return tracks, FrameIndex.load(tracks_dir, tracks)
+
+
+def load_detections(video_id: str, results: Dict, **query) -> Tuple[List[Dict], int]:
+    """
+    Détections dans la zone de l'analyse, au format JSON historique (une entrée par frame)
+
+    Args:
+        query: Filtres et pagination de tracks.query_detections (frame_start, frame_end,
+            track_id, offset, limit)
+
+    Returns:
+        (détections, nombre total de frames correspondant aux filtres)
+    """
+    tracks, index = load_tracks(video_id, results)
+    return query_detections(tracks, index, results.get("zone"), **query)
+
+
+async def store_in_cache(cache_key: str, results: Dict, annotated_video_path: Optional[str],
+                         tracks_dir: Path) -> None:
+    """Met une analyse terminée en cache (un échec n'affecte pas l'analyse)"""
+    try:
+        await run_in_threadpool(result_cache.put, cache_key, results,
+                                Path(annotated_video_path) if annotated_video_path else None, tracks_dir)
+    except Exception as e:
+        print(f"ATTENTION : Impossible de mettre les résultats en cache - {str(e)}")
+
+
+def upload_hash_path(video_id: str) -> Path:
+    """Empreinte SHA-256 d'une vidéo uploadée (clé du cache des résultats)"""
+    return UPLOAD_HASHES_DIR / f"{video_id}.sha256"
+
+
+def save_upload_hash(video_id: str, content_hash: str) -> None:
+    upload_hash_path(video_id).write_text(content_hash)
+
+
+def load_upload_hash(video_id: str) -> Optional[str]:
+    """Empreinte enregistrée à l'upload (None si absente : upload antérieur, recalculée)"""
+    try:
+        return upload_hash_path(video_id).read_text().strip() or None
+    except OSError:
+        return None
+
+
+def delete_upload(video_path: str) -> None:
+    """Supprime la vidéo originale uploadée et son empreinte (sans lever d'exception)"""
+    upload_hash_path(Path(video_path).stem).unlink(missing_ok=True)
     try:
         video_file = Path(video_path)
         if video_file.exists():
@@ -263,26 +974,87 @@ async def analyze_video(request: AnalyzeRequest):
         print(f"ATTENTION : Impossible de supprimer la vidéo originale - {str(e)}")
         # Ne pas lever d'exception, l'analyse est terminée
 
-    print("="*80)
-    print("BACKEND - FIN DE L'ANALYSE")
-    print("="*80 + "\n")
 
-    return {
-        "message": "Analyse terminée avec succès",
-        "stats": stats
-    }
+def fail_analysis(job: Dict, status_code: int, detail: str) -> None:
+    """Marque une analyse comme échouée avec le code HTTP équivalent"""
+    analysis_jobs.update(job, status=ANALYSIS_FAILED, error={"status_code": status_code, "detail": detail})
+    print(f"ERREUR : Analyse {job['job_id']} échouée - {detail}")
+
+
+@app.get("/analysis-jobs/{job_id}")
+async def get_analysis_job(job_id: str):
+    """
+    Endpoint pour consulter l'état d'une analyse
+
+    Args:
+        job_id: ID renvoyé par POST /analyze
+
+    Returns:
+        Statut, progression, statistiques (si terminée) ou erreur
+    """
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analyse non trouvée")
+    return job
+
+
+@app.get("/analysis-jobs/{job_id}/events")
+async def stream_analysis_job(job_id: str):
+    """
+    Endpoint Server-Sent Events : progression d'une analyse en temps réel
+
+    Chaque message contient l'état complet du job ; le flux se termine
+    quand l'analyse est terminée ou a échoué.
+
+    Args:
+        job_id: ID renvoyé par POST /analyze
+    """
+    if analysis_jobs.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Analyse non trouvée")
+
+    return StreamingResponse(
+        analysis_jobs.events(job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """
+    Endpoint pour consulter l'état du cache des résultats
+
+    Returns:
+        Succès, échecs, évictions, nombre d'entrées et taille occupée
+    """
+    return await run_in_threadpool(result_cache.stats)
 
 
 @app.get("/results/{video_id}")
-async def get_results(video_id: str):
+async def get_results(
+    video_id: str,
+    frame_start: Optional[int] = Query(None, ge=0),
+    frame_end: Optional[int] = Query(None, ge=0),
+    time_start: Optional[float] = Query(None, ge=0),
+    time_end: Optional[float] = Query(None, ge=0),
+    track_id: Optional[int] = None,
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=0)
+):
     """
     Endpoint pour récupérer les résultats d'une analyse
 
+    Sans paramètre, toutes les détections de la zone sont renvoyées. Les paramètres
+    restreignent les détections à une plage de frames (bornes incluses) ou de temps
+    (en secondes, convertie avec le FPS de la vidéo), à un track_id, et les paginent
+    par frame (offset, limit ; limit=0 ne renvoie que les statistiques). La plage est
+    résolue avec l'index des frames, sans lire les autres détections.
+
     Args:
         video_id: ID de la vidéo
 
     Returns:
-        Résultats complets de l'analyse
+        Résultats de l'analyse, avec "pagination" si des détections ont été filtrées
     """
     print(f"\nBACKEND - Requête GET /results/{video_id}")
     results_path = RESULTS_DIR / f"{video_id}.json"
@@ -298,25 +1070,247 @@ async def get_results(video_id: str):
     try:
         with open(results_path, "r") as f:
             results = json.load(f)
-        print(f"✓ Résultats chargés : {len(results.get('detections', []))} détections")
+
+        # Plage de temps convertie en frames (frame n affiché à n / fps secondes), croisée avec la plage de frames
+        fps = results.get("fps") or 30.0
+        if time_start is not None:
+            frame_start = max(frame_start or 0, math.ceil(round(time_start * fps, 6)))
+        if time_end is not None:
+            time_frame_end = math.floor(round(time_end * fps, 6))
+            frame_end = time_frame_end if frame_end is None else min(frame_end, time_frame_end)
+
+        query = {"frame_start": frame_start, "frame_end": frame_end, "track_id": track_id,
+                 "offset": offset, "limit": limit}
+        results["detections"], total = await run_in_threadpool(load_detections, video_id, results, **query)
+        if offset or any(value is not None for value in (frame_start, frame_end, track_id, limit)):
+            next_offset = offset + len(results["detections"])
+            results["pagination"] = {
+                **query,
+                "total": total,
+                "next_offset": next_offset if next_offset < total else None
+            }
+        print(f"✓ Résultats chargés : {len(results['detections'])} détections")
         print(f"  Stats : {results.get('stats')}")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"ERREUR : Impossible de lire les résultats - {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erreur lors de la lecture des résultats : {str(e)}")
 
-    return results
+    # Contenu déjà sérialisable : JSONResponse évite la conversion jsonable_encoder, coûteuse par box
+    return JSONResponse(results)
+
+
+@app.get("/results/{video_id}/frames")
+async def get_result_frames(video_id: str):
+    """
+    Endpoint pour récupérer le nombre de personnes dans la zone, frame par frame
+
+    Réponse compacte (deux tableaux) pour la timeline, sans les boxes.
+
+    Args:
+        video_id: ID de la vidéo
+
+    Returns:
+        Frames ayant au moins une détection dans la zone et nombre de détections de chacun
+    """
+    results = read_results(video_id)
+
+    def count() -> Dict:
+        tracks, _ = load_tracks(video_id, results)
+        frames, counts = frame_counts(tracks, results.get("zone"))
+        return {"video_id": video_id, "fps": results.get("fps"), "frames": frames.tolist(), "counts": counts.tolist()}
+
+    return JSONResponse(await run_in_threadpool(count))
 
 
-@app.get("/videos/{video_id}")
-async def get_video(video_id: str):
+@app.get("/results/{video_id}/occupancy")
+async def get_result_occupancy(video_id: str):
     """
-    Endpoint pour récupérer une vidéo uploadée
+    Endpoint pour récupérer l'occupation de la zone seconde par seconde
 
     Args:
         video_id: ID de la vidéo
 
     Returns:
-        Fichier vidéo
+        Pour chaque seconde : maximum et moyenne de personnes par frame, personnes suivies distinctes
+    """
+    results = read_results(video_id)
+    aggregates = await run_in_threadpool(load_aggregates, video_id, results)
+    return {"video_id": video_id, "fps": aggregates["fps"], **aggregates["occupancy"]}
+
+
+@app.get("/results/{video_id}/tracks")
+async def get_result_tracks(video_id: str, counted_only: bool = False):
+    """
+    Endpoint pour récupérer le résumé de chaque personne suivie dans la zone
+
+    Args:
+        video_id: ID de la vidéo
+        counted_only: Seulement les tracks comptés dans total_people (présence minimale atteinte)
+
+    Returns:
+        Premier et dernier frame, temps de présence et nombre de passages par track_id
+    """
+    results = read_results(video_id)
+    aggregates = await run_in_threadpool(load_aggregates, video_id, results)
+    tracks = [track for track in aggregates["tracks"] if track["counted"] or not counted_only]
+    return {"video_id": video_id, "fps": aggregates["fps"], "min_track_frames": aggregates["min_track_frames"],
+            "tracks": tracks}
+
+
+@app.get("/results/{video_id}/events")
+async def get_result_events(video_id: str):
+    """
+    Endpoint pour récupérer les entrées et sorties de la zone
+
+    Args:
+        video_id: ID de la vidéo
+
+    Returns:
+        Événements "entry" / "exit" des tracks comptés, triés par frame
+    """
+    results = read_results(video_id)
+    aggregates = await run_in_threadpool(load_aggregates, video_id, results)
+    return {"video_id": video_id, "fps": aggregates["fps"], "exit_grace_frames": aggregates["exit_grace_frames"],
+            "events": aggregates["events"]}
+
+
+@app.get("/results/{video_id}/heatmap")
+async def get_result_heatmap(video_id: str, format: str = Query("json", pattern="^(json|png)$")):
+    """
+    Endpoint pour récupérer la carte de chaleur de la zone (où les personnes se tiennent)
+
+    Args:
+        video_id: ID de la vidéo
+        format: "json" (grille de valeurs) ou "png" (image transparente à la taille du frame)
+
+    Returns:
+        Temps de présence cumulé (secondes) par cellule de HEATMAP_CELL_PIXELS pixels
+    """
+    results = read_results(video_id)
+    spatial_dir = await run_in_threadpool(load_spatial, video_id, results)
+    if format == "png":
+        return FileResponse(spatial_dir / "heatmap.png", media_type="image/png")
+
+    with open(spatial_dir / "spatial.json", "r") as f:
+        settings = json.load(f)
+    heatmap = np.load(spatial_dir / "heatmap.npy")
+    return {
+        "video_id": video_id,
+        "width": settings["width"],
+        "height": settings["height"],
+        "cell_size": settings["cell_size"],
+        "grid_width": heatmap.shape[1],
+        "grid_height": heatmap.shape[0],
+        "max_seconds": round(float(heatmap.max()), 3) if heatmap.size else 0.0,
+        "values": np.round(heatmap, 3).tolist()
+    }
+
+
+@app.get("/results/{video_id}/trajectories")
+async def get_result_trajectories(video_id: str, format: str = Query("json", pattern="^(json|png)$")):
+    """
+    Endpoint pour récupérer le trajet de chaque personne suivie dans la zone
+
+    Args:
+        video_id: ID de la vidéo
+        format: "json" (polylignes) ou "png" (image transparente à la taille du frame, une couleur par track)
+
+    Returns:
+        Par track_id : premier et dernier frame, durée et points (x, y) au sol
+    """
+    results = read_results(video_id)
+    spatial_dir = await run_in_threadpool(load_spatial, video_id, results)
+    if format == "png":
+        return FileResponse(spatial_dir / "trajectories.png", media_type="image/png")
+
+    with open(spatial_dir / "spatial.json", "r") as f:
+        settings = json.load(f)
+    with open(spatial_dir / "trajectories.json", "r") as f:
+        polylines = json.load(f)
+    return {
+        "video_id": video_id,
+        "width": settings["width"],
+        "height": settings["height"],
+        "trajectories": polylines
+    }
+
+
+@app.post("/results/{video_id}/zones")
+async def evaluate_zones(video_id: str, query: ZoneQuery):
+    """
+    Endpoint pour évaluer une ou plusieurs zones sur une analyse terminée
+
+    Les statistiques sont recalculées à partir des tracks plein cadre sauvegardés
+    (filtrage vectorisé), sans relire la vidéo ni relancer l'inférence. Les zones
+    polygonales sont évaluées toutes ensemble sur un masque rastérisé.
+
+    Args:
+        video_id: ID de la vidéo
+        query: Zones rectangulaires et polygonales à évaluer, et si les détections
+            de chaque zone sont renvoyées
+
+    Returns:
+        Statistiques (et détections) par zone, dans l'ordre de la requête :
+        "zones" pour les rectangles, "polygons" pour les zones polygonales
+    """
+    if not query.zones and not query.polygons:
+        raise HTTPException(status_code=422, detail="Aucune zone à évaluer")
+
+    results = read_results(video_id)
+    tracks_dir = tracks_dir_for(video_id)
+    if not tracks_dir.exists():
+        raise HTTPException(status_code=409, detail="Analyse sans détections plein cadre : relancer l'analyse")
+
+    # Analyse recadrée : rien n'a été détecté hors de la région inférée
+    region = results.get("inference_region")
+    zones = [zone.model_dump() for zone in query.zones]
+    polygons = [polygon.model_dump() for polygon in query.polygons]
+    bounds = zones + [polygon_bounds(polygon["points"]) for polygon in polygons]
+    if region and not all(contains_zone(region, zone) for zone in bounds):
+        raise HTTPException(status_code=422,
+                            detail=f"Zone hors de la région analysée (x {region['x1']:.0f}-{region['x2']:.0f}, "
+                                   f"y {region['y1']:.0f}-{region['y2']:.0f})")
+
+    def evaluate() -> Tuple[List[Dict], List[Dict]]:
+        tracks = TrackTable.load(tracks_dir)
+        fps = results.get("fps", 30.0)
+
+        def entry(zone_tracks: TrackTable, **zone) -> Dict:
+            evaluated = {**zone, "stats": zone_statistics(zone_tracks, fps, MIN_TRACK_SECONDS)}
+            if query.include_detections:
+                evaluated["detections"] = zone_tracks.to_detections()
+            return evaluated
+
+        rectangles = [entry(tracks.select(zone_mask(tracks, zone)), zone=zone) for zone in zones]
+        shapes = [entry(polygon_tracks, **polygon)
+                  for polygon, polygon_tracks in zip(polygons, polygon_zone_tables(tracks, polygons))]
+        return rectangles, shapes
+
+    started = time.perf_counter()
+    evaluated, evaluated_polygons = await run_in_threadpool(evaluate)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"✓ {len(zones) + len(polygons)} zone(s) évaluée(s) pour {video_id} en {elapsed_ms:.1f} ms")
+
+    return {
+        "video_id": video_id,
+        "zones": evaluated,
+        "polygons": evaluated_polygons,
+        "elapsed_ms": round(elapsed_ms, 2)
+    }
+
+
+@app.api_route("/videos/{video_id}", methods=["GET", "HEAD"])
+async def get_video(video_id: str, request: Request):
+    """
+    Endpoint pour récupérer une vidéo uploadée (requêtes partielles acceptées)
+
+    Args:
+        video_id: ID de la vidéo
+
+    Returns:
+        Fichier vidéo (200), plage demandée (206) ou 304 si la copie du client est à jour
     """
     # Trouver le fichier vidéo
     video_files = list(UPLOAD_DIR.glob(f"{video_id}.*"))
@@ -325,42 +1319,64 @@ async def get_video(video_id: str):
 
     video_path = video_files[0]
 
-    return FileResponse(
-        video_path,
-        media_type="video/mp4",
-        filename=f"{video_id}{video_path.suffix}"
-    )
+    return file_response(request, video_path, "video/mp4", filename=f"{video_id}{video_path.suffix}")
 
 
-@app.get("/annotated-videos/{video_id}")
-async def get_annotated_video(video_id: str):
+@app.api_route("/annotated-videos/{video_id}", methods=["GET", "HEAD"])
+async def get_annotated_video(video_id: str, request: Request):
     """
     Endpoint pour récupérer la vidéo annotée avec les bounding boxes
 
+    Le lecteur du navigateur demande des plages d'octets (206) : la lecture
+    démarre sans télécharger toute la vidéo et la recherche est immédiate.
+
     Args:
         video_id: ID de la vidéo
 
     Returns:
-        Fichier vidéo annoté
+        Fichier vidéo annoté (200), plage demandée (206) ou 304 si la copie du client est à jour
     """
     # Le chemin de la vidéo annotée est dans le volume partagé
-    annotated_path = Path("/app/shared/annotated") / f"{video_id}_annotated.mp4"
+    annotated_path = ANNOTATED_DIR / f"{video_id}_annotated.mp4"
 
     if not annotated_path.exists():
         raise HTTPException(status_code=404, detail="Vidéo annotée non trouvée")
 
-    return FileResponse(
-        annotated_path,
-        media_type="video/mp4",
-        filename=f"{video_id}_annotated.mp4"
-    )
+    return file_response(request, annotated_path, "video/mp4", filename=f"{video_id}_annotated.mp4")
+
+
+@app.get("/annotated-videos/{video_id}/hls/{filename}")
+async def get_annotated_video_hls(video_id: str, filename: str, request: Request):
+    """
+    Endpoint pour lire la vidéo annotée en HLS (playlist index.m3u8 puis segments .ts)
+
+    Disponible si le service IA a découpé la vidéo (HLS_PACKAGING_ENABLED) :
+    "hls_playlist_path" est alors renseigné dans les résultats.
+
+    Args:
+        video_id: ID de la vidéo
+        filename: index.m3u8 ou nom d'un segment
+
+    Returns:
+        Playlist ou segment MPEG-TS
+    """
+    media_type = HLS_MEDIA_TYPES.get(Path(filename).suffix)
+    if media_type is None or Path(filename).name != filename:
+        raise HTTPException(status_code=404, detail="Fichier HLS non trouvé")
+
+    hls_path = hls_dir_for(video_id) / filename
+    if not hls_path.exists():
+        raise HTTPException(status_code=404, detail="Fichier HLS non trouvé")
+
+    return file_response(request, hls_path, media_type)
 
 
-@app.get("/export-video/{video_id}")
-async def export_video(video_id: str):
+@app.api_route("/export-video/{video_id}", methods=["GET", "HEAD"])
+async def export_video(video_id: str, request: Request):
     """
     Endpoint pour télécharger la vidéo annotée (export)
     Ajoute header Content-Disposition pour forcer le téléchargement
+    (un téléchargement interrompu reprend avec une requête partielle)
 
     Args:
         video_id: ID de la vidéo
@@ -373,12 +1389,8 @@ async def export_video(video_id: str):
     if not annotated_path.exists():
         raise HTTPException(status_code=404, detail="Vidéo annotée non trouvée")
 
-    return FileResponse(
-        annotated_path,
-        media_type="video/mp4",
-        filename=f"visiontrack_analysis_{video_id}.mp4",
-        headers={"Content-Disposition": f'attachment; filename="visiontrack_analysis_{video_id}.mp4"'}
-    )
+    return file_response(request, annotated_path, "video/mp4",
+                         filename=f"visiontrack_analysis_{video_id}.mp4", attachment=True)
 
 
 @app.get("/export-results/{video_id}")
@@ -407,6 +1419,51 @@ async def export_results(video_id: str):
 
 # ========== Fonctions utilitaires ==========
 
+async def run_ia_job(ia_request_data: Dict,
+                     on_progress: Optional[Callable[[Dict], None]] = None,
+                     endpoint: str = "/detect") -> Dict:
+    """
+    Soumet un job au service IA (détection, ou rendu via endpoint="/render") et attend sa fin
+
+    Le service IA répond immédiatement avec un job_id (202) ; l'état est ensuite
+    interrogé toutes les IA_POLL_INTERVAL secondes via GET /jobs/{job_id}
+    et transmis à on_progress à chaque interrogation.
+
+    Returns:
+        Résultat du job (detections, fps, annotated_video_path...)
+
+    Raises:
+        HTTPException: si le job échoue côté service IA
+    """
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await client.post(f"{IA_SERVICE_URL}{endpoint}", json=ia_request_data)
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+        print(f"✓ Job IA créé : {job_id}")
+
+        while True:
+            await asyncio.sleep(IA_POLL_INTERVAL)
+            response = await client.get(f"{IA_SERVICE_URL}/jobs/{job_id}")
+            response.raise_for_status()
+            job = response.json()
+
+            if job["status"] == "completed":
+                return job["result"]
+            if job["status"] == "failed":
+                error = job.get("error") or {}
+                print(f"ERREUR : Job IA {job_id} échoué - {error.get('detail')}")
+                raise HTTPException(
+                    status_code=error.get("status_code", 500),
+                    detail=f"Erreur du service IA : {error.get('detail', 'job échoué')}"
+                )
+
+            if on_progress:
+                on_progress(job)
+
+            progress = job.get("progress", {})
+            print(f"Job IA {job_id} : {job['status']} ({progress.get('frame', 0)}/{progress.get('total_frames', 0)} frames)")
+
+
 def remap_track_ids(detections: List[Dict]) -> List[Dict]:
     """
     Remappe les track_ids pour qu'ils commencent à 1 au lieu de valeurs élevées.
@@ -433,79 +1490,23 @@ def remap_track_ids(detections: List[Dict]) -> List[Dict]:
     return detections
 
 
-def calculate_statistics(detections: List[Dict]) -> Dict:
-    """Calcule les statistiques à partir des détections."""
-    if not detections:
-        return {
-            "total_people": 0,
-            "max_people_simultaneous": 0,
-            "frame_of_max": 0
-        }
-
-    # Compter les apparitions de chaque track_id
-    track_id_counts = {}
-    max_people_with_ids = 0
-    max_people_total = 0
-    frame_of_max = 0
-
-    for detection in detections:
-        frame_num = detection["frame"]
-        boxes = detection.get("boxes", [])
-
-        # Compter séparément les boxes avec et sans track_id
-        boxes_with_ids = [b for b in boxes if b.get("track_id") is not None]
-        num_people_with_ids = len(boxes_with_ids)
-        num_people_total = len(boxes)
-
-        # Utiliser le max de boxes avec IDs pour les frames trackées
-        if num_people_with_ids > max_people_with_ids:
-            max_people_with_ids = num_people_with_ids
-
-        # Garder aussi le max total pour fallback
-        if num_people_total > max_people_total:
-            max_people_total = num_people_total
-            frame_of_max = frame_num
-
-        # Compter les apparitions de chaque track_id
-        for box in boxes_with_ids:
-            track_id = box.get("track_id")
-            if track_id is not None:
-                track_id_counts[track_id] = track_id_counts.get(track_id, 0) + 1
-
-    # Filtrer les track_ids qui apparaissent moins de 20 frames (~0.7 sec à 30fps)
-    # Compromis entre précision (vidéo complète) et détection (zones de passage)
-    MIN_FRAMES_THRESHOLD = 20
-    valid_track_ids = {tid for tid, count in track_id_counts.items() if count >= MIN_FRAMES_THRESHOLD}
-
-    # Si on a des track_ids valides, utiliser le nombre d'IDs uniques filtrés
-    # Sinon, utiliser le max simultané (meilleure estimation)
-    if valid_track_ids:
-        total_people = len(valid_track_ids)
-        max_people = max(max_people_with_ids, max_people_total)
-    else:
-        total_people = max_people_total
-        max_people = max_people_total
-
-    return {
-        "total_people": total_people,
-        "max_people_simultaneous": max_people,
-        "frame_of_max": frame_of_max
-    }
-
-
-
 @app.delete("/analysis/{video_id}")
 async def delete_analysis(video_id: str):
-    """Supprime les fichiers de resultats (video annotee + JSON)."""
+    """Supprime les fichiers de resultats (video annotee + JSON, et video source conservee pour un rendu)."""
     annotated_path = ANNOTATED_DIR / f"{video_id}_annotated.mp4"
     results_path = RESULTS_DIR / f"{video_id}.json"
 
     deleted_any = False
 
-    for file_path in (annotated_path, results_path):
+    for file_path in (annotated_path, results_path, tracks_dir_for(video_id), aggregates_path_for(video_id),
+                      spatial_dir_for(video_id), hls_dir_for(video_id), upload_hash_path(video_id),
+                      *UPLOAD_DIR.glob(f"{video_id}.*")):
         if file_path.exists():
             try:
-                file_path.unlink()
+                if file_path.is_dir():
+                    shutil.rmtree(file_path)
+                else:
+                    file_path.unlink()
                 deleted_any = True
             except Exception as exc:
                 print(f"ATTENTION : impossible de supprimer {file_path} - {exc}")
@@ -0,0 +1,201 @@
+"""
+Cache des résultats d'analyse du backend VisionTrack
+Une vidéo déjà analysée avec les mêmes paramètres (contenu identique, zone,
+modèle, seuils, tracker, options d'inférence) est servie depuis le cache au lieu
+de repasser par l'inférence YOLO. Les entrées vivent sur le volume partagé et
+sont évincées par ordre d'utilisation (LRU) au-delà d'une taille maximale.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Taille des blocs lus pour hacher une vidéo déjà sur disque
+HASH_CHUNK_BYTES = 1024 * 1024
+
+RESULTS_FILE = "results.json"
+ANNOTATED_FILE = "annotated.mp4"
+TRACKS_DIR = "tracks"
+HLS_DIR = "hls"
+
+
+def file_sha256(path: Path) -> str:
+    """Empreinte SHA-256 du contenu d'un fichier (lecture par blocs)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def link_or_copy(source: Path, target: Path) -> None:
+    """Lien physique (même volume, aucune copie) ou copie à défaut, fichier par fichier pour un répertoire"""
+    if source.is_dir():
+        shutil.rmtree(target, ignore_errors=True)
+        target.mkdir()
+        for path in source.iterdir():
+            link_or_copy(path, target / path.name)
+        return
+
+    target.unlink(missing_ok=True)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def annotated_hls_dir(annotated_video: Path) -> Path:
+    """Découpage HLS écrit par le service IA à côté de la vidéo annotée"""
+    return annotated_video.with_name(f"{annotated_video.stem}_hls")
+
+
+def entry_size(entry_dir: Path) -> int:
+    """Taille sur disque d'une entrée du cache (fichiers des sous-répertoires compris)"""
+    return sum(path.stat().st_size for path in entry_dir.rglob("*") if path.is_file())
+
+
+class ResultCache:
+    """
+    Cache LRU borné en taille : une entrée = résultats JSON + tracks plein cadre + vidéo annotée
+    éventuelle (et son découpage HLS)
+
+    La date de modification de results.json sert de date de dernière utilisation
+    (mise à jour à chaque succès) : l'état du cache est entièrement sur disque et
+    survit aux redémarrages du backend. Les compteurs sont ceux du processus.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.enabled:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def make_key(content_hash: str, zone: Optional[Dict], detection_config: Dict,
+                 polygons: Optional[List[Dict]] = None) -> str:
+        """
+        Clé d'une analyse : contenu de la vidéo, zone et zones polygonales (au
+        dixième de pixel) et paramètres effectifs de la détection (modèle, seuils,
+        tracker, options)
+        """
+        rounded_zone = {name: round(float(value), 1) for name, value in zone.items()} if zone else None
+        key_data = {"content": content_hash, "zone": rounded_zone, "detection": detection_config}
+        # Absentes de la clé sans zone polygonale : les entrées existantes restent valides
+        if polygons:
+            key_data["polygons"] = [
+                {"name": polygon["name"], "points": [[round(float(x), 1), round(float(y), 1)] for x, y in polygon["points"]]}
+                for polygon in polygons
+            ]
+        return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Entrée du cache (None si absente) :
+        {"results": ..., "annotated_video": Path ou None, "tracks": Path ou None, "hls": Path ou None}
+
+        Compte un succès ou un échec et marque l'entrée comme récemment utilisée.
+        """
+        results_path = self.cache_dir / key / RESULTS_FILE
+        try:
+            with open(results_path, "r") as f:
+                results = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        os.utime(results_path)
+        self.hits += 1
+        annotated_path = self.cache_dir / key / ANNOTATED_FILE
+        tracks_path = self.cache_dir / key / TRACKS_DIR
+        hls_path = self.cache_dir / key / HLS_DIR
+        return {
+            "results": results,
+            "annotated_video": annotated_path if annotated_path.exists() else None,
+            "tracks": tracks_path if tracks_path.exists() else None,
+            "hls": hls_path if hls_path.exists() else None,
+        }
+
+    def put(self, key: str, results: Dict, annotated_video: Optional[Path] = None,
+            tracks: Optional[Path] = None) -> None:
+        """Enregistre (ou remplace) une entrée puis évince les plus anciennes si besoin"""
+        work_dir = self.cache_dir / f".tmp-{uuid.uuid4()}"
+        work_dir.mkdir()
+        try:
+            with open(work_dir / RESULTS_FILE, "w") as f:
+                json.dump(results, f)
+            if annotated_video is not None and annotated_video.exists():
+                link_or_copy(annotated_video, work_dir / ANNOTATED_FILE)
+                if annotated_hls_dir(annotated_video).exists():
+                    link_or_copy(annotated_hls_dir(annotated_video), work_dir / HLS_DIR)
+            if tracks is not None and tracks.exists():
+                link_or_copy(tracks, work_dir / TRACKS_DIR)
+
+            entry_dir = self.cache_dir / key
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            work_dir.rename(entry_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        print(f"✓ Résultats mis en cache : {key[:12]}")
+        self.evict()
+
+    def add_annotated_video(self, key: str, annotated_video: Path) -> None:
+        """Ajoute la vidéo annotée rendue à la demande (et son découpage HLS) à une entrée existante"""
+        entry_dir = self.cache_dir / key
+        if (entry_dir / RESULTS_FILE).exists() and annotated_video.exists():
+            link_or_copy(annotated_video, entry_dir / ANNOTATED_FILE)
+            if annotated_hls_dir(annotated_video).exists():
+                link_or_copy(annotated_hls_dir(annotated_video), entry_dir / HLS_DIR)
+            self.evict()
+
+    def evict(self) -> None:
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes"""
+        entries = []
+        for entry_dir in self.cache_dir.iterdir():
+            results_path = entry_dir / RESULTS_FILE
+            if entry_dir.name.startswith(".") or not results_path.exists():
+                continue
+            size = entry_size(entry_dir)
+            entries.append((results_path.stat().st_mtime, size, entry_dir))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+            self.evictions += 1
+            print(f"INFO : Entrée du cache évincée : {entry_dir.name[:12]} ({size} octets)")
+
+    def stats(self) -> Dict:
+        """Compteurs et occupation du cache"""
+        entries = 0
+        size = 0
+        if self.enabled:
+            for entry_dir in self.cache_dir.iterdir():
+                if entry_dir.name.startswith(".") or not (entry_dir / RESULTS_FILE).exists():
+                    continue
+                entries += 1
+                size += entry_size(entry_dir)
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "size_bytes": size,
+            "max_bytes": self.max_bytes,
+        }
@@ -0,0 +1,171 @@
+"""
+Analyses spatiales d'une analyse VisionTrack, calculées à partir des tracks sauvegardés
+- carte de chaleur : temps de présence (personnes × secondes) par cellule d'une
+  grille sous-échantillonnée du frame, accumulé en une passe NumPy (np.bincount) ;
+- trajectoires : une polyligne par track, sous-échantillonnée.
+La position d'une personne est le milieu du bas de sa box (ses pieds) : c'est
+l'endroit où elle se tient, indépendamment de sa taille à l'image.
+
+Les images PNG (palette + transparence, encodées avec zlib) sont à la taille
+du frame, prêtes à être superposées à la vidéo ; aucune nouvelle lecture de
+la vidéo n'est nécessaire.
+"""
+
+import colorsys
+import struct
+import zlib
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from tracks import NO_TRACK_ID, TrackTable
+
+# Palette de la carte de chaleur : bleu -> cyan -> jaune -> rouge (index 0 transparent)
+HEATMAP_STOPS = np.array([
+    [0, 0, 255],
+    [0, 255, 255],
+    [255, 255, 0],
+    [255, 0, 0],
+], dtype=np.float64)
+
+
+def foot_points(table: TrackTable) -> Tuple[np.ndarray, np.ndarray]:
+    """Position au sol de chaque box : milieu du bord inférieur"""
+    return (np.asarray(table.x1, dtype=np.float64) + np.asarray(table.x2, dtype=np.float64)) / 2, \
+        np.asarray(table.y2, dtype=np.float64)
+
+
+def density_heatmap(table: TrackTable, width: int, height: int, cell_size: int, fps: float) -> np.ndarray:
+    """
+    Temps de présence par cellule (secondes), grille de ceil(hauteur / cell_size) × ceil(largeur / cell_size)
+
+    Chaque box ajoute 1 / fps à la cellule de ses pieds (points hors du frame ramenés au bord).
+    """
+    grid_width = max(1, -(-width // cell_size))
+    grid_height = max(1, -(-height // cell_size))
+    x, y = foot_points(table)
+    column = np.clip((x // cell_size).astype(np.int64), 0, grid_width - 1)
+    row = np.clip((y // cell_size).astype(np.int64), 0, grid_height - 1)
+    counts = np.bincount(row * grid_width + column, minlength=grid_width * grid_height)
+    return (counts / (fps or 30.0)).astype(np.float32).reshape(grid_height, grid_width)
+
+
+def trajectories(table: TrackTable, fps: float, max_points: int) -> List[Dict]:
+    """
+    Polyligne de chaque track (positions au sol dans l'ordre des frames)
+
+    Au-delà de max_points positions, des points régulièrement espacés sont
+    retenus (premier et dernier compris).
+    """
+    tracked = np.asarray(table.track_id) != NO_TRACK_ID
+    x, y = foot_points(table)
+    order = np.lexsort((np.asarray(table.frame)[tracked], np.asarray(table.track_id)[tracked]))
+    frames = np.asarray(table.frame)[tracked][order]
+    tracks = np.asarray(table.track_id)[tracked][order]
+    x, y = x[tracked][order], y[tracked][order]
+    if len(frames) == 0:
+        return []
+
+    starts = np.flatnonzero(np.concatenate(([True], tracks[1:] != tracks[:-1])))
+    ends = np.append(starts[1:], len(frames))
+
+    polylines = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        rows = np.arange(start, end)
+        if len(rows) > max_points:
+            rows = rows[np.round(np.linspace(0, len(rows) - 1, max_points)).astype(np.int64)]
+        polylines.append({
+            "track_id": int(tracks[start]),
+            "first_frame": int(frames[start]),
+            "last_frame": int(frames[end - 1]),
+            "duration_seconds": round((int(frames[end - 1]) - int(frames[start]) + 1) / (fps or 30.0), 3),
+            "points": np.round(np.column_stack((x[rows], y[rows])), 1).tolist(),
+        })
+    return polylines
+
+
+def heatmap_png(heatmap: np.ndarray, width: int, height: int, cell_size: int) -> bytes:
+    """
+    Carte de chaleur en PNG à la taille du frame (exactement height × width)
+
+    Chaque cellule couvre cell_size pixels, comme dans density_heatmap : la
+    dernière ligne et la dernière colonne sont tronquées au bord du frame.
+    Échelle en racine carrée (les zones de passage restent visibles à côté des
+    zones d'attente) ; les cellules sans présence sont transparentes.
+    """
+    peak = float(heatmap.max()) if heatmap.size else 0.0
+    indices = np.zeros(heatmap.shape, dtype=np.uint8)
+    if peak > 0:
+        scaled = np.sqrt(heatmap / peak)
+        indices = np.where(heatmap > 0, 1 + np.round(scaled * 254), 0).astype(np.uint8)
+
+    pixels = np.zeros((height, width), dtype=np.uint8)
+    cells = np.repeat(np.repeat(indices, cell_size, axis=0), cell_size, axis=1)[:height, :width]
+    pixels[:cells.shape[0], :cells.shape[1]] = cells
+    return encode_indexed_png(pixels, heatmap_palette())
+
+
+def trajectories_png(polylines: List[Dict], width: int, height: int) -> bytes:
+    """
+    Trajectoires en PNG à la taille du frame (une couleur par track, fond transparent)
+
+    Chaque segment est échantillonné au pixel près puis les pixels sont posés
+    en une seule affectation indexée.
+    """
+    pixels = np.zeros((height, width), dtype=np.uint8)
+    columns, rows, colors = [], [], []
+    for polyline in polylines:
+        points = np.asarray(polyline["points"], dtype=np.float64)
+        if len(points) < 2:
+            continue
+        # Nombre d'échantillons par segment : sa longueur en pixels (au moins 1)
+        starts, steps = points[:-1], np.diff(points, axis=0)
+        samples = np.maximum(1, np.ceil(np.abs(steps).max(axis=1))).astype(np.int64)
+        segment = np.repeat(np.arange(len(starts)), samples)
+        offsets = np.arange(len(segment)) - np.repeat(np.cumsum(samples) - samples, samples)
+        fraction = (offsets / samples[segment])[:, None]
+        line = np.vstack((starts[segment] + steps[segment] * fraction, points[-1:]))
+        columns.append(line[:, 0])
+        rows.append(line[:, 1])
+        colors.append(np.full(len(line), 1 + polyline["track_id"] % 255, dtype=np.uint8))
+
+    if columns:
+        column = np.clip(np.concatenate(columns).astype(np.int64), 0, width - 1)
+        row = np.clip(np.concatenate(rows).astype(np.int64), 0, height - 1)
+        pixels[row, column] = np.concatenate(colors)
+    return encode_indexed_png(pixels, track_palette())
+
+
+def heatmap_palette() -> np.ndarray:
+    """256 couleurs RGB : index 0 inutilisé (transparent), 1 à 255 du froid au chaud"""
+    position = np.linspace(0, len(HEATMAP_STOPS) - 1, 255)
+    lower = np.floor(position).astype(np.int64).clip(0, len(HEATMAP_STOPS) - 2)
+    fraction = (position - lower)[:, None]
+    colors = HEATMAP_STOPS[lower] * (1 - fraction) + HEATMAP_STOPS[lower + 1] * fraction
+    return np.vstack(([0, 0, 0], colors)).round().astype(np.uint8)
+
+
+def track_palette() -> np.ndarray:
+    """256 couleurs RGB vives et distinctes (teintes espacées du nombre d'or), index 0 transparent"""
+    colors = [colorsys.hsv_to_rgb((index * 0.618033988749895) % 1.0, 0.85, 1.0) for index in range(255)]
+    return np.vstack(([0, 0, 0], np.array(colors) * 255)).round().astype(np.uint8)
+
+
+def encode_indexed_png(pixels: np.ndarray, palette: np.ndarray) -> bytes:
+    """PNG 8 bits à palette (index 0 transparent), sans dépendance d'image"""
+    height, width = pixels.shape
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    # Chaque ligne est précédée de son type de filtre (0 = aucun)
+    scanlines = np.hstack((np.zeros((height, 1), dtype=np.uint8), pixels)).tobytes()
+    transparency = bytes([0]) + bytes([255]) * (len(palette) - 1)
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        chunk(b"PLTE", palette.tobytes()),
+        chunk(b"tRNS", transparency),
+        chunk(b"IDAT", zlib.compress(scanlines, 1)),
+        chunk(b"IEND", b""),
+    ))
@@ -0,0 +1,123 @@
+"""
+Diffusion des vidéos du backend VisionTrack
+Réponses fichier avec requêtes partielles (Range, 206) et validation de cache
+(ETag, Last-Modified, 304) : le navigateur lit et se déplace dans une vidéo
+sans la télécharger entièrement, et ne la retélécharge pas si elle n'a pas changé.
+"""
+
+import hashlib
+import re
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import aiofiles
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+# Taille des blocs lus pour une réponse partielle
+STREAM_CHUNK_BYTES = 256 * 1024
+
+# Une seule plage par requête (les lecteurs vidéo n'en demandent pas davantage)
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def file_validators(path: Path) -> Dict[str, str]:
+    """ETag (taille + date de modification) et Last-Modified d'un fichier"""
+    stat = path.stat()
+    etag = hashlib.md5(f"{stat.st_mtime_ns}-{stat.st_size}".encode()).hexdigest()
+    return {"etag": f'"{etag}"', "last-modified": formatdate(stat.st_mtime, usegmt=True)}
+
+
+def is_not_modified(request: Request, validators: Dict[str, str]) -> bool:
+    """La copie du client est-elle à jour (If-None-Match prioritaire sur If-Modified-Since) ?"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or validators["etag"] in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(validators["last-modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Plage demandée (début, fin incluse), bornée à la taille du fichier
+
+    Returns:
+        None si l'en-tête n'est pas une plage simple (le fichier entier est alors renvoyé)
+
+    Raises:
+        HTTPException 416: plage hors du fichier
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffixe : les N derniers octets
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Plage demandée hors du fichier",
+                            headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+async def read_range(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+    """Octets start à end (inclus) du fichier, par blocs de STREAM_CHUNK_BYTES"""
+    remaining = end - start + 1
+    async with aiofiles.open(path, "rb") as source:
+        await source.seek(start)
+        while remaining > 0:
+            chunk = await source.read(min(STREAM_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def file_response(request: Request, path: Path, media_type: str, filename: Optional[str] = None,
+                  attachment: bool = False) -> Response:
+    """
+    Réponse fichier avec Range (206), ETag / Last-Modified (304)
+
+    Sans en-tête Range (ou si If-Range ne correspond plus), le fichier entier
+    est renvoyé (200). Le client revalide à chaque lecture (Cache-Control:
+    no-cache) : une vidéo rendue à nouveau sous le même identifiant change d'ETag.
+    """
+    validators = file_validators(path)
+    headers = {**validators, "accept-ranges": "bytes", "cache-control": "no-cache"}
+    if filename is not None:
+        disposition = "attachment" if attachment else "inline"
+        headers["content-disposition"] = f'{disposition}; filename="{filename}"'
+
+    if is_not_modified(request, validators):
+        return Response(status_code=304, headers=headers)
+
+    size = path.stat().st_size
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range in (validators["etag"], validators["last-modified"])):
+        byte_range = parse_range(range_header, size)
+
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        (start, end), status_code = byte_range, 206
+        headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+    headers["content-length"] = str(end - start + 1)
+    if request.method == "HEAD" or size == 0:
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(read_range(path, start, end), status_code=status_code, headers=headers,
+                             media_type=media_type)
@@ -0,0 +1,324 @@
+"""
+Détections suivies du backend VisionTrack sous forme de colonnes NumPy
+Le service IA renvoie toutes les personnes du frame ; le filtrage par zone et
+les statistiques sont calculés ici sur des tableaux (frame, x1, y1, x2, y2,
+confidence, track_id), en une passe vectorisée sans boucle Python par box.
+Une nouvelle zone se calcule donc à partir des tracks sauvegardés, sans
+nouvelle inférence. Les zones polygonales sont rastérisées en un masque de bits
+(un bit par zone) : toutes les boxes sont situées dans toutes les zones par une
+seule lecture du masque.
+
+Stockage : un répertoire par analyse, un fichier .npy par colonne (format NumPy
+brut, ~25 octets par box contre ~200 en JSON indenté), relu en mémoire mappée :
+seules les pages des colonnes et lignes utilisées sont lues sur disque. Un index
+des frames (premier rang de chaque frame) est écrit à côté : une plage de frames
+se résout par recherche dichotomique, sans parcourir les colonnes.
+"""
+
+import shutil
+import uuid
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# track_id des détections non suivies (None dans le JSON)
+NO_TRACK_ID = -1
+
+# Zones polygonales évaluables ensemble (un bit par zone dans ZoneRaster)
+MAX_POLYGON_ZONES = 32
+
+
+@dataclass
+class TrackTable:
+    """Une ligne par box, triées par frame"""
+    frame: np.ndarray       # int32
+    x1: np.ndarray          # float32
+    y1: np.ndarray
+    x2: np.ndarray
+    y2: np.ndarray
+    confidence: np.ndarray
+    track_id: np.ndarray    # int32, NO_TRACK_ID si non suivi
+
+    @classmethod
+    def from_detections(cls, detections: List[Dict]) -> "TrackTable":
+        """Conversion des détections par frame (format FrameDetection) en colonnes"""
+        rows = [
+            (detection["frame"], box["x1"], box["y1"], box["x2"], box["y2"], box["confidence"],
+             NO_TRACK_ID if box.get("track_id") is None else box["track_id"])
+            for detection in sorted(detections, key=lambda detection: detection["frame"])
+            for box in detection["boxes"]
+        ]
+        data = np.array(rows, dtype=np.float64).reshape(-1, 7)
+        return cls(
+            frame=data[:, 0].astype(np.int32),
+            x1=data[:, 1].astype(np.float32),
+            y1=data[:, 2].astype(np.float32),
+            x2=data[:, 3].astype(np.float32),
+            y2=data[:, 4].astype(np.float32),
+            confidence=data[:, 5].astype(np.float32),
+            track_id=data[:, 6].astype(np.int32),
+        )
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "TrackTable":
+        """Colonnes d'un répertoire écrit par save() (en lecture seule si mappées en mémoire)"""
+        mmap_mode = "r" if mmap else None
+        return cls(**{column.name: np.load(directory / f"{column.name}.npy", mmap_mode=mmap_mode)
+                      for column in fields(cls)})
+
+    def save(self, directory: Path) -> None:
+        """Écrit une colonne par fichier .npy dans `directory` (remplacé s'il existe)"""
+        # Répertoire temporaire puis renommage : les fichiers existants peuvent être
+        # des liens physiques vers le cache, qui ne doivent pas être réécrits en place
+        work_dir = directory.with_name(f".{directory.name}.tmp-{uuid.uuid4()}")
+        work_dir.mkdir()
+        try:
+            for column in fields(self):
+                np.save(work_dir / f"{column.name}.npy", np.ascontiguousarray(getattr(self, column.name)))
+            FrameIndex.build(self).save(work_dir)
+            shutil.rmtree(directory, ignore_errors=True)
+            work_dir.rename(directory)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def select(self, mask: np.ndarray) -> "TrackTable":
+        return TrackTable(**{column.name: getattr(self, column.name)[mask] for column in fields(self)})
+
+    def rows(self, start: int, end: int) -> "TrackTable":
+        """Lignes start à end (exclu), sans copie (vues sur les colonnes, mappées ou non)"""
+        return TrackTable(**{column.name: getattr(self, column.name)[start:end] for column in fields(self)})
+
+    def to_detections(self) -> List[Dict]:
+        """Détections par frame (format FrameDetection), frames sans box omis"""
+        if len(self) == 0:
+            return []
+
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(self.frame)) + 1))
+        ends = np.append(starts[1:], len(self))
+        columns = (self.x1.tolist(), self.y1.tolist(), self.x2.tolist(), self.y2.tolist(),
+                   self.confidence.tolist(), self.track_id.tolist())
+        x1, y1, x2, y2, confidence, track_id = columns
+        frames = self.frame.tolist()
+
+        return [
+            {
+                "frame": frames[start],
+                "boxes": [
+                    {
+                        "x1": x1[row],
+                        "y1": y1[row],
+                        "x2": x2[row],
+                        "y2": y2[row],
+                        "confidence": confidence[row],
+                        "track_id": None if track_id[row] == NO_TRACK_ID else track_id[row],
+                    }
+                    for row in range(start, end)
+                ],
+            }
+            for start, end in zip(starts.tolist(), ends.tolist())
+        ]
+
+
+@dataclass
+class FrameIndex:
+    """Index des frames d'une TrackTable : frames présents et rang de leur première box"""
+    frames: np.ndarray      # int32, croissants
+    starts: np.ndarray      # int64, len(frames) + 1 (le dernier vaut le nombre de boxes)
+
+    FILES = ("index_frames.npy", "index_starts.npy")
+
+    @classmethod
+    def build(cls, table: TrackTable) -> "FrameIndex":
+        frames, first_rows = np.unique(np.asarray(table.frame), return_index=True)
+        return cls(frames=frames.astype(np.int32), starts=np.append(first_rows, len(table)).astype(np.int64))
+
+    @classmethod
+    def load(cls, directory: Path, table: TrackTable) -> "FrameIndex":
+        """Index écrit par TrackTable.save(), reconstruit à partir de la table s'il manque"""
+        paths = [directory / name for name in cls.FILES]
+        if not all(path.exists() for path in paths):
+            return cls.build(table)
+        return cls(frames=np.load(paths[0]), starts=np.load(paths[1]))
+
+    def save(self, directory: Path) -> None:
+        np.save(directory / self.FILES[0], self.frames)
+        np.save(directory / self.FILES[1], self.starts)
+
+    def row_range(self, frame_start: Optional[int] = None, frame_end: Optional[int] = None) -> Tuple[int, int]:
+        """Rangs des boxes des frames frame_start à frame_end (inclus), bornes absentes = sans limite"""
+        first = 0 if frame_start is None else int(np.searchsorted(self.frames, frame_start, side="left"))
+        last = len(self.frames) if frame_end is None else int(np.searchsorted(self.frames, frame_end, side="right"))
+        if last <= first:
+            return 0, 0
+        return int(self.starts[first]), int(self.starts[last])
+
+
+def query_detections(table: TrackTable, index: FrameIndex, zone: Optional[Dict],
+                     frame_start: Optional[int] = None, frame_end: Optional[int] = None,
+                     track_id: Optional[int] = None, offset: int = 0,
+                     limit: Optional[int] = None) -> Tuple[List[Dict], int]:
+    """
+    Détections (format FrameDetection) d'une plage de frames, filtrées par zone et track_id
+
+    La pagination porte sur les frames ayant au moins une box retenue.
+
+    Returns:
+        (détections de la page, nombre total de frames correspondants)
+    """
+    window = table.rows(*index.row_range(frame_start, frame_end))
+    mask = zone_mask(window, zone)
+    if track_id is not None:
+        mask &= np.asarray(window.track_id) == track_id
+    window = window.select(mask)
+
+    frames = np.unique(window.frame)
+    page = frames[offset:] if limit is None else frames[offset:offset + limit]
+    if len(page) == 0:
+        return [], len(frames)
+
+    first = int(np.searchsorted(window.frame, page[0], side="left"))
+    last = int(np.searchsorted(window.frame, page[-1], side="right"))
+    return window.rows(first, last).to_detections(), len(frames)
+
+
+def frame_counts(table: TrackTable, zone: Optional[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Frames ayant au moins une box dans la zone, et nombre de boxes de chacun"""
+    return np.unique(table.frame[zone_mask(table, zone)], return_counts=True)
+
+
+def zone_mask(table: TrackTable, zone: Optional[Dict]) -> np.ndarray:
+    """Boxes dont le centre est dans la zone rectangulaire (toutes si zone est None)"""
+    if zone is None:
+        return np.ones(len(table), dtype=bool)
+
+    center_x = (table.x1 + table.x2) / 2
+    center_y = (table.y1 + table.y2) / 2
+    return ((center_x >= zone["x1"]) & (center_x <= zone["x2"])
+            & (center_y >= zone["y1"]) & (center_y <= zone["y2"]))
+
+
+@dataclass
+class ZoneRaster:
+    """
+    Zones polygonales rastérisées sur leur rectangle englobant
+
+    Chaque pixel porte un entier dont le bit z vaut 1 si le pixel est dans la
+    zone z (test au centre du pixel, règle pair-impair : les polygones croisés
+    sont acceptés). Une box appartient aux zones du pixel qui contient son
+    centre : l'écart avec un test exact est au plus d'un demi-pixel, au bord.
+    """
+    bits: np.ndarray        # uint32 (hauteur, largeur)
+    x0: int                 # coin haut gauche du rectangle englobant (pixels du frame)
+    y0: int
+    count: int              # nombre de zones
+
+    @classmethod
+    def build(cls, polygons: List[List[Tuple[float, float]]]) -> "ZoneRaster":
+        """
+        Masque des polygones (sommets en pixels, au plus MAX_POLYGON_ZONES)
+
+        Remplissage ligne par ligne sans boucle par pixel : pour chaque ligne, les
+        abscisses où les arêtes la croisent inversent l'état intérieur / extérieur,
+        une somme cumulée le long de la ligne donne la parité de chaque pixel.
+        """
+        if len(polygons) > MAX_POLYGON_ZONES:
+            raise ValueError(f"Au plus {MAX_POLYGON_ZONES} zones polygonales")
+
+        vertices = [np.asarray(points, dtype=np.float64).reshape(-1, 2) for points in polygons]
+        every_vertex = np.concatenate(vertices) if vertices else np.zeros((1, 2))
+        x0, y0 = (max(0, int(np.floor(value))) for value in every_vertex.min(axis=0))
+        x_end, y_end = (int(np.ceil(value)) + 1 for value in every_vertex.max(axis=0))
+        width, height = max(1, x_end - x0), max(1, y_end - y0)
+        bits = np.zeros((height, width), dtype=np.uint32)
+
+        for zone, points in enumerate(vertices):
+            # Seules les lignes et colonnes du rectangle englobant de la zone sont parcourues
+            left, top = (max(0, int(np.floor(value))) for value in points.min(axis=0))
+            right, bottom = (int(np.ceil(value)) + 1 for value in points.max(axis=0))
+            zone_width, zone_height = right - left, bottom - top
+            start, end = points, np.roll(points, -1, axis=0)
+
+            row_centers = np.arange(top, bottom) + 0.5
+            crosses = (start[:, 1, None] <= row_centers) != (end[:, 1, None] <= row_centers)
+            edge, row = np.nonzero(crosses)
+            slope = (end[edge, 0] - start[edge, 0]) / (end[edge, 1] - start[edge, 1])
+            crossing_x = start[edge, 0] + (row_centers[row] - start[edge, 1]) * slope
+            # Premier pixel dont le centre est après le croisement
+            column = np.clip(np.ceil(crossing_x - 0.5).astype(np.int64) - left, 0, zone_width)
+
+            toggles = np.zeros((zone_height, zone_width + 1), dtype=np.int32)
+            np.add.at(toggles, (row, column), 1)
+            inside = (np.cumsum(toggles[:, :zone_width], axis=1) & 1).astype(np.uint32)
+            bits[top - y0:bottom - y0, left - x0:right - x0] |= inside << np.uint32(zone)
+
+        return cls(bits=bits, x0=x0, y0=y0, count=len(vertices))
+
+    def membership(self, table: TrackTable) -> np.ndarray:
+        """Appartenance (boxes, zones) : True si le centre de la box est dans la zone"""
+        column = np.floor((np.asarray(table.x1) + np.asarray(table.x2)) / 2).astype(np.int64) - self.x0
+        row = np.floor((np.asarray(table.y1) + np.asarray(table.y2)) / 2).astype(np.int64) - self.y0
+        height, width = self.bits.shape
+        covered = (column >= 0) & (column < width) & (row >= 0) & (row < height)
+
+        box_bits = np.zeros(len(table), dtype=np.uint32)
+        box_bits[covered] = self.bits[row[covered], column[covered]]
+        return ((box_bits[:, None] >> np.arange(self.count, dtype=np.uint32)) & 1).astype(bool)
+
+
+def zone_statistics(table: TrackTable, fps: float, min_track_seconds: float) -> Dict:
+    """
+    Statistiques d'une sélection de boxes (généralement celles d'une zone)
+
+    Le seuil de durée des tracks est exprimé en secondes (min_track_seconds) puis
+    converti en frames avec le FPS de la vidéo : il reste valable à 25, 30 ou 60 FPS,
+    et avec l'échantillonnage (frames intermédiaires interpolés par le service IA).
+    """
+    if len(table) == 0:
+        return {
+            "total_people": 0,
+            "max_people_simultaneous": 0,
+            "frame_of_max": 0
+        }
+
+    # Personnes par frame : le premier frame atteignant le maximum est retenu
+    frames, people_per_frame = np.unique(table.frame, return_counts=True)
+    peak = int(np.argmax(people_per_frame))
+    max_people = int(people_per_frame[peak])
+
+    # Tracks présents au moins min_track_seconds (~0.7 s, 20 frames à 30 FPS) :
+    # compromis entre précision (vidéo complète) et détection (zones de passage)
+    _, frames_per_track = np.unique(table.track_id[table.track_id != NO_TRACK_ID], return_counts=True)
+    min_frames_threshold = max(1, round(min_track_seconds * (fps or 30.0)))
+    valid_tracks = int(np.count_nonzero(frames_per_track >= min_frames_threshold))
+
+    # Sans track valide, le max simultané est la meilleure estimation
+    return {
+        "total_people": valid_tracks if valid_tracks else max_people,
+        "max_people_simultaneous": max_people,
+        "frame_of_max": int(frames[peak])
+    }
+
+
+def polygon_zone_tables(table: TrackTable, zones: List[Dict]) -> List[TrackTable]:
+    """Boxes de chaque zone polygonale (dict name, points), toutes zones évaluées en une passe"""
+    if not zones:
+        return []
+    membership = ZoneRaster.build([zone["points"] for zone in zones]).membership(table)
+    return [table.select(membership[:, index]) for index in range(len(zones))]
+
+
+def polygon_bounds(points: List[Tuple[float, float]]) -> Dict:
+    """Rectangle englobant d'une zone polygonale (même format qu'une zone rectangulaire)"""
+    xs, ys = zip(*points)
+    return {"x1": min(xs), "y1": min(ys), "x2": max(xs), "y2": max(ys)}
+
+
+def contains_zone(region: Dict, zone: Dict) -> bool:
+    """La zone est-elle entièrement dans la région (région inférée d'une analyse recadrée)"""
+    return (region["x1"] <= min(zone["x1"], zone["x2"]) and max(zone["x1"], zone["x2"]) <= region["x2"]
+            and region["y1"] <= min(zone["y1"], zone["y2"]) and max(zone["y1"], zone["y2"]) <= region["y2"])
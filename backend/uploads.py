@@ -0,0 +1,250 @@
+"""
+Upload de vidéos du backend VisionTrack
+Écriture en flux (mémoire constante) avec limite de taille appliquée pendant la
+réception, et protocole d'upload reprenable par morceaux (init, envoi, fin)
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict
+
+import aiofiles
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Marge pour l'enveloppe multipart (en-têtes, séparateurs) au-delà de la taille maximale de la vidéo
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+
+class RequestTooLarge(HTTPException):
+    """Corps de requête au-delà de la limite, levée pendant la réception"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Fichier trop volumineux (maximum {max_bytes // (1024 * 1024)} MB)")
+
+
+class BodySizeLimitMiddleware:
+    """
+    Refuse (413) les requêtes POST/PUT dont le corps dépasse max_bytes (+ enveloppe multipart)
+
+    Content-Length est vérifié avant toute lecture ; sans lui (envoi chunked), les
+    octets sont comptés à mesure qu'ils arrivent et la réception est interrompue
+    dès le dépassement, sans attendre la fin de l'upload.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.max_body_bytes = max_bytes + MULTIPART_OVERHEAD_BYTES
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT"):
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            error = RequestTooLarge(self.max_bytes)
+            await JSONResponse({"detail": error.detail}, status_code=413)(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    raise RequestTooLarge(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+async def write_stream(chunks: AsyncIterator[bytes], path: Path, max_bytes: int, append: bool = False,
+                       hasher=None) -> int:
+    """
+    Écrit un flux d'octets dans un fichier à mesure qu'il arrive
+
+    Si `hasher` (hashlib) est fourni, il reçoit exactement les octets écrits :
+    l'empreinte du contenu est calculée pendant l'upload, sans relire le fichier.
+
+    Raises:
+        RequestTooLarge: si le flux dépasse max_bytes (les octets déjà reçus restent écrits)
+
+    Returns:
+        Nombre d'octets écrits
+    """
+    written = 0
+    async with aiofiles.open(path, "ab" if append else "wb") as output:
+        async for chunk in chunks:
+            if written + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - written]
+                await output.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+                raise RequestTooLarge(max_bytes)
+            await output.write(chunk)
+            if hasher is not None:
+                hasher.update(chunk)
+            written += len(chunk)
+    return written
+
+
+async def read_file_chunks(file, chunk_size: int) -> AsyncIterator[bytes]:
+    """Lit un UploadFile par blocs de chunk_size octets"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+class ResumableUploadStore:
+    """
+    Sessions d'upload reprenable
+
+    Chaque session est un fichier partiel et ses métadonnées JSON dans
+    `<upload_dir>/.partial` : une session survit à une coupure réseau comme à un
+    redémarrage du backend. Le client envoie les morceaux à l'offset courant
+    (taille du fichier partiel) ; après une coupure, il relit cet offset et
+    reprend là où la réception s'est arrêtée.
+    """
+
+    def __init__(self, upload_dir: Path, max_bytes: int, chunk_size: int, ttl_seconds: float):
+        self.upload_dir = upload_dir
+        self.partial_dir = upload_dir / ".partial"
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.ttl_seconds = ttl_seconds
+        self.partial_dir.mkdir(parents=True, exist_ok=True)
+        # Un seul envoi à la fois par session
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Empreinte SHA-256 calculée au fil des morceaux (perdue si le backend redémarre)
+        self._hashers: Dict[str, Any] = {}
+
+    def create(self, filename: str, size: int, content_type: str) -> Dict:
+        """Ouvre une session (400 si ce n'est pas une vidéo, 413 si la taille annoncée dépasse la limite)"""
+        if not content_type.startswith("video/"):
+            raise HTTPException(status_code=400, detail="Le fichier doit être une vidéo")
+        if size > self.max_bytes:
+            raise RequestTooLarge(self.max_bytes)
+
+        self.prune_expired()
+        session = {
+            "upload_id": str(uuid.uuid4()),
+            "filename": filename,
+            "extension": Path(filename).suffix,
+            "size": size,
+            "created_at": time.time(),
+        }
+        self._partial_path(session["upload_id"]).touch()
+        self._hashers[session["upload_id"]] = hashlib.sha256()
+        self._metadata_path(session["upload_id"]).write_text(json.dumps(session))
+        return self.status(session)
+
+    def get(self, upload_id: str) -> Dict:
+        """Session existante (404 sinon)"""
+        try:
+            uuid.UUID(upload_id)
+            return json.loads(self._metadata_path(upload_id).read_text())
+        except (ValueError, FileNotFoundError):
+            raise HTTPException(status_code=404, detail="Upload non trouvé")
+
+    def status(self, session: Dict) -> Dict:
+        """État d'une session : octets reçus (offset de reprise) et taille attendue"""
+        return {
+            "upload_id": session["upload_id"],
+            "filename": session["filename"],
+            "size": session["size"],
+            "received": self._partial_path(session["upload_id"]).stat().st_size,
+            "chunk_size": self.chunk_size,
+        }
+
+    async def append(self, upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> Dict:
+        """
+        Ajoute un morceau reçu à l'offset donné
+
+        409 si l'offset ne correspond pas aux octets déjà reçus (le client doit
+        relire l'état de la session) ou si un autre envoi est en cours.
+        """
+        session = self.get(upload_id)
+        lock = self._locks.setdefault(upload_id, asyncio.Lock())
+        if lock.locked():
+            raise HTTPException(status_code=409, detail="Un envoi est déjà en cours pour cet upload")
+
+        async with lock:
+            received = self._partial_path(upload_id).stat().st_size
+            if offset != received:
+                raise HTTPException(status_code=409, detail=f"Offset invalide : {received} octets déjà reçus")
+            try:
+                await write_stream(chunks, self._partial_path(upload_id), session["size"] - received, append=True,
+                                   hasher=self._hashers.get(upload_id))
+            except RequestTooLarge:
+                raise HTTPException(status_code=413, detail="Le morceau dépasse la taille annoncée du fichier")
+        return self.status(session)
+
+    def complete(self, upload_id: str) -> Dict:
+        """
+        Termine une session complète : la vidéo rejoint le répertoire des uploads
+
+        Returns:
+            Même contenu que l'upload direct (video_id = upload_id), plus l'empreinte
+            du contenu ("content_hash", None si elle n'a pas pu être suivie)
+        """
+        session = self.get(upload_id)
+        lock = self._locks.get(upload_id)
+        if lock is not None and lock.locked():
+            raise HTTPException(status_code=409, detail="Un envoi est encore en cours pour cet upload")
+
+        received = self._partial_path(upload_id).stat().st_size
+        if received != session["size"]:
+            raise HTTPException(status_code=409,
+                                detail=f"Upload incomplet : {received} octets reçus sur {session['size']}")
+
+        self._partial_path(upload_id).rename(self.upload_dir / f"{upload_id}{session['extension']}")
+        self._metadata_path(upload_id).unlink(missing_ok=True)
+        self._locks.pop(upload_id, None)
+        hasher = self._hashers.pop(upload_id, None)
+        return {
+            "video_id": upload_id,
+            "filename": session["filename"],
+            "size": received,
+            "content_hash": hasher.hexdigest() if hasher is not None else None,
+            "message": "Vidéo uploadée avec succès",
+        }
+
+    def abort(self, upload_id: str) -> None:
+        """Abandonne une session et supprime les octets reçus"""
+        self.get(upload_id)
+        self._remove(upload_id)
+
+    def prune_expired(self) -> None:
+        """Supprime les sessions plus anciennes que ttl_seconds (uploads abandonnés)"""
+        deadline = time.time() - self.ttl_seconds
+        for metadata_path in self.partial_dir.glob("*.json"):
+            try:
+                created_at = json.loads(metadata_path.read_text())["created_at"]
+            except (ValueError, KeyError, OSError):
+                created_at = 0
+            if created_at < deadline:
+                print(f"INFO : Upload abandonné supprimé : {metadata_path.stem}")
+                self._remove(metadata_path.stem)
+
+    def _remove(self, upload_id: str) -> None:
+        self._partial_path(upload_id).unlink(missing_ok=True)
+        self._metadata_path(upload_id).unlink(missing_ok=True)
+        self._locks.pop(upload_id, None)
+        self._hashers.pop(upload_id, None)
+
+    def _partial_path(self, upload_id: str) -> Path:
+        return self.partial_dir / f"{upload_id}.part"
+
+    def _metadata_path(self, upload_id: str) -> Path:
+        return self.partial_dir / f"{upload_id}.json"
@@ -1,9 +1,16 @@
 // Composant principal de l'application
-import React, { useState } from 'react';
+import React, { useState, useEffect } from 'react';
 import UploadPage from './pages/UploadPage';
 import ResultsPage from './pages/ResultsPage';
+import { API_URL, ENDPOINTS } from './config';
 import './App.css';
 
+// Suppression des fichiers d'une analyse sur le serveur (keepalive : aboutit même à la fermeture de la page)
+const deleteAnalysis = (id) => {
+  fetch(`${API_URL}${ENDPOINTS.DELETE_ANALYSIS}/${id}`, { method: 'DELETE', keepalive: true })
+    .catch((err) => console.error('ERREUR : Nettoyage des fichiers impossible', err));
+};
+
 function App() {
   // État pour gérer la navigation entre les pages
   const [currentPage, setCurrentPage] = useState('upload'); // 'upload' ou 'results'
@@ -17,6 +24,16 @@ function App() {
     setCurrentPage('results');
   };
 
+  // Les résultats restent sur le serveur tant qu'ils sont consultés (détections chargées
+  // par fenêtre) : ils sont supprimés à la nouvelle analyse ou à la fermeture de la page
+  useEffect(() => {
+    if (!videoId) return undefined;
+
+    const handlePageHide = () => deleteAnalysis(videoId);
+    window.addEventListener('pagehide', handlePageHide);
+    return () => window.removeEventListener('pagehide', handlePageHide);
+  }, [videoId]);
+
   return (
     <div className="App">
       {/* Barre de navigation */}
@@ -25,6 +42,9 @@ function App() {
         <div className="nav-links">
           <button
             onClick={() => {
+              if (videoId) {
+                deleteAnalysis(videoId);
+              }
               setCurrentPage('upload');
               setVideoId(null); // Réinitialiser pour empêcher le retour aux anciens résultats
             }}
@@ -19,9 +19,12 @@ export const API_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
  */
 export const ENDPOINTS = {
   UPLOAD: '/upload-video',
+  UPLOADS: '/uploads',
   ANALYZE: '/analyze',
+  ANALYSIS_JOBS: '/analysis-jobs',
   RESULTS: '/results',
   ANNOTATED_VIDEO: '/annotated-videos',
+  EXPORT_VIDEO: '/export-video',
   DELETE_ANALYSIS: '/analysis'
 };
 
@@ -36,6 +39,25 @@ export const ENDPOINTS = {
  */
 export const DEFAULT_FPS = 30;
 
+/**
+ * Upload reprenable : tentatives par morceau et délai de base entre deux tentatives (en ms)
+ * La taille des morceaux est fixée par le backend (UPLOAD_CHUNK_SIZE_MB)
+ */
+export const UPLOAD_CONFIG = {
+  MAX_RETRIES: 5,
+  RETRY_DELAY: 2000
+};
+
+/**
+ * Détections chargées par fenêtre autour de la lecture (en frames)
+ * FRAMES : taille d'une fenêtre ; PREFETCH_FRAMES : marge avant la fin de la
+ * fenêtre à laquelle la suivante est chargée (et frames gardés avant la lecture)
+ */
+export const DETECTIONS_WINDOW = {
+  FRAMES: 300,
+  PREFETCH_FRAMES: 60
+};
+
 // ============================================================================
 // Messages utilisateur
 // ============================================================================
@@ -46,9 +68,11 @@ export const DEFAULT_FPS = 30;
 export const ERROR_MESSAGES = {
   UPLOAD_FAILED: 'Erreur lors de l\'upload de la vidéo',
   ANALYSIS_FAILED: 'Erreur lors de l\'analyse',
+  ANALYSIS_STREAM_LOST: 'Connexion perdue avec le serveur pendant l\'analyse',
   INVALID_VIDEO: 'Veuillez sélectionner un fichier vidéo valide',
   RESULTS_LOAD_FAILED: 'Erreur lors du chargement des résultats',
-  VIDEO_PREPARATION_FAILED: 'Impossible de préparer la vidéo. Veuillez réessayer.',
+  VIDEO_PREPARATION_FAILED: 'Impossible de lire la vidéo. Veuillez réessayer.',
+  RENDER_FAILED: 'Erreur lors de la génération de la vidéo annotée',
   NO_VIDEO_SELECTED: 'Veuillez d\'abord uploader une vidéo',
   NO_ZONE_DEFINED: 'Veuillez définir une zone d\'analyse en dessinant un rectangle sur la vidéo'
 };
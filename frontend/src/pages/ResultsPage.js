@@ -1,7 +1,7 @@
 // Page 2 : Affichage des résultats d'analyse
 import React, { useState, useEffect, useRef } from 'react';
 import axios from 'axios';
-import { API_URL, ENDPOINTS, ERROR_MESSAGES, DEFAULT_FPS } from '../config';
+import { API_URL, ENDPOINTS, ERROR_MESSAGES, DEFAULT_FPS, DETECTIONS_WINDOW } from '../config';
 import './ResultsPage.css';
 
 function ResultsPage({ videoId }) {
@@ -12,15 +12,31 @@ function ResultsPage({ videoId }) {
 
   // État pour le frame actuellement affiché
   const [currentFrame, setCurrentFrame] = useState(0);
-  const [videoBlobUrl, setVideoBlobUrl] = useState(null);
-  const [videoPreparing, setVideoPreparing] = useState(false);
+  const [videoUrl, setVideoUrl] = useState(null);
   const [videoError, setVideoError] = useState(null);
-  const [jsonBlobUrl, setJsonBlobUrl] = useState(null);
-  const [cleanupDone, setCleanupDone] = useState(false);
-  const [cleanupError, setCleanupError] = useState(null);
+  const [exporting, setExporting] = useState(false);
+  const [renderProgress, setRenderProgress] = useState(null);
+
+  // Fenêtre de détections autour de la lecture : { start, end, byFrame: Map(frame -> boxes) }
+  const [detectionWindow, setDetectionWindow] = useState(null);
+  // Nombre de personnes par frame pour la timeline : { frames: [...], counts: [...] }
+  const [timeline, setTimeline] = useState(null);
+  const [renderError, setRenderError] = useState(null);
 
   // Référence pour la vidéo
   const videoRef = useRef(null);
+  // Flux SSE du rendu à la demande (fermé au démontage)
+  const renderSourceRef = useRef(null);
+  // Fenêtre en cours de chargement { start, end } (évite les requêtes en double)
+  const pendingWindowRef = useRef(null);
+
+  useEffect(() => {
+    return () => {
+      if (renderSourceRef.current) {
+        renderSourceRef.current.close();
+      }
+    };
+  }, []);
 
   // Fonction helper pour obtenir le FPS de la vidéo
   const getVideoFPS = () => {
@@ -34,12 +50,9 @@ function ResultsPage({ videoId }) {
     loadResults();
   }, [videoId]);
 
-  useEffect(() => {
-    setCleanupDone(false);
-    setCleanupError(null);
-  }, [videoId]);
-
   // Fonction pour charger les résultats depuis le backend
+  // Seuls les statistiques et le nombre de personnes par frame sont chargés ici :
+  // les détections sont récupérées par fenêtre autour de la lecture
   const loadResults = async () => {
     console.log('='.repeat(80));
     console.log('CHARGEMENT DES RÉSULTATS');
@@ -52,7 +65,10 @@ function ResultsPage({ videoId }) {
 
     try {
       console.log(`Requête GET vers: ${API_URL}${ENDPOINTS.RESULTS}/${videoId}`);
-      const response = await axios.get(`${API_URL}${ENDPOINTS.RESULTS}/${videoId}`);
+      const [response, framesResponse] = await Promise.all([
+        axios.get(`${API_URL}${ENDPOINTS.RESULTS}/${videoId}`, { params: { limit: 0 } }),
+        axios.get(`${API_URL}${ENDPOINTS.RESULTS}/${videoId}/frames`)
+      ]);
 
       console.log('✓ Réponse reçue du backend');
       console.log('Données reçues:', response.data);
@@ -61,10 +77,13 @@ function ResultsPage({ videoId }) {
       if (response.data) {
         console.log('Structure des données:');
         console.log('  - stats:', response.data.stats);
-        console.log('  - detections:', response.data.detections ? `${response.data.detections.length} frames` : 'absent');
+        console.log('  - frames avec détections:', response.data.pagination?.total);
         console.log('  - annotated_video_path:', response.data.annotated_video_path);
       }
 
+      pendingWindowRef.current = null;
+      setDetectionWindow(null);
+      setTimeline(framesResponse.data);
       setResults(response.data);
       console.log('✓ Résultats stockés dans l\'état');
     } catch (err) {
@@ -99,117 +118,99 @@ function ResultsPage({ videoId }) {
     }
   }, [results]);
 
-  // Obtenir les détections pour le frame actuel
-  const getCurrentDetections = () => {
-    if (!results || !results.detections) return [];
-
-    // Trouver les détections pour le frame actuel
-    const frameData = results.detections.find(d => d.frame === currentFrame);
-    return frameData ? frameData.boxes : [];
-  };
-
-
+  // Charger une nouvelle fenêtre de détections quand la lecture approche du bord de la fenêtre courante
   useEffect(() => {
-    let jsonUrl = null;
-    if (results) {
-      const jsonBlob = new Blob([JSON.stringify(results, null, 2)], {
-        type: 'application/json'
+    if (!results) return;
+
+    const windowCovers = detectionWindow
+      && currentFrame >= detectionWindow.start
+      && currentFrame <= detectionWindow.end - DETECTIONS_WINDOW.PREFETCH_FRAMES;
+    if (windowCovers) return;
+
+    // Une fenêtre déjà demandée qui contient le frame courant arrivera bientôt
+    const pending = pendingWindowRef.current;
+    if (pending && currentFrame >= pending.start && currentFrame <= pending.end) return;
+
+    const requested = { start: Math.max(0, currentFrame - DETECTIONS_WINDOW.PREFETCH_FRAMES) };
+    requested.end = requested.start + DETECTIONS_WINDOW.FRAMES - 1;
+    pendingWindowRef.current = requested;
+
+    axios.get(`${API_URL}${ENDPOINTS.RESULTS}/${videoId}`, {
+      params: { frame_start: requested.start, frame_end: requested.end }
+    })
+      .then((response) => {
+        if (pendingWindowRef.current !== requested) return;
+        pendingWindowRef.current = null;
+        const byFrame = new Map(response.data.detections.map((frameData) => [frameData.frame, frameData.boxes]));
+        setDetectionWindow({ ...requested, byFrame });
+      })
+      .catch((err) => {
+        console.error('ERREUR : Chargement des détections impossible', err);
+        if (pendingWindowRef.current === requested) {
+          pendingWindowRef.current = null;
+        }
       });
-      jsonUrl = URL.createObjectURL(jsonBlob);
-      setJsonBlobUrl(jsonUrl);
-    } else {
-      setJsonBlobUrl(null);
-    }
+  }, [results, currentFrame, detectionWindow, videoId]);
 
-    return () => {
-      if (jsonUrl) {
-        URL.revokeObjectURL(jsonUrl);
-      }
-    };
-  }, [results]);
+  // Obtenir les détections pour le frame actuel (accès direct dans la fenêtre chargée)
+  const getCurrentDetections = () => {
+    return detectionWindow?.byFrame.get(currentFrame) || [];
+  };
 
+  // Lecture en flux : le navigateur demande des plages d'octets au backend
+  // (démarrage immédiat, recherche sans télécharger toute la vidéo)
   useEffect(() => {
-    let objectUrl = null;
-    let cancelled = false;
-
     if (!results?.annotated_video_path) {
-      setVideoBlobUrl(null);
+      setVideoUrl(null);
       return;
     }
 
-    setVideoPreparing(true);
     setVideoError(null);
-    setVideoBlobUrl(null);
+    // Playlist HLS si elle existe et que le navigateur la lit nativement (Safari, iOS), sinon MP4
+    const playsHls = results.hls_playlist_path
+      && videoRef.current?.canPlayType('application/vnd.apple.mpegurl');
+    setVideoUrl(playsHls
+      ? `${API_URL}${ENDPOINTS.ANNOTATED_VIDEO}/${videoId}/hls/index.m3u8`
+      : `${API_URL}${ENDPOINTS.ANNOTATED_VIDEO}/${videoId}`);
+  }, [API_URL, videoId, results?.annotated_video_path, results?.hls_playlist_path]);
 
-    const fetchVideo = async () => {
-      try {
-        const response = await fetch(`${API_URL}${ENDPOINTS.ANNOTATED_VIDEO}/${videoId}`);
-        if (!response.ok) {
-          throw new Error(`HTTP ${response.status}`);
-        }
-        const blob = await response.blob();
-        if (cancelled) return;
-        objectUrl = URL.createObjectURL(blob);
-        setVideoBlobUrl(objectUrl);
-      } catch (err) {
-        console.error('ERREUR : Préparation de la vidéo impossible', err);
-        if (!cancelled) {
-          setVideoError(ERROR_MESSAGES.VIDEO_PREPARATION_FAILED);
-        }
-      } finally {
-        if (!cancelled) {
-          setVideoPreparing(false);
-        }
-      }
-    };
-
-    fetchVideo();
-
-    return () => {
-      cancelled = true;
-      if (objectUrl) {
-        URL.revokeObjectURL(objectUrl);
-      }
-    };
-  }, [API_URL, videoId, results?.annotated_video_path]);
 
-  useEffect(() => {
-    if (!videoId || !videoBlobUrl || !jsonBlobUrl || cleanupDone) {
-      return;
-    }
+  // Générer la vidéo annotée d'une analyse en mode détection seule, puis recharger les résultats
+  const requestRender = async () => {
+    setRenderError(null);
+    setRenderProgress({ status: 'queued', percent: 0 });
 
-    let cancelled = false;
-    const controller = new AbortController();
-
-    const cleanup = async () => {
-      try {
-        const response = await fetch(`${API_URL}${ENDPOINTS.DELETE_ANALYSIS}/${videoId}`, {
-          method: 'DELETE',
-          signal: controller.signal
-        });
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
-        }
-        if (!cancelled) {
-          setCleanupDone(true);
-          setCleanupError(null);
-        }
-      } catch (err) {
-        if (!cancelled) {
-          setCleanupError(err.message);
-          console.error('ERREUR : Nettoyage des fichiers impossible', err);
+    try {
+      const response = await axios.post(`${API_URL}${ENDPOINTS.ANNOTATED_VIDEO}/${videoId}/render`);
+      const eventSource = new EventSource(`${API_URL}${ENDPOINTS.ANALYSIS_JOBS}/${response.data.job_id}/events`);
+      renderSourceRef.current = eventSource;
+
+      eventSource.onmessage = (event) => {
+        const job = JSON.parse(event.data);
+        setRenderProgress({ status: job.status, percent: job.progress?.percent || 0 });
+
+        if (job.status === 'completed') {
+          eventSource.close();
+          setRenderProgress(null);
+          loadResults();
+        } else if (job.status === 'failed') {
+          eventSource.close();
+          setRenderProgress(null);
+          setRenderError(ERROR_MESSAGES.RENDER_FAILED + ' : ' + (job.error?.detail || 'erreur inconnue'));
         }
-      }
-    };
-
-    cleanup();
-
-    return () => {
-      cancelled = true;
-      controller.abort();
-    };
-  }, [API_URL, videoId, videoBlobUrl, jsonBlobUrl, cleanupDone]);
+      };
 
+      eventSource.onerror = () => {
+        if (eventSource.readyState === EventSource.CLOSED) {
+          setRenderProgress(null);
+          setRenderError(ERROR_MESSAGES.ANALYSIS_STREAM_LOST);
+        }
+      };
+    } catch (err) {
+      setRenderProgress(null);
+      setRenderError(ERROR_MESSAGES.RENDER_FAILED + ' : ' + (err.response?.data?.detail || err.message));
+    }
+  };
 
   const triggerDownload = (url, filename) => {
     if (!url) return;
@@ -221,11 +222,31 @@ function ResultsPage({ videoId }) {
     anchor.remove();
   };
 
+  // Export JSON : les détections complètes ne sont téléchargées qu'à la demande
+  const exportResults = async () => {
+    setExporting(true);
+    try {
+      const response = await axios.get(`${API_URL}${ENDPOINTS.RESULTS}/${videoId}`);
+      const jsonBlob = new Blob([JSON.stringify(response.data, null, 2)], {
+        type: 'application/json'
+      });
+      const jsonUrl = URL.createObjectURL(jsonBlob);
+      triggerDownload(jsonUrl, `visiontrack_results_${videoId}.json`);
+      URL.revokeObjectURL(jsonUrl);
+    } catch (err) {
+      console.error('ERREUR : Export des résultats impossible', err);
+      setError(ERROR_MESSAGES.RESULTS_LOAD_FAILED + ' : ' + (err.response?.data?.detail || err.message));
+    } finally {
+      setExporting(false);
+    }
+  };
+
   const handleDownload = (type) => {
     if (type === 'video') {
-      triggerDownload(videoBlobUrl, `visiontrack_analysis_${videoId}.mp4`);
+      // Content-Disposition: attachment côté backend : le navigateur télécharge sans lire
+      triggerDownload(`${API_URL}${ENDPOINTS.EXPORT_VIDEO}/${videoId}`, `visiontrack_analysis_${videoId}.mp4`);
     } else {
-      triggerDownload(jsonBlobUrl, `visiontrack_results_${videoId}.json`);
+      exportResults();
     }
   };
 
@@ -253,7 +274,7 @@ function ResultsPage({ videoId }) {
 
   console.log('Affichage: Rendu de la page de résultats avec les données:', {
     stats: results.stats,
-    detectionsCount: results.detections?.length,
+    framesWithDetections: timeline?.frames.length,
     annotatedVideoPath: results.annotated_video_path
   });
 
@@ -280,6 +301,24 @@ function ResultsPage({ videoId }) {
         </div>
       </div>
 
+      {/* Statistiques par zone polygonale (même inférence que les statistiques globales) */}
+      {results.zones?.length > 0 && (
+        <div className="card">
+          <h2>Statistiques par zone</h2>
+          <div className="stats-grid">
+            {results.zones.map((zone, index) => (
+              <div className="stat-item" key={index}>
+                <div className="stat-label">{zone.name}</div>
+                <div className="stat-value">{zone.stats.total_people}</div>
+                <div className="stat-label">
+                  Pic : {zone.stats.max_people_simultaneous} (frame {zone.stats.frame_of_max})
+                </div>
+              </div>
+            ))}
+          </div>
+        </div>
+      )}
+
       {/* Lecture de la vidéo annotée */}
       <div className="card">
         <h2>Vidéo annotée avec détections</h2>
@@ -293,21 +332,43 @@ function ResultsPage({ videoId }) {
         <div className="video-container">
           <video
             ref={videoRef}
-            src={videoBlobUrl || ''}
+            src={videoUrl || ''}
             controls
             className="video-player"
             onError={(e) => {
               console.error('ERREUR VIDEO:', e);
-              console.error('URL vidéo:', `${API_URL}${ENDPOINTS.ANNOTATED_VIDEO}/${videoId}`);
+              console.error('URL vidéo:', videoUrl);
               console.error('Erreur détails:', e.target.error);
+              if (videoUrl) {
+                setVideoError(ERROR_MESSAGES.VIDEO_PREPARATION_FAILED);
+              }
             }}
             onLoadedMetadata={() => {
               console.log('✓ Vidéo chargée avec succès');
               console.log('Durée:', videoRef.current?.duration);
             }}
           />
-          {videoPreparing && (
-            <p className="video-path-debug">Préparation de la vidéo en cours...</p>
+          {!results.annotated_video_path && (
+            <div className="render-request">
+              <p className="video-path-debug">
+                Analyse en mode détection seule : la vidéo annotée n'a pas été générée.
+              </p>
+              <button
+                type="button"
+                onClick={requestRender}
+                className="btn-primary"
+                disabled={renderProgress !== null}
+              >
+                {renderProgress === null
+                  ? 'Générer la vidéo annotée'
+                  : renderProgress.status === 'queued'
+                    ? 'Rendu en attente...'
+                    : `Rendu en cours... ${Math.round(renderProgress.percent)}%`}
+              </button>
+              {renderError && (
+                <p className="error">{renderError}</p>
+              )}
+            </div>
           )}
           {videoError && (
             <p className="error">{videoError}</p>
@@ -320,7 +381,7 @@ function ResultsPage({ videoId }) {
             type="button"
             onClick={() => handleDownload('video')}
             className="btn-primary export-btn"
-            disabled={!videoBlobUrl}
+            disabled={!videoUrl}
           >
             Télécharger la vidéo
           </button>
@@ -328,9 +389,9 @@ function ResultsPage({ videoId }) {
             type="button"
             onClick={() => handleDownload('results')}
             className="btn-secondary export-btn"
-            disabled={!jsonBlobUrl}
+            disabled={exporting}
           >
-            Exporter les statistiques (JSON)
+            {exporting ? 'Export en cours...' : 'Exporter les statistiques (JSON)'}
           </button>
         </div>
       </div>
@@ -374,11 +435,11 @@ function ResultsPage({ videoId }) {
       <div className="card">
         <h2>Timeline des détections</h2>
         <div className="timeline">
-          {results.detections && results.detections.length > 0 ? (
+          {timeline && timeline.frames.length > 0 ? (
             <div className="timeline-chart">
-              {results.detections.map((frameData, index) => {
-                const peopleCount = frameData.boxes.length;
-                const isMaxFrame = frameData.frame === results.stats.frame_of_max;
+              {timeline.frames.map((frame, index) => {
+                const peopleCount = timeline.counts[index];
+                const isMaxFrame = frame === results.stats.frame_of_max;
                 const height = (peopleCount / results.stats.max_people_simultaneous) * 100;
 
                 // Fonction pour sauter à une frame spécifique
@@ -388,7 +449,7 @@ function ResultsPage({ videoId }) {
                     const fps = getVideoFPS();
 
                     // Calculer le timestamp de cette frame
-                    const timestamp = frameData.frame / fps;
+                    const timestamp = frame / fps;
 
                     // Sauter à ce timestamp
                     videoRef.current.currentTime = timestamp;
@@ -403,7 +464,7 @@ function ResultsPage({ videoId }) {
                     key={index}
                     className={`timeline-bar ${isMaxFrame ? 'max-frame' : ''}`}
                     style={{ height: `${height}%`, cursor: 'pointer' }}
-                    title={`Frame ${frameData.frame}: ${peopleCount} personne(s) - Cliquez pour y aller`}
+                    title={`Frame ${frame}: ${peopleCount} personne(s) - Cliquez pour y aller`}
                     onClick={jumpToFrame}
                   />
                 );
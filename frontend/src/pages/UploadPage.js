@@ -2,6 +2,7 @@
 import React, { useState, useRef, useEffect } from 'react';
 import axios from 'axios';
 import { API_URL, ENDPOINTS, ERROR_MESSAGES, SUCCESS_MESSAGES, REDIRECT_DELAY, ZONE_COLORS, ZONE_CONFIG } from '../config';
+import { uploadVideoResumable } from '../resumableUpload';
 import './UploadPage.css';
 
 function UploadPage({ onAnalysisComplete }) {
@@ -10,7 +11,9 @@ function UploadPage({ onAnalysisComplete }) {
   const [videoUrl, setVideoUrl] = useState(null);
   const [videoId, setVideoId] = useState(null);
   const [uploadLoading, setUploadLoading] = useState(false);
+  const [uploadPercent, setUploadPercent] = useState(0);
   const [analyzeLoading, setAnalyzeLoading] = useState(false);
+  const [analysisProgress, setAnalysisProgress] = useState(null); // { status, percent }
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(null);
 
@@ -26,6 +29,18 @@ function UploadPage({ onAnalysisComplete }) {
   const canvasRef = useRef(null);
   const videoRef = useRef(null);
 
+  // Flux SSE de progression de l'analyse en cours
+  const eventSourceRef = useRef(null);
+
+  // Fermer le flux SSE si la page est quittée pendant l'analyse
+  useEffect(() => {
+    return () => {
+      if (eventSourceRef.current) {
+        eventSourceRef.current.close();
+      }
+    };
+  }, []);
+
   // Gestionnaire de sélection de fichier vidéo
   const handleFileChange = async (e) => {
     const file = e.target.files[0];
@@ -198,20 +213,15 @@ function UploadPage({ onAnalysisComplete }) {
     }
 
     setUploadLoading(true);
+    setUploadPercent(0);
     setError(null);
     setSuccess(null);
 
-    const formData = new FormData();
-    formData.append('file', fileToUpload);
-
     try {
-      const response = await axios.post(`${API_URL}${ENDPOINTS.UPLOAD}`, formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data',
-        },
-      });
+      // Envoi par morceaux : reprise automatique après une coupure réseau
+      const upload = await uploadVideoResumable(fileToUpload, setUploadPercent);
 
-      setVideoId(response.data.video_id);
+      setVideoId(upload.video_id);
       setSuccess(SUCCESS_MESSAGES.UPLOAD_SUCCESS);
     } catch (err) {
       setError(ERROR_MESSAGES.UPLOAD_FAILED + ' : ' + (err.response?.data?.detail || err.message));
@@ -260,19 +270,50 @@ function UploadPage({ onAnalysisComplete }) {
       }
 
       const response = await axios.post(`${API_URL}${ENDPOINTS.ANALYZE}`, requestData);
-
-      setSuccess(SUCCESS_MESSAGES.ANALYSIS_SUCCESS);
-
-      // Rediriger vers la page de résultats après un court délai
-      setTimeout(() => {
-        onAnalysisComplete(videoId);
-      }, REDIRECT_DELAY);
+      followAnalysis(response.data.job_id);
     } catch (err) {
       setError(ERROR_MESSAGES.ANALYSIS_FAILED + ' : ' + (err.response?.data?.detail || err.message));
       setAnalyzeLoading(false);
     }
   };
 
+  // Suivre la progression de l'analyse via Server-Sent Events
+  const followAnalysis = (jobId) => {
+    setAnalysisProgress({ status: 'queued', percent: 0 });
+
+    const eventSource = new EventSource(`${API_URL}${ENDPOINTS.ANALYSIS_JOBS}/${jobId}/events`);
+    eventSourceRef.current = eventSource;
+
+    eventSource.onmessage = (event) => {
+      const job = JSON.parse(event.data);
+      setAnalysisProgress({ status: job.status, percent: job.progress?.percent || 0 });
+
+      if (job.status === 'completed') {
+        eventSource.close();
+        setSuccess(SUCCESS_MESSAGES.ANALYSIS_SUCCESS);
+
+        // Rediriger vers la page de résultats après un court délai
+        setTimeout(() => {
+          onAnalysisComplete(videoId);
+        }, REDIRECT_DELAY);
+      } else if (job.status === 'failed') {
+        eventSource.close();
+        setError(ERROR_MESSAGES.ANALYSIS_FAILED + ' : ' + (job.error?.detail || 'erreur inconnue'));
+        setAnalyzeLoading(false);
+        setAnalysisProgress(null);
+      }
+    };
+
+    // Le navigateur se reconnecte automatiquement ; on n'abandonne que si le flux est fermé
+    eventSource.onerror = () => {
+      if (eventSource.readyState === EventSource.CLOSED) {
+        setError(ERROR_MESSAGES.ANALYSIS_STREAM_LOST);
+        setAnalyzeLoading(false);
+        setAnalysisProgress(null);
+      }
+    };
+  };
+
   return (
     <div className="upload-page">
       {/* Overlay de chargement pendant l'analyse */}
@@ -280,7 +321,11 @@ function UploadPage({ onAnalysisComplete }) {
         <div className="analysis-overlay">
           <div className="spinner-container">
             <div className="spinner"></div>
-            <p>Analyse en cours...</p>
+            <p>
+              {analysisProgress?.status === 'queued'
+                ? 'Analyse en attente...'
+                : `Analyse en cours... ${Math.round(analysisProgress?.percent || 0)}%`}
+            </p>
             <p className="analysis-subtitle">Veuillez patienter, cela peut prendre quelques minutes</p>
           </div>
         </div>
@@ -303,7 +348,7 @@ function UploadPage({ onAnalysisComplete }) {
             disabled={uploadLoading || analyzeLoading || videoId}
           />
           <label htmlFor="video-input" className={`file-input-label ${videoId ? 'disabled' : ''}`}>
-            {uploadLoading ? 'Upload en cours...' : videoId ? 'Vidéo uploadée ✓' : 'Choisir une vidéo'}
+            {uploadLoading ? `Upload en cours... ${Math.round(uploadPercent)}%` : videoId ? 'Vidéo uploadée ✓' : 'Choisir une vidéo'}
           </label>
           {videoFile && <span className="file-name">{videoFile.name}</span>}
         </div>
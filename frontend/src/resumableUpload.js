@@ -0,0 +1,69 @@
+// Upload reprenable des vidéos VisionTrack
+// Le fichier est envoyé par morceaux (Blob.slice, jamais chargé entièrement en mémoire).
+// Après une coupure réseau, l'offset reçu par le serveur est relu et l'envoi reprend
+// à partir de là, sans renvoyer le début du fichier.
+
+import axios from 'axios';
+import { API_URL, ENDPOINTS, UPLOAD_CONFIG } from './config';
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+/**
+ * Erreur définitive (vidéo refusée, trop volumineuse...) : inutile de réessayer
+ */
+const isFatal = (err) => {
+  const status = err.response?.status;
+  return status === 400 || status === 404 || status === 413;
+};
+
+/**
+ * Upload un fichier vidéo via le protocole init / morceaux / fin du backend
+ *
+ * @param {File} file - Fichier sélectionné
+ * @param {(percent: number) => void} onProgress - Progression de 0 à 100
+ * @returns {Promise<Object>} Réponse de fin d'upload ({ video_id, filename, size })
+ */
+export async function uploadVideoResumable(file, onProgress = () => {}) {
+  const baseUrl = `${API_URL}${ENDPOINTS.UPLOADS}`;
+  const { data: session } = await axios.post(baseUrl, {
+    filename: file.name,
+    size: file.size,
+    content_type: file.type || 'video/mp4',
+  });
+
+  const uploadUrl = `${baseUrl}/${session.upload_id}`;
+  let offset = session.received;
+  let failures = 0;
+
+  while (offset < file.size) {
+    const chunk = file.slice(offset, offset + session.chunk_size);
+    try {
+      const { data } = await axios.put(uploadUrl, chunk, {
+        params: { offset },
+        headers: { 'Content-Type': 'application/octet-stream' },
+        onUploadProgress: (event) => onProgress((100 * (offset + event.loaded)) / file.size),
+      });
+      offset = data.received;
+      failures = 0;
+      onProgress((100 * offset) / file.size);
+    } catch (err) {
+      failures += 1;
+      if (isFatal(err) || failures > UPLOAD_CONFIG.MAX_RETRIES) {
+        throw err;
+      }
+      // Coupure ou envoi concurrent (409) : attendre puis reprendre à l'offset connu du serveur
+      await sleep(UPLOAD_CONFIG.RETRY_DELAY * failures);
+      try {
+        const { data } = await axios.get(uploadUrl);
+        offset = data.received;
+      } catch (statusErr) {
+        if (isFatal(statusErr)) {
+          throw statusErr;
+        }
+      }
+    }
+  }
+
+  const { data } = await axios.post(`${uploadUrl}/complete`);
+  return data;
+}
@@ -0,0 +1,302 @@
+"""
+Backends d'inférence CPU du service IA VisionTrack
+
+Le réseau YOLO peut être exécuté par PyTorch (par défaut), ONNX Runtime ou
+OpenVINO, éventuellement en INT8 (quantification post-entraînement calibrée sur
+des frames d'exemple). Le modèle est exporté une seule fois dans MODEL_CACHE_DIR
+puis rechargé tel quel par chaque worker. Les pré et post-traitements restent
+ceux d'Ultralytics : seul le moteur d'exécution du réseau change.
+"""
+
+import fcntl
+import importlib.util
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from config import (
+    INFERENCE_BACKEND,
+    INFERENCE_IMGSZ,
+    INFERENCE_INT8,
+    INT8_CALIBRATION_FRAMES,
+    INT8_CALIBRATION_VIDEO,
+    MODEL_CACHE_DIR,
+    YOLO_MODEL,
+)
+
+BACKENDS = ("pytorch", "onnx", "openvino")
+
+# Modules Python nécessaires à chaque backend exporté
+REQUIRED_MODULES = {
+    "onnx": ["onnx", "onnxruntime"],
+    "openvino": ["openvino", "onnx"],
+}
+INT8_REQUIRED_MODULES = {
+    "onnx": [],  # onnxruntime.quantization
+    "openvino": ["nncf"],
+}
+
+# Tête de détection (model.22) laissée en précision flottante : scores et décodage
+# des boxes sont sensibles à la quantification, pour une faible part du calcul
+INT8_EXCLUDED_PREFIX = "/model.22/"
+
+
+def load_model(backend: str = INFERENCE_BACKEND, int8: bool = INFERENCE_INT8,
+               threads: Optional[int] = None) -> YOLO:
+    """
+    Charge le modèle YOLO avec le backend demandé (export mis en cache au premier appel)
+
+    Si les dépendances du backend manquent ou si l'export échoue, le modèle
+    PyTorch est utilisé à la place (le service reste fonctionnel).
+
+    Args:
+        backend: "pytorch", "onnx" ou "openvino"
+        int8: Variante quantifiée INT8 (ignoré en PyTorch)
+        threads: Threads d'exécution du moteur (IA_WORKER_THREADS dans les workers)
+    """
+    if backend not in BACKENDS:
+        print(f"ATTENTION : Backend d'inférence inconnu '{backend}', utilisation de PyTorch")
+        backend = "pytorch"
+
+    if backend == "pytorch":
+        if int8:
+            print("ATTENTION : INFERENCE_INT8 n'est pris en charge qu'avec ONNX Runtime et OpenVINO")
+        return YOLO(YOLO_MODEL)
+
+    missing = missing_modules(backend, int8)
+    if missing:
+        print(f"ATTENTION : Backend {backend} indisponible (modules manquants : {', '.join(missing)}), "
+              f"utilisation de PyTorch")
+        return YOLO(YOLO_MODEL)
+
+    try:
+        model_path = exported_model_path(backend, int8)
+    except Exception as exc:
+        print(f"ERREUR : Export du modèle vers {backend} impossible ({exc}), utilisation de PyTorch")
+        return YOLO(YOLO_MODEL)
+
+    print(f"✓ Modèle {backend}{' INT8' if int8 else ''} : {model_path}")
+    model = YOLO(str(model_path), task="detect")
+
+    def configure_predictor(predictor) -> None:
+        """Règle le moteur d'exécution une fois le predictor Ultralytics créé"""
+        if not getattr(predictor, "visiontrack_configured", False):
+            configure_engine(predictor, backend, model_path, threads)
+            predictor.visiontrack_configured = True
+
+    model.add_callback("on_predict_start", configure_predictor)
+    return model
+
+
+def missing_modules(backend: str, int8: bool) -> List[str]:
+    """Modules Python absents pour ce backend (liste vide si tout est installé)"""
+    modules = REQUIRED_MODULES.get(backend, []) + (INT8_REQUIRED_MODULES.get(backend, []) if int8 else [])
+    return [module for module in modules if importlib.util.find_spec(module) is None]
+
+
+def exported_model_path(backend: str, int8: bool) -> Path:
+    """
+    Chemin du modèle exporté dans le cache, créé si besoin
+
+    Les workers démarrent en même temps : l'export est protégé par un verrou de
+    fichier, le premier worker exporte et les suivants réutilisent le résultat.
+    """
+    cache_dir = Path(MODEL_CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    with export_lock(cache_dir):
+        fp32_path = cache_dir / cached_model_name(backend, False)
+        if not fp32_path.exists():
+            export_fp32(backend, fp32_path)
+        if not int8:
+            return fp32_path
+
+        int8_path = cache_dir / cached_model_name(backend, True)
+        if not int8_path.exists():
+            if backend == "onnx":
+                quantize_onnx(fp32_path, int8_path)
+            else:
+                quantize_openvino(fp32_path, int8_path)
+        return int8_path
+
+
+def cached_model_name(backend: str, int8: bool) -> str:
+    """Nom du modèle exporté : yolov8n.onnx, yolov8n_int8.onnx, yolov8n_openvino_model..."""
+    stem = Path(YOLO_MODEL).stem + ("_int8" if int8 else "")
+    return f"{stem}.onnx" if backend == "onnx" else f"{stem}_openvino_model"
+
+
+@contextmanager
+def export_lock(cache_dir: Path) -> Iterator[None]:
+    with open(cache_dir / ".export.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def export_fp32(backend: str, target: Path) -> None:
+    """
+    Exporte le modèle PyTorch (format Ultralytics) vers `target`
+
+    Entrée dynamique (taille de lot et dimensions) : l'inférence par lots et
+    l'inférence restreinte à la zone (imgsz variable) restent possibles.
+    """
+    print(f"Export du modèle {YOLO_MODEL} vers {backend} (une seule fois)...")
+    weights = Path(YOLO(YOLO_MODEL).ckpt_path)
+
+    # Export dans un répertoire temporaire : Ultralytics écrit à côté des poids
+    with tempfile.TemporaryDirectory(dir=target.parent) as work_dir:
+        work_weights = Path(work_dir) / weights.name
+        shutil.copy(weights, work_weights)
+        exported = YOLO(str(work_weights)).export(format=backend, dynamic=True, imgsz=INFERENCE_IMGSZ)
+        shutil.move(str(exported), str(target))
+
+    print(f"✓ Modèle exporté : {target}")
+
+
+def calibration_inputs(imgsz: int = INFERENCE_IMGSZ) -> List[np.ndarray]:
+    """
+    Tenseurs de calibration INT8 (1, 3, imgsz, imgsz), prétraités comme par Ultralytics
+
+    Frames répartis sur INT8_CALIBRATION_VIDEO, ou sur le clip d'exemple à défaut.
+    Une vidéo représentative des caméras filmées donne une meilleure précision.
+    """
+    from ultralytics.data.augment import LetterBox
+
+    from samples import make_sample_clip
+
+    video_path = INT8_CALIBRATION_VIDEO or str(make_sample_clip())
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    letterbox = LetterBox((imgsz, imgsz), auto=False)
+    inputs = []
+    try:
+        for index in np.linspace(0, max(0, total_frames - 1), INT8_CALIBRATION_FRAMES).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ok, frame = cap.read()
+            if not ok:
+                continue
+            image = letterbox(image=frame)[..., ::-1].transpose(2, 0, 1)  # BGR -> RGB, HWC -> CHW
+            inputs.append(np.ascontiguousarray(image, dtype=np.float32)[None] / 255.0)
+    finally:
+        cap.release()
+
+    if not inputs:
+        raise ValueError(f"Vidéo de calibration illisible : {video_path}")
+
+    print(f"✓ {len(inputs)} frames de calibration INT8 extraits de {video_path}")
+    return inputs
+
+
+def quantize_onnx(fp32_path: Path, target: Path) -> None:
+    """Quantification statique INT8 (QDQ) du modèle ONNX avec ONNX Runtime"""
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self, inputs: List[np.ndarray]):
+            self._inputs = iter(inputs)
+
+        def get_next(self):
+            image = next(self._inputs, None)
+            return None if image is None else {"images": image}
+
+    print("Quantification INT8 du modèle ONNX...")
+    fp32_model = onnx.load(str(fp32_path))
+    excluded = [node.name for node in fp32_model.graph.node if node.name.startswith(INT8_EXCLUDED_PREFIX)]
+
+    with tempfile.TemporaryDirectory(dir=target.parent) as work_dir:
+        work_path = Path(work_dir) / target.name
+        quantize_static(
+            str(fp32_path), str(work_path), FrameReader(calibration_inputs()),
+            quant_format=QuantFormat.QDQ,
+            op_types_to_quantize=["Conv"],
+            nodes_to_exclude=excluded,
+            # Par canal, les biais partagés produisent un graphe invalide avec onnxruntime 1.16
+            per_channel=False,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+
+        # Métadonnées Ultralytics (classes, stride, imgsz) reprises du modèle d'origine
+        int8_model = onnx.load(str(work_path))
+        del int8_model.metadata_props[:]
+        int8_model.metadata_props.extend(fp32_model.metadata_props)
+        onnx.save(int8_model, str(work_path))
+        shutil.move(str(work_path), str(target))
+
+    print(f"✓ Modèle INT8 créé : {target}")
+
+
+def quantize_openvino(fp32_dir: Path, target: Path) -> None:
+    """Quantification INT8 du modèle OpenVINO avec NNCF"""
+    import nncf
+    from openvino.runtime import Core, serialize
+
+    print("Quantification INT8 du modèle OpenVINO...")
+    xml_path = next(fp32_dir.glob("*.xml"))
+    ov_model = Core().read_model(str(xml_path))
+    quantized = nncf.quantize(
+        ov_model,
+        nncf.Dataset(calibration_inputs()),
+        preset=nncf.QuantizationPreset.MIXED,
+        ignored_scope=nncf.IgnoredScope(patterns=[f"{INT8_EXCLUDED_PREFIX}.*"]),
+    )
+
+    with tempfile.TemporaryDirectory(dir=target.parent) as work_dir:
+        work_dir = Path(work_dir) / target.name
+        work_dir.mkdir()
+        serialize(quantized, str(work_dir / xml_path.name))
+        shutil.copy(fp32_dir / "metadata.yaml", work_dir / "metadata.yaml")
+        shutil.move(str(work_dir), str(target))
+
+    print(f"✓ Modèle INT8 créé : {target}")
+
+
+def configure_engine(predictor, backend: str, model_path: Path, threads: Optional[int]) -> None:
+    """
+    Adapte le predictor Ultralytics à un modèle exporté à entrée dynamique
+
+    - Nombre de threads limité comme pour PyTorch (plusieurs workers par machine)
+    - Letterbox rectangulaire (minimum de padding) : Ultralytics le réserve aux
+      modèles PyTorch et complète sinon chaque frame en carré imgsz x imgsz
+    """
+    from ultralytics.data.augment import LetterBox
+
+    engine = predictor.model
+    if threads:
+        if backend == "onnx":
+            import onnxruntime
+
+            options = onnxruntime.SessionOptions()
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+            engine.session = onnxruntime.InferenceSession(str(model_path), options,
+                                                          providers=["CPUExecutionProvider"])
+        else:
+            from openvino.runtime import Core
+
+            core = Core()
+            xml_path = next(model_path.glob("*.xml"))
+            engine.ov_compiled_model = core.compile_model(core.read_model(str(xml_path)), "CPU",
+                                                          {"INFERENCE_NUM_THREADS": str(threads)})
+
+    def pre_transform(images):
+        same_shapes = all(image.shape == images[0].shape for image in images)
+        letterbox = LetterBox(predictor.imgsz, auto=same_shapes, stride=engine.stride)
+        return [letterbox(image=image) for image in images]
+
+    predictor.pre_transform = pre_transform
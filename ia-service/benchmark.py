@@ -0,0 +1,708 @@
+"""
+Benchmarks du service IA VisionTrack
+
+Usage (dans le conteneur ia-service) :
+    python benchmark.py batch --video /app/shared/uploads/<id>.mp4 --batch-sizes 1,2,4,8
+    python benchmark.py zone --zone 400,200,1000,700 --margin 64
+    python benchmark.py zone-check --cases 500
+    python benchmark.py render --frames 120
+    python benchmark.py motion --video /app/shared/uploads/<id>.mp4
+    python benchmark.py backends --backends pytorch,onnx,onnx-int8,openvino,openvino-int8
+    python benchmark.py live --seconds 20 --batch-size 1
+    python benchmark.py scheduler --videos 4 --batch-size 8
+    python benchmark.py tracker-check --videos 4
+    python benchmark.py imgsz --sizes 640,480,320
+    python benchmark.py decode --backends opencv,ffmpeg --prefetch 8
+
+Sans --video, un clip d'exemple est généré à partir des images fournies
+avec Ultralytics (bus.jpg, zidane.jpg).
+"""
+
+import argparse
+import time
+import tracemalloc
+from typing import List
+
+import cv2
+import numpy as np
+
+from samples import make_distant_clip, make_idle_clip, make_sample_clip, read_frames, serve_stream
+
+def reference_track_ids(model, frames: List[np.ndarray]) -> List[List[float]]:
+    """track_ids obtenus avec model.track() frame par frame (chemin Ultralytics d'origine)"""
+    from config import CONFIDENCE_THRESHOLD, TRACKER_CONFIG
+
+    track_ids = []
+    for frame in frames:
+        result = model.track(source=frame, persist=True, verbose=False,
+                             tracker=TRACKER_CONFIG, conf=CONFIDENCE_THRESHOLD)[0]
+        ids = result.boxes.id.tolist() if result.boxes.id is not None else [-1.0] * len(result.boxes)
+        track_ids.append(ids)
+    model.predictor = None
+    return track_ids
+
+
+def bench_batch(args) -> None:
+    """Images/seconde de la détection + tracking selon la taille de lot"""
+    from detection import get_model, predict_batch
+    from tracking import create_tracker, update_tracker
+
+    video_path = args.video or str(make_sample_clip())
+    frames = read_frames(video_path, args.frames)
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    model = get_model()
+
+    reference_ids = reference_track_ids(model, frames)
+
+    # Préchauffage : construction du predictor et premiers appels
+    predict_batch(model, frames[:1])
+
+    print(f"\n{len(frames)} frames de {video_path}")
+    print(f"{'batch':>6} | {'fps':>8} | {'ms/frame':>9} | track_ids identiques à model.track()")
+
+    for batch_size in batch_sizes:
+        tracker = create_tracker()
+        track_ids = []
+        start = time.perf_counter()
+        for i in range(0, len(frames), batch_size):
+            batch = frames[i:i + batch_size]
+            for frame, boxes in zip(batch, predict_batch(model, batch)):
+                tracks = update_tracker(tracker, boxes, frame)
+                track_ids.append(tracks[:, 6].tolist())
+        elapsed = time.perf_counter() - start
+
+        same = "oui" if track_ids == reference_ids else "NON"
+        print(f"{batch_size:>6} | {len(frames) / elapsed:>8.2f} | {1000 * elapsed / len(frames):>9.1f} | {same}")
+
+
+def count_matches(reference: np.ndarray, candidate: np.ndarray, threshold: float = 0.5) -> int:
+    """Nombre de boxes de référence retrouvées (appariement glouton, IoU >= threshold)"""
+    from chunking import box_iou
+
+    if len(reference) == 0 or len(candidate) == 0:
+        return 0
+    iou = box_iou(reference, candidate)
+    matched = 0
+    while iou.size and iou.max() >= threshold:
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        matched += 1
+        iou[i, :] = 0
+        iou[:, j] = 0
+    return matched
+
+
+def people_in_zone(boxes, zone, offset=(0.0, 0.0)) -> np.ndarray:
+    """Boxes xyxy des personnes (classe 0) dont le centre est dans la zone"""
+    xyxy = boxes.xyxy[boxes.cls == 0] + np.array(offset * 2, dtype=np.float32)
+    centers = (xyxy[:, :2] + xyxy[:, 2:]) / 2
+    inside = ((centers[:, 0] >= zone.x1) & (centers[:, 0] <= zone.x2)
+              & (centers[:, 1] >= zone.y1) & (centers[:, 1] <= zone.y2))
+    return xyxy[inside]
+
+
+def bench_zone(args) -> None:
+    """Inférence restreinte à la zone vs frame entier : accélération et rappel"""
+    from detection import crop_frame, crop_region, get_model, predict_batch, region_imgsz
+    from schemas import Zone
+
+    video_path = args.video or str(make_sample_clip())
+    frames = read_frames(video_path, args.frames)
+    height, width = frames[0].shape[:2]
+
+    if args.zone:
+        x1, y1, x2, y2 = (float(value) for value in args.zone.split(","))
+        zone = Zone(x1=x1, y1=y1, x2=x2, y2=y2)
+    else:
+        # Zone centrée couvrant un quart de la surface du frame
+        zone = Zone(x1=width / 4, y1=height / 4, x2=3 * width / 4, y2=3 * height / 4)
+
+    region = crop_region(zone, width, height, args.margin)
+    imgsz = region_imgsz(region, width, height)
+    model = get_model()
+
+    # Préchauffage des deux tailles d'entrée
+    predict_batch(model, frames[:1])
+    predict_batch(model, [crop_frame(frames[0], region)], imgsz)
+
+    start = time.perf_counter()
+    full = [people_in_zone(boxes, zone) for frame in frames for boxes in predict_batch(model, [frame])]
+    full_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cropped = [
+        people_in_zone(boxes, zone, (region.x1, region.y1))
+        for frame in frames
+        for boxes in predict_batch(model, [crop_frame(frame, region)], imgsz)
+    ]
+    crop_elapsed = time.perf_counter() - start
+
+    reference = sum(len(boxes) for boxes in full)
+    found = sum(count_matches(ref, cand) for ref, cand in zip(full, cropped))
+    extra = sum(len(boxes) for boxes in cropped) - found
+
+    print(f"\n{len(frames)} frames {width}x{height} de {video_path}")
+    print(f"Zone : ({zone.x1:.0f}, {zone.y1:.0f}) -> ({zone.x2:.0f}, {zone.y2:.0f}), "
+          f"région inférée : ({region.x1:.0f}, {region.y1:.0f}) -> ({region.x2:.0f}, {region.y2:.0f}), imgsz {imgsz}")
+    print(f"{'mode':>12} | {'fps':>8} | {'personnes dans la zone':>22}")
+    print(f"{'frame entier':>12} | {len(frames) / full_elapsed:>8.2f} | {reference:>22}")
+    print(f"{'zone':>12} | {len(frames) / crop_elapsed:>8.2f} | {found + extra:>22}")
+    print(f"Accélération : x{full_elapsed / crop_elapsed:.2f}")
+    if reference:
+        print(f"Rappel vs frame entier : {100 * found / reference:.1f}% "
+              f"({reference - found} manquées, {extra} détections supplémentaires)")
+
+
+def rectangle_boxes(frame: np.ndarray) -> np.ndarray:
+    """Boxes xyxy des rectangles d'un frame synthétique (un niveau de gris non nul par rectangle)"""
+    boxes = []
+    for level in np.unique(frame)[1:]:
+        ys, xs = np.nonzero(frame == level)
+        boxes.append([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1])
+    return np.array(boxes, dtype=np.float32).reshape(-1, 4)
+
+
+def check_zone(args) -> None:
+    """
+    Vérification déterministe (sans modèle) du recadrage sur zone
+
+    Des personnes (rectangles pleins) sont dessinées sur des frames synthétiques de
+    tailles, zones et marges aléatoires. Les boxes retrouvées dans la région
+    recadrée (crop_frame), ramenées au frame entier (region_to_frame), doivent
+    être exactement celles du frame entier pour toute personne dont le centre est
+    dans la zone et qui tient dans la marge. Code de sortie 1 en cas d'écart.
+    """
+    from detection import crop_frame, crop_region, region_to_frame
+    from schemas import Zone
+
+    rng = np.random.default_rng(args.seed)
+    checked = failures = 0
+    for _ in range(args.cases):
+        width, height = int(rng.integers(64, 1920)), int(rng.integers(64, 1080))
+        margin = int(rng.integers(1, 96))
+        x1, x2 = sorted(rng.uniform(0, width, 2))
+        y1, y2 = sorted(rng.uniform(0, height, 2))
+        zone = Zone(x1=x1, y1=y1, x2=x2, y2=y2)
+        region = crop_region(zone, width, height, margin)
+
+        # Personnes centrées dans la zone, de demi-taille au plus la marge
+        frame = np.zeros((height, width), dtype=np.uint8)
+        for level in range(1, 9):
+            center_x, center_y = rng.uniform(x1, x2), rng.uniform(y1, y2)
+            half_width, half_height = rng.uniform(0.5, margin, 2)
+            frame[max(0, int(center_y - half_height)):max(0, int(center_y + half_height)),
+                  max(0, int(center_x - half_width)):max(0, int(center_x + half_width))] = level
+
+        full = rectangle_boxes(frame)
+        cropped = region_to_frame(rectangle_boxes(crop_frame(frame, region)), region)
+        checked += 1
+        if full.shape != cropped.shape or not np.array_equal(full, cropped):
+            failures += 1
+            print(f"ÉCART : frame {width}x{height}, zone ({x1:.1f}, {y1:.1f}) -> ({x2:.1f}, {y2:.1f}), "
+                  f"marge {margin} : {len(full)} boxes plein cadre, {len(cropped)} après recadrage")
+
+    print(f"\n{checked} cas vérifiés, {failures} écart(s)")
+    if failures:
+        raise SystemExit(1)
+
+
+def annotate_per_frame(frame: np.ndarray, zone, boxes) -> np.ndarray:
+    """Annotation d'origine (masque et calque plein cadre recalculés à chaque frame), pour comparaison"""
+    from rendering import ZoneRenderer
+
+    frame_height, frame_width = frame.shape[:2]
+    mask = np.ones((frame_height, frame_width), dtype=np.uint8) * 255
+    mask[int(zone.y1):int(zone.y2), int(zone.x1):int(zone.x2)] = 0
+
+    red_overlay = np.zeros_like(frame)
+    red_overlay[:, :] = (0, 0, 255)
+    alpha = 0.4
+    mask_3channel = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
+    red_blend = cv2.addWeighted(frame, 1 - alpha, red_overlay, alpha, 0)
+    frame[:] = np.where(mask_3channel == 255, red_blend, frame)
+
+    cv2.rectangle(frame, (int(zone.x1), int(zone.y1)), (int(zone.x2), int(zone.y2)), (255, 255, 255), 3)
+    ZoneRenderer.draw_boxes(frame, boxes)
+    return frame
+
+
+def measure_render(render, frames: List[np.ndarray], boxes) -> tuple:
+    """(ms/frame, pic d'allocation moyen par frame en octets) d'une fonction d'annotation"""
+    work = [frame.copy() for frame in frames]
+    start = time.perf_counter()
+    for frame in work:
+        render(frame, boxes)
+    elapsed = time.perf_counter() - start
+
+    # Passe séparée : tracemalloc ralentit fortement les allocations
+    work = [frame.copy() for frame in frames]
+    peaks = []
+    tracemalloc.start()
+    for frame in work:
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        render(frame, boxes)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    return 1000 * elapsed / len(frames), sum(peaks) / len(peaks)
+
+
+def bench_render(args) -> None:
+    """Coût d'annotation par frame : calque recalculé à chaque frame vs calque précalculé"""
+    from rendering import ZoneRenderer
+    from schemas import Zone
+
+    video_path = args.video or str(make_sample_clip())
+    frames = read_frames(video_path, args.frames)
+    height, width = frames[0].shape[:2]
+    zone = Zone(x1=width / 4, y1=height / 4, x2=3 * width / 4, y2=3 * height / 4)
+    boxes = [
+        {"x1": width * (0.3 + 0.1 * i), "y1": height * 0.4, "x2": width * (0.36 + 0.1 * i),
+         "y2": height * 0.7, "confidence": 0.87, "track_id": i + 1}
+        for i in range(args.boxes)
+    ]
+    renderer = ZoneRenderer(width, height, zone)
+
+    # Les deux rendus doivent produire exactement les mêmes pixels
+    identical = all(
+        np.array_equal(annotate_per_frame(frame.copy(), zone, boxes), renderer.render(frame.copy(), boxes))
+        for frame in frames[:5]
+    )
+
+    frame_bytes = frames[0].nbytes
+    print(f"\n{len(frames)} frames {width}x{height} de {video_path}, {args.boxes} boxes par frame")
+    print(f"{'rendu':>12} | {'ms/frame':>9} | {'alloc. pic/frame':>16} | {'frames pleins':>13}")
+    for name, render in (
+        ("par frame", lambda frame, frame_boxes: annotate_per_frame(frame, zone, frame_boxes)),
+        ("précalculé", renderer.render),
+    ):
+        ms_per_frame, peak = measure_render(render, frames, boxes)
+        print(f"{name:>12} | {ms_per_frame:>9.2f} | {peak / 1024:>13.0f} Ko | {peak / frame_bytes:>13.2f}")
+    print(f"Pixels identiques : {'oui' if identical else 'NON'}")
+
+
+def bench_motion(args) -> None:
+    """Détection complète avec et sans filtre de mouvement : coût et écart des résultats"""
+    from detection import get_model, run_detection
+
+    video_path = args.video or str(make_idle_clip())
+    get_model()
+
+    runs = {}
+    for motion_gate in (False, True):
+        start = time.perf_counter()
+        result = run_detection(video_path, render_video=False, motion_gate=motion_gate)
+        runs[motion_gate] = (result, time.perf_counter() - start)
+
+    (reference, full_elapsed), (gated, gated_elapsed) = runs[False], runs[True]
+    boxes_by_frame = [
+        {detection["frame"]: np.array([[box["x1"], box["y1"], box["x2"], box["y2"]] for box in detection["boxes"]],
+                                      dtype=np.float32)
+         for detection in result["detections"]}
+        for result in (reference, gated)
+    ]
+    empty = np.zeros((0, 4), dtype=np.float32)
+    total = sum(len(boxes) for boxes in boxes_by_frame[0].values())
+    found = sum(count_matches(boxes, boxes_by_frame[1].get(frame, empty))
+                for frame, boxes in boxes_by_frame[0].items())
+
+    print(f"\n{reference['total_frames']} frames de {video_path}")
+    print(f"{'mode':>10} | {'secondes':>8} | {'frames détectés':>15} | {'frames sautés':>13}")
+    print(f"{'complet':>10} | {full_elapsed:>8.2f} | {reference['inferred_frames']:>15} | {0:>13}")
+    print(f"{'mouvement':>10} | {gated_elapsed:>8.2f} | {gated['inferred_frames']:>15} | "
+          f"{gated['motion_skipped_frames']:>13}")
+    print(f"Temps de calcul : {100 * gated_elapsed / full_elapsed:.1f}% de la détection complète")
+    if total:
+        print(f"Boxes retrouvées (IoU ≥ 0.5) : {100 * found / total:.1f}% ({total - found} sur {total} manquées)")
+
+
+def bench_backends(args) -> None:
+    """Latence, débit et accord des boxes de chaque backend d'inférence vs PyTorch"""
+    from backends import load_model
+    from config import IA_WORKER_THREADS
+    from detection import predict_batch
+
+    video_path = args.video or str(make_sample_clip())
+    frames = read_frames(video_path, args.frames)
+    height, width = frames[0].shape[:2]
+
+    reference = None
+    print(f"\n{len(frames)} frames {width}x{height} de {video_path}, {IA_WORKER_THREADS} thread(s)")
+    print(f"{'backend':>14} | {'ms/frame (lot 1)':>16} | {'p95 ms':>7} | {f'fps (lot {args.batch_size})':>11} | "
+          f"{'accord vs PyTorch':>17}")
+
+    for name in args.backends.split(","):
+        backend, _, variant = name.partition("-")
+        model = load_model(backend, variant == "int8", threads=IA_WORKER_THREADS)
+        predict_batch(model, frames[:1])  # préchauffage (export, compilation)
+
+        latencies, detections = [], []
+        for frame in frames:
+            start = time.perf_counter()
+            boxes = predict_batch(model, [frame])[0]
+            latencies.append(1000 * (time.perf_counter() - start))
+            detections.append(boxes.xyxy[boxes.cls == 0])
+
+        start = time.perf_counter()
+        for i in range(0, len(frames), args.batch_size):
+            predict_batch(model, frames[i:i + args.batch_size])
+        throughput = len(frames) / (time.perf_counter() - start)
+
+        if reference is None:
+            reference = detections
+        total = sum(len(boxes) for boxes in reference)
+        found = sum(count_matches(ref, cand) for ref, cand in zip(reference, detections))
+        extra = sum(len(boxes) for boxes in detections) - found
+        agreement = f"{100 * found / total:.1f}% (+{extra})" if total else "-"
+
+        print(f"{name:>14} | {np.mean(latencies):>16.1f} | {np.percentile(latencies, 95):>7.1f} | "
+              f"{throughput:>11.2f} | {agreement:>17}")
+    print("Accord : boxes de la première ligne retrouvées (IoU ≥ 0.5), (+ détections supplémentaires)")
+
+
+def bench_live(args) -> None:
+    """Analyse en direct d'un clip diffusé par ffmpeg : débit, frames abandonnés et retard sur le direct"""
+    from detection import get_model
+    from live import run_stream
+
+    video_path = args.video or str(make_sample_clip())
+    get_model()
+
+    standin = serve_stream(video_path, args.port)
+    time.sleep(1.0)  # ffmpeg doit écouter avant la connexion
+    try:
+        print(f"\n{'t (s)':>6} | {'lus':>6} | {'détectés':>8} | {'abandonnés':>10} | {'fps source':>10} | "
+              f"{'fps détection':>13} | {'retard ms':>9} | {'personnes':>9}")
+
+        def show(stats) -> None:
+            latency = f"{stats['latency_ms']:.0f}" if stats["latency_ms"] is not None else "-"
+            print(f"{stats['uptime_seconds']:>6.1f} | {stats['frames_read']:>6} | {stats['frames_processed']:>8} | "
+                  f"{stats['frames_dropped']:>10} | {stats['source_fps']:>10.1f} | {stats['processing_fps']:>13.1f} | "
+                  f"{latency:>9} | {stats['current_people']:>9}")
+
+        result = run_stream(f"tcp://127.0.0.1:{args.port}", batch_size=args.batch_size,
+                            max_duration=args.seconds, publish=show)
+    finally:
+        standin.terminate()
+        standin.wait()
+
+    read = max(1, result["frames_read"])
+    print(f"\nFrames détectés : {result['frames_processed']}/{result['frames_read']} "
+          f"({100 * result['frames_processed'] / read:.1f}%), abandonnés : {result['frames_dropped']} "
+          f"({100 * result['frames_dropped'] / read:.1f}%)")
+    print(f"Personnes suivies distinctes : {result['total_tracks']}")
+
+
+def bench_scheduler(args) -> None:
+    """
+    Plusieurs vidéos détectées l'une après l'autre vs dans des lots partagés (scheduler.py)
+
+    Les vidéos sont le même clip décalé de quelques frames, admises l'une après
+    l'autre (--stagger lots) : les lots partagés mêlent des images différentes, et
+    les track_ids de chaque vidéo doivent être ceux de sa détection seule (aucun
+    échange entre trackers). Code de sortie 1 sinon.
+    """
+    from detection import DetectionSession, get_model, run_detection
+    from scheduler import SharedBatchScheduler
+
+    video_path = args.video or str(make_sample_clip())
+    yolo_model = get_model()
+    starts = [index * args.offset for index in range(args.videos)]
+
+    def track_ids(result) -> list:
+        return [(detection["frame"], [box["track_id"] for box in detection["boxes"]])
+                for detection in result["detections"]]
+
+    start = time.perf_counter()
+    sequential = [run_detection(video_path, render_video=False, start_frame=first) for first in starts]
+    sequential_elapsed = time.perf_counter() - start
+
+    scheduler = SharedBatchScheduler(yolo_model, args.batch_size)
+    start = time.perf_counter()
+    shared, admitted, steps = {}, 0, 0
+    while admitted < len(starts) or len(scheduler):
+        # Vidéo suivante admise pendant que les précédentes sont en cours
+        while admitted < len(starts) and steps >= admitted * args.stagger:
+            scheduler.add(admitted, DetectionSession(video_path, render_video=False, start_frame=starts[admitted]))
+            admitted += 1
+        for index, result, error in scheduler.step():
+            if error is not None:
+                raise error
+            shared[index] = result
+        steps += 1
+    shared_elapsed = time.perf_counter() - start
+
+    frames = sum(result["total_frames"] for result in sequential)
+    print(f"\n{args.videos} vidéos ({frames} frames) de {video_path}, lots partagés de {args.batch_size} frames")
+    print(f"{'mode':>10} | {'secondes':>8} | {'frames/s':>8}")
+    print(f"{'successif':>10} | {sequential_elapsed:>8.2f} | {frames / sequential_elapsed:>8.1f}")
+    print(f"{'partagé':>10} | {shared_elapsed:>8.2f} | {frames / shared_elapsed:>8.1f}")
+
+    print(f"\n{'vidéo':>5} | {'lots':>5} | {'vidéos/lot':>10} | {'latence ms':>10} | {'p95 ms':>7} | "
+          f"{'durée s':>7} | {'track_ids identiques':>20}")
+    failures = 0
+    for index, reference in enumerate(sequential):
+        stats = shared[index]["scheduler"]
+        identical = track_ids(reference) == track_ids(shared[index])
+        failures += not identical
+        print(f"{index:>5} | {stats['shared_batches']:>5} | {stats['mean_batch_videos']:>10.2f} | "
+              f"{stats['latency_ms_mean']:>10.1f} | {stats['latency_ms_p95']:>7.1f} | "
+              f"{stats['duration_seconds']:>7.2f} | {'oui' if identical else 'NON':>20}")
+    if failures:
+        raise SystemExit(1)
+
+
+def synthetic_scene(rng, frames: int, people: int, width: int = 1280, height: int = 720) -> list:
+    """
+    Détections synthétiques (Boxes Ultralytics) d'une scène : personnes en mouvement
+    rectiligne, chacune présente sur un intervalle de frames aléatoire
+    """
+    from ultralytics.engine.results import Boxes
+
+    first = rng.integers(0, frames, people)
+    last = np.minimum(frames, first + rng.integers(frames // 4, frames, people))
+    start = rng.uniform([0, 0], [width - 80, height - 200], (people, 2))
+    speed = rng.uniform(-4, 4, (people, 2))
+    scene = []
+    for frame in range(frames):
+        present = np.flatnonzero((first <= frame) & (frame < last))
+        corner = np.clip(start[present] + speed[present] * frame, 0, [width - 80, height - 200])
+        data = np.column_stack((corner, corner + [80, 200], np.full(len(present), 0.9), np.zeros(len(present))))
+        scene.append(Boxes(data.astype(np.float32).reshape(-1, 6), (height, width)))
+    return scene
+
+
+def check_tracker(args) -> None:
+    """
+    Vérification déterministe (sans modèle) de l'indépendance des track_ids
+
+    Plusieurs scènes synthétiques sont suivies comme par l'ordonnanceur
+    multi-vidéos : trackers créés en cours de route (vidéo admise pendant que
+    d'autres sont suivies) et mis à jour à tour de rôle. Chaque scène doit
+    obtenir exactement les track_ids de son suivi seul. Code de sortie 1 sinon.
+    """
+    from tracking import create_tracker, update_tracker
+
+    rng = np.random.default_rng(args.seed)
+    scenes = [synthetic_scene(rng, args.frames, args.people) for _ in range(args.videos)]
+    blank = np.zeros((720, 1280, 3), dtype=np.uint8)
+
+    def track_ids(tracks: np.ndarray) -> list:
+        return tracks[:, 6].astype(int).tolist()
+
+    solo = []
+    for scene in scenes:
+        tracker = create_tracker()
+        solo.append([track_ids(update_tracker(tracker, boxes, blank)) for boxes in scene])
+
+    # La vidéo i est admise après i * stagger tours ; chaque tour suit `quota` frames par vidéo
+    trackers, shared, positions = {}, [[] for _ in scenes], [0] * len(scenes)
+    turn = 0
+    while any(position < len(scene) for position, scene in zip(positions, scenes)):
+        for index, scene in enumerate(scenes):
+            if turn < index * args.stagger or positions[index] >= len(scene):
+                continue
+            if index not in trackers:
+                trackers[index] = create_tracker()
+            for boxes in scene[positions[index]:positions[index] + args.quota]:
+                shared[index].append(track_ids(update_tracker(trackers[index], boxes, blank)))
+            positions[index] = min(len(scene), positions[index] + args.quota)
+        turn += 1
+
+    failures = 0
+    print(f"\n{args.videos} scènes de {args.frames} frames, {args.people} personnes, "
+          f"admission tous les {args.stagger} tours, {args.quota} frame(s) par tour")
+    print(f"{'vidéo':>5} | {'track_ids':>9} | {'identiques au suivi seul':>24}")
+    for index, (reference, candidate) in enumerate(zip(solo, shared)):
+        identical = reference == candidate
+        failures += not identical
+        count = len({track_id for ids in reference for track_id in ids})
+        print(f"{index:>5} | {count:>9} | {'oui' if identical else 'NON':>24}")
+    if failures:
+        raise SystemExit(1)
+
+
+def bench_imgsz(args) -> None:
+    """
+    Tailles d'entrée fixes vs taille adaptative : débit et exactitude du comptage
+
+    La référence est la détection à la première taille de --sizes. Sans --video,
+    deux clips d'exemple : grandes personnes (panoramique) et petites (mosaïque).
+    """
+    from detection import get_model, run_detection
+
+    clips = [args.video] if args.video else [str(make_sample_clip()), str(make_distant_clip())]
+    sizes = [int(size) for size in args.sizes.split(",")]
+    get_model()
+
+    for video_path in clips:
+        runs = [(f"fixe {size}", {"imgsz": size, "adaptive_imgsz": False}) for size in sizes]
+        runs.append(("adaptatif", {"imgsz": sizes[0], "adaptive_imgsz": True}))
+
+        measured = []
+        for name, options in runs:
+            start = time.perf_counter()
+            result = run_detection(video_path, render_video=False, **options)
+            measured.append((name, result, time.perf_counter() - start))
+
+        boxes_by_frame = [
+            {detection["frame"]: np.array([[box["x1"], box["y1"], box["x2"], box["y2"]] for box in detection["boxes"]],
+                                          dtype=np.float32)
+             for detection in result["detections"]}
+            for _, result, _ in measured
+        ]
+        reference = boxes_by_frame[0]
+        total_frames = measured[0][1]["total_frames"]
+        total = sum(len(boxes) for boxes in reference.values())
+        empty = np.zeros((0, 4), dtype=np.float32)
+
+        print(f"\n{total_frames} frames de {video_path}")
+        print(f"{'mode':>10} | {'imgsz':>13} | {'frames/s':>8} | {'écart comptage':>14} | {'boxes retrouvées':>16}")
+        for (name, result, elapsed), boxes in zip(measured, boxes_by_frame):
+            frames = range(total_frames)
+            count_error = np.mean([abs(len(boxes.get(frame, empty)) - len(reference.get(frame, empty)))
+                                   for frame in frames])
+            found = sum(count_matches(reference_boxes, boxes.get(frame, empty))
+                        for frame, reference_boxes in reference.items())
+            recall = f"{100 * found / total:.1f}%" if total else "-"
+            imgsz = "→".join(str(change["imgsz"]) for change in result["imgsz_changes"] or []) or str(result["imgsz"])
+            print(f"{name:>10} | {imgsz:>13} | {total_frames / elapsed:>8.1f} | {count_error:>14.2f} | {recall:>16}")
+    print("Écart comptage : différence moyenne du nombre de personnes par frame avec la référence")
+
+
+def bench_decode(args) -> None:
+    """
+    Décodage synchrone vs anticipé (decoding.py), par décodeur : temps par étape
+
+    Chaque frame est décodé, détecté par lots puis annoté, comme pendant une
+    détection avec vidéo annotée. Avec le décodage anticipé, l'attente du
+    décodeur doit tendre vers 0 et la durée totale vers inférence + annotation.
+    """
+    from decoding import open_frame_reader
+    from detection import get_model, predict_batch, probe_video
+    from rendering import ZoneRenderer
+    from schemas import Zone
+
+    video_path = args.video or str(make_sample_clip())
+    total_frames, fps, width, height = probe_video(video_path)
+    end_frame = min(total_frames, args.frames) if args.frames else None
+    model = get_model()
+    renderer = ZoneRenderer(width, height, Zone(x1=0, y1=0, x2=width, y2=height))
+    predict_batch(model, read_frames(video_path, 1))  # préchauffage
+
+    print(f"\n{end_frame or total_frames} frames {width}x{height} de {video_path}, lots de {args.batch_size}")
+    print(f"{'décodeur':>8} | {'anticipés':>9} | {'décodage s':>10} | {'attente s':>9} | {'inférence s':>11} | "
+          f"{'annotation s':>12} | {'total s':>7} | {'frames/s':>8}")
+    for backend in args.backends.split(","):
+        for prefetch in (0, args.prefetch):
+            frames = open_frame_reader(video_path, 0, end_frame, fps, width, height, lambda number: (True, True),
+                                       args.batch_size, prefetch=prefetch, backend=backend)
+            inference = annotation = 0.0
+            count = 0
+            start = time.perf_counter()
+            try:
+                while True:
+                    batch = [item for item in (frames.next() for _ in range(args.batch_size)) if item is not None]
+                    if not batch:
+                        break
+                    started = time.perf_counter()
+                    predict_batch(model, [image for _, image, _ in batch])
+                    inference += time.perf_counter() - started
+                    started = time.perf_counter()
+                    for _, image, _ in batch:
+                        renderer.render(image, [])
+                        frames.release(image)
+                    annotation += time.perf_counter() - started
+                    count += len(batch)
+            finally:
+                frames.close()
+            elapsed = time.perf_counter() - start
+            print(f"{backend:>8} | {prefetch:>9} | {frames.decode_seconds:>10.2f} | {frames.wait_seconds:>9.2f} | "
+                  f"{inference:>11.2f} | {annotation:>12.2f} | {elapsed:>7.2f} | {count / elapsed:>8.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmarks du service IA VisionTrack")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = subparsers.add_parser("batch", help="Débit selon la taille des lots d'inférence")
+    batch_parser.add_argument("--video", help="Vidéo à utiliser (clip d'exemple par défaut)")
+    batch_parser.add_argument("--frames", type=int, default=120, help="Nombre de frames mesurés")
+    batch_parser.add_argument("--batch-sizes", default="1,2,4,8", help="Tailles de lot, séparées par des virgules")
+    batch_parser.set_defaults(func=bench_batch)
+
+    zone_parser = subparsers.add_parser("zone", help="Inférence restreinte à la zone vs frame entier")
+    zone_parser.add_argument("--video", help="Vidéo à utiliser (clip d'exemple par défaut)")
+    zone_parser.add_argument("--frames", type=int, default=60, help="Nombre de frames mesurés")
+    zone_parser.add_argument("--zone", help="x1,y1,x2,y2 (zone centrée d'un quart de surface par défaut)")
+    zone_parser.add_argument("--margin", type=int, default=64, help="Marge autour de la zone (pixels)")
+    zone_parser.set_defaults(func=bench_zone)
+
+    zone_check_parser = subparsers.add_parser("zone-check", help="Recadrage sur zone : boxes identiques au frame entier (sans modèle)")
+    zone_check_parser.add_argument("--cases", type=int, default=500, help="Nombre de frames synthétiques vérifiés")
+    zone_check_parser.add_argument("--seed", type=int, default=0, help="Graine du générateur aléatoire")
+    zone_check_parser.set_defaults(func=check_zone)
+
+    render_parser = subparsers.add_parser("render", help="Coût de l'annotation des frames")
+    render_parser.add_argument("--video", help="Vidéo à utiliser (clip d'exemple par défaut)")
+    render_parser.add_argument("--frames", type=int, default=120, help="Nombre de frames mesurés")
+    render_parser.add_argument("--boxes", type=int, default=4, help="Personnes dessinées par frame")
+    render_parser.set_defaults(func=bench_render)
+
+    motion_parser = subparsers.add_parser("motion", help="Filtre de mouvement vs détection de chaque frame")
+    motion_parser.add_argument("--video", help="Vidéo à utiliser (clip majoritairement fixe par défaut)")
+    motion_parser.set_defaults(func=bench_motion)
+
+    backends_parser = subparsers.add_parser("backends", help="Backends d'inférence CPU (PyTorch, ONNX, OpenVINO)")
+    backends_parser.add_argument("--video", help="Vidéo à utiliser (clip d'exemple par défaut)")
+    backends_parser.add_argument("--frames", type=int, default=60, help="Nombre de frames mesurés")
+    backends_parser.add_argument("--backends", default="pytorch,onnx,onnx-int8,openvino,openvino-int8",
+                                 help="Backends comparés (le premier sert de référence), suffixe -int8 pour la variante quantifiée")
+    backends_parser.add_argument("--batch-size", type=int, default=4, help="Taille de lot pour la mesure du débit")
+    backends_parser.set_defaults(func=bench_backends)
+
+    live_parser = subparsers.add_parser("live", help="Analyse en direct d'un clip diffusé par ffmpeg")
+    live_parser.add_argument("--video", help="Vidéo diffusée en boucle (clip d'exemple par défaut)")
+    live_parser.add_argument("--seconds", type=float, default=20, help="Durée de l'analyse")
+    live_parser.add_argument("--batch-size", type=int, default=1, help="Frames détectés par appel au modèle")
+    live_parser.add_argument("--port", type=int, default=9000, help="Port TCP du flux de substitution")
+    live_parser.set_defaults(func=bench_live)
+
+    scheduler_parser = subparsers.add_parser("scheduler", help="Vidéos simultanées dans des lots partagés")
+    scheduler_parser.add_argument("--video", help="Vidéo à utiliser (clip d'exemple par défaut)")
+    scheduler_parser.add_argument("--videos", type=int, default=4, help="Nombre de vidéos simultanées")
+    scheduler_parser.add_argument("--offset", type=int, default=10, help="Décalage (frames) entre deux vidéos")
+    scheduler_parser.add_argument("--batch-size", type=int, default=8, help="Taille des lots partagés")
+    scheduler_parser.add_argument("--stagger", type=int, default=2, help="Lots entre deux admissions de vidéo")
+    scheduler_parser.set_defaults(func=bench_scheduler)
+
+    tracker_check_parser = subparsers.add_parser("tracker-check",
+                                                 help="track_ids indépendants entre vidéos d'un worker (sans modèle)")
+    tracker_check_parser.add_argument("--videos", type=int, default=4, help="Nombre de scènes suivies ensemble")
+    tracker_check_parser.add_argument("--frames", type=int, default=120, help="Frames par scène")
+    tracker_check_parser.add_argument("--people", type=int, default=6, help="Personnes par scène")
+    tracker_check_parser.add_argument("--stagger", type=int, default=3, help="Tours entre deux admissions")
+    tracker_check_parser.add_argument("--quota", type=int, default=2, help="Frames suivis par vidéo et par tour")
+    tracker_check_parser.add_argument("--seed", type=int, default=0, help="Graine du générateur aléatoire")
+    tracker_check_parser.set_defaults(func=check_tracker)
+
+    imgsz_parser = subparsers.add_parser("imgsz", help="Tailles d'entrée fixes vs taille adaptative")
+    imgsz_parser.add_argument("--video", help="Vidéo à utiliser (clips d'exemple par défaut)")
+    imgsz_parser.add_argument("--sizes", default="640,480,320",
+                              help="Tailles fixes comparées, la première sert de référence et de taille de base")
+    imgsz_parser.set_defaults(func=bench_imgsz)
+
+    decode_parser = subparsers.add_parser("decode", help="Décodage synchrone vs anticipé (thread lecteur)")
+    decode_parser.add_argument("--video", help="Vidéo à utiliser (clip d'exemple par défaut)")
+    decode_parser.add_argument("--frames", type=int, default=0, help="Nombre de frames mesurés (0 = toute la vidéo)")
+    decode_parser.add_argument("--backends", default="opencv,ffmpeg", help="Décodeurs comparés")
+    decode_parser.add_argument("--prefetch", type=int, default=8, help="Frames décodés d'avance")
+    decode_parser.add_argument("--batch-size", type=int, default=4, help="Taille des lots d'inférence")
+    decode_parser.set_defaults(func=bench_decode)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Détection découpée d'une longue vidéo VisionTrack
+
+La vidéo est coupée en segments (alignés sur les images clés), chaque segment
+est détecté et suivi par un worker différent, puis les track_ids sont raccordés
+d'un segment à l'autre par IoU sur une zone de recouvrement. Les segments annotés
+sont rendus en parallèle puis concaténés par ffmpeg sans réencodage.
+
+La coordination s'exécute dans le processus principal (voir JobManager) ;
+tout le calcul lourd reste dans les workers.
+"""
+
+import bisect
+import re
+import subprocess
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import CHUNK_MIN_FRAMES, CHUNK_OVERLAP_FRAMES, GENERATE_ANNOTATED_VIDEO_BY_DEFAULT
+from errors import DetectionError
+from rendering import annotated_video_path_for, package_hls
+
+# Segment de vidéo : (premier frame, frame de fin exclu)
+Segment = Tuple[int, int]
+
+# Exécute des sous-tâches dans le pool de workers et renvoie leurs résultats dans l'ordre
+RunChildren = Callable[[str, List[Dict]], List[Dict]]
+
+# IoU minimale pour qu'une box d'un segment et celle du segment suivant désignent la même personne
+STITCH_IOU_THRESHOLD = 0.5
+
+
+def run_chunked_detection(payload: Dict, segments: int, run_children: RunChildren,
+                          set_total_frames: Callable[[int], None]) -> Dict:
+    """
+    Détection d'une vidéo découpée en segments traités en parallèle
+
+    Args:
+        payload: Paramètres de la détection (mêmes clés que run_detection)
+        segments: Nombre de segments souhaité (réduit pour les vidéos courtes)
+        run_children: Exécute une liste de sous-tâches dans les workers (bloquant)
+        set_total_frames: Déclare le nombre total de frames à traiter (progression)
+
+    Returns:
+        Dict compatible avec DetectionResponse, track_ids cohérents sur toute la vidéo
+    """
+    video_path = payload["video_path"]
+    total_frames, fps = probe_frame_count(video_path)
+
+    keyframes = keyframe_indices(video_path, fps)
+    plan = plan_segments(total_frames, segments, keyframes)
+    render_video = payload.get("render_video")
+    render_video = GENERATE_ANNOTATED_VIDEO_BY_DEFAULT if render_video is None else render_video
+
+    if len(plan) == 1:
+        print("Vidéo trop courte pour être découpée : détection en un seul segment")
+        set_total_frames(total_frames)
+        return run_children("detect", [payload])[0]
+
+    overlap = CHUNK_OVERLAP_FRAMES
+    print(f"✓ Détection découpée en {len(plan)} segments (recouvrement {overlap} frames) : {plan}")
+
+    # Chaque segment (sauf le premier) démarre `overlap` frames plus tôt : le tracker
+    # se stabilise sur ces frames, qui servent ensuite au raccordement des track_ids.
+    # Le dernier segment est lu jusqu'à la fin du flux (nombre de frames estimé)
+    detect_payloads = [
+        {**payload, "render_video": False, "start_frame": max(0, start - overlap),
+         "end_frame": end if end < total_frames else None}
+        for start, end in plan
+    ]
+    detected_frames = sum(end - task["start_frame"] for task, (_, end) in zip(detect_payloads, plan))
+    set_total_frames(detected_frames + (total_frames if render_video else 0))
+
+    results = run_children("detect", detect_payloads)
+    detections = stitch_segments([result["detections"] for result in results], plan, overlap)
+    print(f"✓ {len(plan)} segments raccordés : "
+          f"{len({box['track_id'] for det in detections for box in det['boxes']} - {None})} track_ids")
+
+    annotated_video_path = None
+    hls_playlist_path = None
+    parts = []
+    if render_video:
+        render_payloads = []
+        for part, (start, end) in enumerate(plan):
+            render_payloads.append({
+                "video_path": video_path,
+                "zone": payload.get("zone"),
+                "zones": payload.get("zones"),
+                "detections": [det for det in detections
+                               if start <= det["frame"] and (det["frame"] < end or end == total_frames)],
+                "start_frame": start,
+                "end_frame": end if end < total_frames else None,
+                "part": part,
+            })
+        parts = run_children("render", render_payloads)
+        output_path = annotated_video_path_for(video_path)
+        if concat_videos([Path(part["annotated_video_path"]) for part in parts], output_path):
+            annotated_video_path = str(output_path)
+            hls_playlist_path = package_hls(output_path)
+
+    return {
+        "message": "Détection terminée avec succès",
+        # Frames de recouvrement comptés une seule fois
+        "total_frames": sum(
+            result["total_frames"] - (start - task["start_frame"])
+            for result, task, (start, _) in zip(results, detect_payloads, plan)
+        ),
+        "fps": fps,
+        "width": results[0].get("width"),
+        "height": results[0].get("height"),
+        "detections": detections,
+        "annotated_video_path": annotated_video_path,
+        "hls_playlist_path": str(hls_playlist_path) if hls_playlist_path else None,
+        "inference_region": results[0].get("inference_region"),
+        "inferred_frames": sum(result.get("inferred_frames") or 0 for result in results),
+        "frame_stride": results[0].get("frame_stride", 1),
+        "motion_skipped_frames": sum(result.get("motion_skipped_frames") or 0 for result in results),
+        # Taille adaptative : chaque segment mesure la sienne
+        "imgsz": results[-1].get("imgsz"),
+        "imgsz_changes": [change for result in results for change in result.get("imgsz_changes") or []] or None,
+        # Temps cumulés de tous les segments (détection et rendu), workers confondus
+        "timings": sum_timings(results + parts),
+    }
+
+
+def sum_timings(results: List[Dict]) -> Optional[Dict[str, float]]:
+    """Somme, étape par étape, des temps des segments"""
+    timings = [result["timings"] for result in results if result.get("timings")]
+    if not timings:
+        return None
+    return {stage: round(sum(entry.get(stage, 0.0) for entry in timings), 3) for stage in timings[0]}
+
+
+def probe_frame_count(video_path: str) -> Tuple[int, float]:
+    """(total_frames, fps) de la vidéo, sans charger le modèle"""
+    if not Path(video_path).exists():
+        raise DetectionError(404, f"Vidéo non trouvée : {video_path}")
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise DetectionError(400, "Impossible d'ouvrir la vidéo")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return total_frames, fps
+
+
+def keyframe_indices(video_path: str, fps: float) -> Optional[List[int]]:
+    """
+    Numéros des images clés de la vidéo (None si ffmpeg est indisponible)
+
+    Seules les images clés sont décodées (-skip_frame nokey) : rapide même
+    pour une vidéo d'une heure.
+    """
+    ffmpeg_cmd = [
+        "ffmpeg", "-hide_banner", "-nostats",
+        "-skip_frame", "nokey",
+        "-i", video_path,
+        "-an", "-vf", "showinfo",
+        "-f", "null", "-"
+    ]
+    try:
+        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True)
+    except (FileNotFoundError, subprocess.CalledProcessError) as exc:
+        print(f"ATTENTION : Images clés indisponibles ({exc}), découpage uniforme")
+        return None
+
+    times = re.findall(r"pts_time:\s*([0-9.]+)", result.stderr)
+    return sorted({int(round(float(time) * fps)) for time in times})
+
+
+def plan_segments(total_frames: int, segments: int, keyframes: Optional[List[int]] = None,
+                  min_frames: int = CHUNK_MIN_FRAMES) -> List[Segment]:
+    """
+    Découpe [0, total_frames) en segments contigus de tailles proches
+
+    Les frontières sont déplacées sur l'image clé la plus proche (reprise de
+    lecture sans décodage inutile) ; aucun segment ne descend sous min_frames.
+    """
+    count = max(1, min(segments, total_frames // max(1, min_frames)))
+    bounds = [round(i * total_frames / count) for i in range(1, count)]
+
+    if keyframes:
+        snapped = []
+        for bound in bounds:
+            index = bisect.bisect_left(keyframes, bound)
+            candidates = keyframes[max(0, index - 1):index + 1]
+            snapped.append(min(candidates, key=lambda keyframe: abs(keyframe - bound)))
+        bounds = snapped
+
+    edges = [0] + sorted({bound for bound in bounds if 0 < bound < total_frames}) + [total_frames]
+    return [(start, end) for start, end in zip(edges, edges[1:])]
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Matrice IoU entre deux ensembles de boxes xyxy (N, 4) et (M, 4)"""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:4], b[None, :, 2:4])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:4] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:4] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match_tracks(previous: Dict[int, List[Dict]], current: Dict[int, List[Dict]],
+                 frames: range, threshold: float = STITCH_IOU_THRESHOLD) -> Dict[int, int]:
+    """
+    Associe les track_ids locaux d'un segment aux track_ids globaux du segment précédent
+
+    Sur chaque frame du recouvrement, chaque paire de boxes avec IoU >= threshold
+    compte un vote ; les paires sont ensuite retenues par nombre de votes
+    décroissant, chaque identifiant n'étant utilisé qu'une fois.
+    """
+    votes = Counter()
+    for frame in frames:
+        previous_boxes = [box for box in previous.get(frame, []) if box["track_id"] is not None]
+        current_boxes = [box for box in current.get(frame, []) if box["track_id"] is not None]
+        if not previous_boxes or not current_boxes:
+            continue
+
+        iou = box_iou(_xyxy(previous_boxes), _xyxy(current_boxes))
+        for i, j in zip(*np.nonzero(iou >= threshold)):
+            votes[(current_boxes[j]["track_id"], previous_boxes[i]["track_id"])] += 1
+
+    mapping: Dict[int, int] = {}
+    used = set()
+    for (local_id, global_id), _ in votes.most_common():
+        if local_id not in mapping and global_id not in used:
+            mapping[local_id] = global_id
+            used.add(global_id)
+    return mapping
+
+
+def stitch_segments(segment_detections: List[List[Dict]], plan: List[Segment], overlap: int) -> List[Dict]:
+    """
+    Fusionne les détections des segments avec des track_ids globaux
+
+    Chaque segment ne garde que les frames de son intervalle propre ; ses frames
+    de recouvrement (avant son début) servent uniquement au raccordement avec le
+    segment précédent. Les tracks sans correspondance reçoivent un nouvel identifiant.
+    """
+    stitched: List[Dict] = []
+    next_id = 1
+    previous: Dict[int, List[Dict]] = {}
+
+    for (start, end), detections in zip(plan, segment_detections):
+        by_frame = {detection["frame"]: detection["boxes"] for detection in detections}
+        mapping = match_tracks(previous, by_frame, range(max(0, start - overlap), start))
+
+        segment_frames = []
+        last_segment = end == plan[-1][1]
+        for frame in sorted(frame for frame in by_frame if start <= frame and (frame < end or last_segment)):
+            boxes = []
+            for box in by_frame[frame]:
+                local_id = box["track_id"]
+                if local_id is not None and local_id not in mapping:
+                    mapping[local_id] = next_id
+                    next_id += 1
+                boxes.append({**box, "track_id": mapping[local_id] if local_id is not None else None})
+            segment_frames.append({"frame": frame, "boxes": boxes})
+
+        stitched.extend(segment_frames)
+        previous = {detection["frame"]: detection["boxes"] for detection in segment_frames
+                    if detection["frame"] >= end - overlap}
+
+    return stitched
+
+
+def concat_videos(parts: List[Path], output_path: Path) -> bool:
+    """
+    Concatène des segments encodés à l'identique (ffmpeg concat, copie des flux)
+
+    Les segments et la liste temporaire sont supprimés dans tous les cas.
+    """
+    list_path = output_path.with_name(f"{output_path.stem}_parts.txt")
+    list_path.write_text("".join(f"file '{part.resolve()}'\n" for part in parts))
+
+    ffmpeg_cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0",
+        "-i", str(list_path),
+        "-c", "copy",
+        "-movflags", "+faststart",
+        str(output_path)
+    ]
+    try:
+        subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True)
+        print(f"✓ {len(parts)} segments concaténés : {output_path}")
+        return True
+    except FileNotFoundError:
+        print("ERREUR : ffmpeg est introuvable dans le conteneur")
+    except subprocess.CalledProcessError as exc:
+        print("ERREUR : ffmpeg a échoué à concaténer les segments")
+        print(exc.stderr)
+    finally:
+        list_path.unlink(missing_ok=True)
+        for part in parts:
+            part.unlink(missing_ok=True)
+
+    return False
+
+
+def _xyxy(boxes: List[Dict]) -> np.ndarray:
+    return np.array([[box["x1"], box["y1"], box["x2"], box["y2"]] for box in boxes], dtype=np.float32)
@@ -0,0 +1,165 @@
+"""
+Configuration du service IA VisionTrack
+Toutes les valeurs sont lues depuis les variables d'environnement (.env)
+"""
+
+import os
+
+# Configuration from environment variables
+YOLO_MODEL = os.getenv("YOLO_MODEL", "yolov8n.pt")
+CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.5"))
+TRACKER_CONFIG = os.getenv("TRACKER_CONFIG", "bytetrack.yaml")
+
+# Backend d'inférence : pytorch (défaut), onnx (ONNX Runtime) ou openvino ; le modèle
+# est exporté une seule fois dans MODEL_CACHE_DIR. INFERENCE_INT8 : variante quantifiée
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "pytorch").lower()
+INFERENCE_INT8 = os.getenv("INFERENCE_INT8", "false").lower() == "true"
+MODEL_CACHE_DIR = os.getenv("MODEL_CACHE_DIR", "/app/shared/models")
+# Calibration INT8 : vidéo représentative (clip d'exemple si vide) et nombre de frames utilisés
+INT8_CALIBRATION_VIDEO = os.getenv("INT8_CALIBRATION_VIDEO", "")
+INT8_CALIBRATION_FRAMES = max(1, int(os.getenv("INT8_CALIBRATION_FRAMES", "32")))
+
+# Taille d'entrée du modèle (côté le plus long, en pixels)
+INFERENCE_IMGSZ = int(os.getenv("INFERENCE_IMGSZ", "640"))
+
+# Nombre de frames détectés en un seul appel au modèle (1 = frame par frame)
+INFERENCE_BATCH_SIZE = max(1, int(os.getenv("INFERENCE_BATCH_SIZE", "1")))
+
+# Inférences factices exécutées par chaque worker au démarrage, avant d'accepter
+# des jobs (0 = pas de préchauffage : la première détection paie l'initialisation)
+WARMUP_ITERATIONS = max(0, int(os.getenv("WARMUP_ITERATIONS", "2")))
+
+# Taille d'entrée adaptative : hauteur des personnes mesurée à la taille de base pendant
+# ADAPTIVE_IMGSZ_PROBE_SECONDS (puis à nouveau toutes les ADAPTIVE_IMGSZ_RECHECK_SECONDS),
+# puis plus petite taille (multiple de 32, au moins ADAPTIVE_IMGSZ_MIN) où les plus petites
+# personnes gardent ADAPTIVE_IMGSZ_MIN_PERSON_PIXELS pixels de haut dans l'image du modèle
+ADAPTIVE_IMGSZ_ENABLED = os.getenv("ADAPTIVE_IMGSZ_ENABLED", "false").lower() == "true"
+ADAPTIVE_IMGSZ_MIN = max(32, int(os.getenv("ADAPTIVE_IMGSZ_MIN", "320")))
+ADAPTIVE_IMGSZ_MIN_PERSON_PIXELS = max(8, int(os.getenv("ADAPTIVE_IMGSZ_MIN_PERSON_PIXELS", "48")))
+ADAPTIVE_IMGSZ_PROBE_SECONDS = max(0.1, float(os.getenv("ADAPTIVE_IMGSZ_PROBE_SECONDS", "2.0")))
+ADAPTIVE_IMGSZ_RECHECK_SECONDS = max(1.0, float(os.getenv("ADAPTIVE_IMGSZ_RECHECK_SECONDS", "30")))
+
+# Inférence restreinte à la zone : marge (pixels) ajoutée autour de la zone avant recadrage
+ZONE_CROP_ENABLED = os.getenv("ZONE_CROP_ENABLED", "false").lower() == "true"
+ZONE_CROP_MARGIN = max(0, int(os.getenv("ZONE_CROP_MARGIN", "64")))
+
+# Échantillonnage : un frame détecté sur FRAME_STRIDE, ou cadence d'analyse visée
+# (ANALYSIS_FPS, prioritaire si > 0) ; les frames intermédiaires sont interpolés
+FRAME_STRIDE = max(1, int(os.getenv("FRAME_STRIDE", "1")))
+ANALYSIS_FPS = max(0.0, float(os.getenv("ANALYSIS_FPS", "0")))
+
+# Pas adaptatif : réduit au pas de base quand la scène s'anime, augmenté jusqu'à
+# ADAPTIVE_STRIDE_MAX quand elle est calme ou vide
+ADAPTIVE_STRIDE_ENABLED = os.getenv("ADAPTIVE_STRIDE_ENABLED", "false").lower() == "true"
+ADAPTIVE_STRIDE_MAX = max(1, int(os.getenv("ADAPTIVE_STRIDE_MAX", "8")))
+# Nombre de personnes à partir duquel la scène est considérée comme chargée
+ADAPTIVE_BUSY_PEOPLE = max(1, int(os.getenv("ADAPTIVE_BUSY_PEOPLE", "5")))
+
+# Filtre de mouvement : l'inférence est sautée (détections reconduites) si moins de
+# MOTION_MIN_AREA des pixels (fraction) varient de plus de MOTION_PIXEL_THRESHOLD niveaux de gris
+MOTION_GATE_ENABLED = os.getenv("MOTION_GATE_ENABLED", "false").lower() == "true"
+MOTION_PIXEL_THRESHOLD = max(1, int(os.getenv("MOTION_PIXEL_THRESHOLD", "15")))
+MOTION_MIN_AREA = max(0.0, float(os.getenv("MOTION_MIN_AREA", "0.002")))
+# Largeur (pixels) des images comparées
+MOTION_DOWNSCALE_WIDTH = max(16, int(os.getenv("MOTION_DOWNSCALE_WIDTH", "160")))
+# Frames échantillonnés consécutifs sans inférence avant une détection forcée
+MOTION_MAX_SKIPPED = max(1, int(os.getenv("MOTION_MAX_SKIPPED", "150")))
+
+# VIDEO_CODEC correspond désormais au format final souhaité (H264 par défaut pour compatibilité navigateur)
+VIDEO_CODEC = os.getenv("VIDEO_CODEC", "mp4v").upper()
+H264_PRESET = os.getenv("H264_PRESET", "veryfast")
+H264_CRF = os.getenv("H264_CRF", "23")
+H264_CODECS = {"H264", "AVC1", "X264"}
+VIDEO_WRITER_CODEC_OVERRIDE = os.getenv("VIDEO_WRITER_CODEC")
+NEEDS_H264_TRANSCODE = VIDEO_CODEC in H264_CODECS
+
+# Codec utilisé par OpenCV quand ffmpeg n'encode pas (mp4v si H.264 demandé mais ffmpeg absent)
+VIDEO_WRITER_CODEC = (
+    VIDEO_WRITER_CODEC_OVERRIDE.upper()
+    if VIDEO_WRITER_CODEC_OVERRIDE
+    else ("MP4V" if NEEDS_H264_TRANSCODE else VIDEO_CODEC)
+)
+
+# Décodage anticipé : frames décodés d'avance par un thread lecteur, dans un anneau de
+# tampons préalloués (0 = décodage dans la boucle de détection)
+DECODE_PREFETCH_FRAMES = max(0, int(os.getenv("DECODE_PREFETCH_FRAMES", "8")))
+# Décodeur : opencv (défaut) ou ffmpeg (processus dédié, DECODE_THREADS threads, 0 = auto)
+DECODE_BACKEND = os.getenv("DECODE_BACKEND", "opencv").lower()
+DECODE_THREADS = max(0, int(os.getenv("DECODE_THREADS", "0")))
+# Largeur maximale des frames décodés en mode détection seule (0 = résolution source) :
+# les coordonnées des détections sont ramenées à la résolution source
+DECODE_MAX_WIDTH = max(0, int(os.getenv("DECODE_MAX_WIDTH", "0")))
+
+# Frames en attente entre la boucle de détection et l'encodeur ffmpeg (H.264)
+ENCODER_QUEUE_SIZE = max(1, int(os.getenv("ENCODER_QUEUE_SIZE", "8")))
+
+# Découpage HLS de la vidéo annotée (ffmpeg, copie des flux) : lecture et recherche
+# immédiates dans le navigateur ; une image clé est forcée toutes les HLS_SEGMENT_SECONDS
+HLS_PACKAGING_ENABLED = os.getenv("HLS_PACKAGING_ENABLED", "false").lower() == "true"
+HLS_SEGMENT_SECONDS = max(1, int(os.getenv("HLS_SEGMENT_SECONDS", "4")))
+
+# Répertoire de sortie des vidéos annotées (volume partagé avec le backend)
+ANNOTATED_DIR = os.getenv("ANNOTATED_DIR", "/app/shared/annotated")
+
+# Générer la vidéo annotée pendant la détection (sinon détection seule, rendu à la demande)
+GENERATE_ANNOTATED_VIDEO_BY_DEFAULT = os.getenv("GENERATE_ANNOTATED_VIDEO_BY_DEFAULT", "true").lower() == "true"
+
+# ========== Pool de workers et file de jobs ==========
+
+# Nombre de processus workers (chacun charge son propre modèle YOLO)
+_CPU_COUNT = os.cpu_count() or 1
+IA_WORKERS = max(1, int(os.getenv("IA_WORKERS", str(max(1, _CPU_COUNT // 2)))))
+
+# Threads PyTorch par worker (évite la sur-souscription des coeurs CPU)
+IA_WORKER_THREADS = max(1, int(os.getenv("IA_WORKER_THREADS", str(max(1, _CPU_COUNT // IA_WORKERS)))))
+
+# Nombre maximum de jobs en attente avant de refuser les nouvelles requêtes (HTTP 503)
+IA_QUEUE_SIZE = max(1, int(os.getenv("IA_QUEUE_SIZE", "16")))
+
+# Nombre de jobs terminés conservés en mémoire pour consultation
+IA_JOB_RETENTION = max(1, int(os.getenv("IA_JOB_RETENTION", "100")))
+
+# ========== Détection découpée (une vidéo répartie sur plusieurs workers) ==========
+
+# Nombre de segments par vidéo : 1 = désactivé, 0 = un segment par worker
+CHUNK_SEGMENTS = max(0, int(os.getenv("CHUNK_SEGMENTS", "1")))
+
+# Frames détectés en double à chaque frontière pour raccorder les track_ids
+CHUNK_OVERLAP_FRAMES = max(1, int(os.getenv("CHUNK_OVERLAP_FRAMES", "30")))
+
+# Taille minimale d'un segment (frames) : une vidéo courte n'est pas découpée
+CHUNK_MIN_FRAMES = max(1, int(os.getenv("CHUNK_MIN_FRAMES", "300")))
+
+# ========== Analyse de flux en direct (RTSP, caméra) ==========
+
+# Frames décodés en attente de détection : au-delà, les plus anciens sont abandonnés
+# (le pipeline reste au plus près du direct au lieu d'accumuler du retard)
+LIVE_BUFFER_FRAMES = max(1, int(os.getenv("LIVE_BUFFER_FRAMES", "2")))
+
+# Fenêtre glissante des statistiques (secondes) et intervalle de publication (secondes)
+LIVE_WINDOW_SECONDS = max(1.0, float(os.getenv("LIVE_WINDOW_SECONDS", "60")))
+LIVE_STATS_INTERVAL = max(0.1, float(os.getenv("LIVE_STATS_INTERVAL", "1.0")))
+
+# Reconnexion après une coupure du flux : tentatives (0 = arrêt à la première coupure)
+# et délai entre deux tentatives (secondes) ; délai max d'ouverture et de lecture
+LIVE_RECONNECT_ATTEMPTS = max(0, int(os.getenv("LIVE_RECONNECT_ATTEMPTS", "5")))
+LIVE_RECONNECT_DELAY = max(0.0, float(os.getenv("LIVE_RECONNECT_DELAY", "2.0")))
+LIVE_READ_TIMEOUT = max(1.0, float(os.getenv("LIVE_READ_TIMEOUT", "10")))
+
+# Transport RTSP demandé à ffmpeg (tcp évite les pertes de paquets UDP)
+LIVE_RTSP_TRANSPORT = os.getenv("LIVE_RTSP_TRANSPORT", "tcp").lower()
+
+# Flux analysés simultanément : chacun occupe un worker pendant toute sa durée,
+# un worker reste donc libre pour les vidéos par défaut (avec un seul worker, les
+# flux sont refusés sauf LIVE_MAX_STREAMS explicite ; 0 = flux refusés)
+LIVE_MAX_STREAMS = max(0, int(os.getenv("LIVE_MAX_STREAMS", str(IA_WORKERS - 1))))
+
+# ========== Ordonnanceur multi-vidéos (lots partagés) ==========
+
+# Détections menées de front par un worker avec un seul modèle : les frames de ces
+# vidéos sont regroupés dans des lots d'inférence communs, chaque vidéo gardant son
+# propre tracker (1 = une vidéo à la fois par worker)
+SCHEDULER_MAX_VIDEOS = max(1, int(os.getenv("SCHEDULER_MAX_VIDEOS", "1")))
+
+# Taille d'un lot partagé (frames, toutes vidéos confondues), répartie équitablement
+SCHEDULER_BATCH_SIZE = max(1, int(os.getenv("SCHEDULER_BATCH_SIZE", "8")))
@@ -0,0 +1,281 @@
+"""
+Décodage des vidéos VisionTrack
+Un thread lecteur décode les frames d'avance dans un anneau borné de tampons
+préalloués pendant que le worker détecte, suit et annote les précédents : le
+décodage et le calcul se recouvrent. Le décodage peut être confié à ffmpeg
+(processus dédié, décodage multi-thread) et la taille des frames réduite dès
+le décodage en mode détection seule.
+"""
+
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import DECODE_BACKEND, DECODE_PREFETCH_FRAMES, DECODE_THREADS
+from errors import DetectionError
+
+# Décide pour un numéro de frame (appelé une seule fois, dans l'ordre) :
+# (frame échantillonné, image nécessaire) ; sans image, le frame est seulement sauté
+FrameClassifier = Callable[[int], Tuple[bool, bool]]
+
+# Frame lu : (numéro, image ou None, échantillonné)
+FrameItem = Tuple[int, Optional[np.ndarray], bool]
+
+
+class OpenCVDecoder:
+    """Décodage OpenCV, éventuellement redimensionné (INTER_AREA) dans le tampon de sortie"""
+
+    def __init__(self, video_path: str, start_frame: int, size: Optional[Tuple[int, int]]):
+        self.size = size
+        self.cap = cv2.VideoCapture(video_path)
+        if start_frame > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if self.size is None:
+            return self.cap.read(out)
+        ok, frame = self.cap.read()
+        if not ok:
+            return False, None
+        return True, cv2.resize(frame, self.size, dst=out, interpolation=cv2.INTER_AREA)
+
+    def grab(self) -> bool:
+        return self.cap.grab()
+
+    def release(self) -> None:
+        self.cap.release()
+
+
+class FfmpegDecoder:
+    """
+    Décodage par un processus ffmpeg (threads de décodage ffmpeg, mise à l'échelle
+    au décodage), frames BGR bruts lus sur sa sortie standard
+
+    Le positionnement sur start_frame passe par le temps (-ss, précis au frame
+    pour une vidéo à cadence fixe). ffmpeg décode tous les frames : grab() lit
+    le frame dans un tampon de travail.
+    """
+
+    def __init__(self, video_path: str, start_frame: int, fps: float, width: int, height: int,
+                 size: Optional[Tuple[int, int]], threads: int = DECODE_THREADS):
+        self.width, self.height = size or (width, height)
+        self.frame_bytes = self.width * self.height * 3
+        self._scratch = np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+        command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-threads", str(threads)]
+        if start_frame > 0:
+            # Un demi-frame avant : le premier frame gardé est bien start_frame
+            command += ["-ss", f"{(start_frame - 0.5) / (fps or 30):.6f}"]
+        command += ["-i", video_path, "-map", "0:v:0", "-an", "-fps_mode", "passthrough"]
+        if size is not None:
+            command += ["-vf", f"scale={self.width}:{self.height}:flags=area"]
+        command += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+        self.process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, bufsize=self.frame_bytes)
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        if out is None:
+            out = np.empty((self.height, self.width, 3), dtype=np.uint8)
+        view = memoryview(out).cast("B")
+        received = 0
+        while received < self.frame_bytes:
+            count = self.process.stdout.readinto(view[received:])
+            if not count:
+                return False, None
+            received += count
+        return True, out
+
+    def grab(self) -> bool:
+        return self.read(self._scratch)[0]
+
+    def release(self) -> None:
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.stdout.close()
+        self.process.wait()
+
+
+def open_decoder(video_path: str, start_frame: int, fps: float, width: int, height: int,
+                 size: Optional[Tuple[int, int]] = None, backend: str = DECODE_BACKEND):
+    """Décodeur DECODE_BACKEND (OpenCV si ffmpeg est absent)"""
+    if backend == "ffmpeg":
+        if shutil.which("ffmpeg"):
+            return FfmpegDecoder(video_path, start_frame, fps, width, height, size)
+        print("ATTENTION : ffmpeg est introuvable, décodage par OpenCV")
+    return OpenCVDecoder(video_path, start_frame, size)
+
+
+class FrameReader:
+    """
+    Lecture synchrone (DECODE_PREFETCH_FRAMES=0) : chaque frame est décodé à la
+    demande, dans la boucle de détection
+    """
+
+    def __init__(self, decoder, start_frame: int, end_frame: Optional[int], classify: FrameClassifier):
+        self.decoder = decoder
+        self.classify = classify
+        self.end_frame = end_frame
+        self.next_number = start_frame
+        # Secondes passées à décoder, et à attendre le décodeur (égales ici)
+        self.decode_seconds = 0.0
+        self.wait_seconds = 0.0
+
+    def next(self) -> Optional[FrameItem]:
+        """Frame suivant, ou None à la fin de la vidéo (ou du segment)"""
+        number = self.next_number
+        if self.end_frame is not None and number >= self.end_frame:
+            return None
+        started = time.perf_counter()
+        sampled, needs_image = self.classify(number)
+        if needs_image:
+            ok, image = self.decoder.read()
+        else:
+            ok, image = self.decoder.grab(), None
+        elapsed = time.perf_counter() - started
+        self.decode_seconds += elapsed
+        self.wait_seconds += elapsed
+        if not ok:
+            return None
+        self.next_number += 1
+        return number, image, sampled
+
+    def release(self, image: Optional[np.ndarray]) -> None:
+        """Image plus utilisée par l'appelant (sans effet sans anneau de tampons)"""
+
+    def close(self) -> None:
+        self.decoder.release()
+
+
+class FramePrefetcher:
+    """
+    Décodage anticipé par un thread lecteur dans un anneau de tampons préalloués
+
+    `classify` est appelé depuis le thread lecteur, en avance sur l'appelant : il
+    ne doit pas dépendre d'un état que l'appelant modifie en cours de lecture.
+
+    Le lecteur remplit les tampons libres dans l'ordre des frames ; l'appelant
+    rend chaque tampon (release) une fois le frame annoté et transmis à
+    l'encodeur (qui copie l'image). L'anneau compte `prefetch` frames d'avance
+    en plus de ceux que l'appelant retient (lot en cours et frames sautés à
+    annoter) ; si l'appelant attend un frame alors que tous les tampons sont
+    pris, un tampon est ajouté plutôt que de bloquer.
+    """
+
+    def __init__(self, decoder, start_frame: int, end_frame: Optional[int], classify: FrameClassifier,
+                 frame_shape: Tuple[int, int, int], slots: int, prefetch: int = DECODE_PREFETCH_FRAMES):
+        self.decoder = decoder
+        self.classify = classify
+        self.end_frame = end_frame
+        self.frame_shape = frame_shape
+        self.slots = max(1, slots + prefetch)
+        self.decode_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.error: Optional[BaseException] = None
+
+        self._free: queue.Queue = queue.Queue()
+        for _ in range(self.slots):
+            self._free.put(np.empty(frame_shape, dtype=np.uint8))
+        self._ready: queue.Queue = queue.Queue()
+        self._starved = threading.Event()
+        self._stop = threading.Event()
+        self._finished = False
+
+        self._thread = threading.Thread(target=self._read_frames, args=(start_frame,),
+                                        name="frame-reader", daemon=True)
+        self._thread.start()
+
+    def next(self) -> Optional[FrameItem]:
+        """Frame suivant, ou None à la fin de la vidéo (ou du segment)"""
+        if self._finished:
+            return None
+        try:
+            item = self._ready.get_nowait()
+        except queue.Empty:
+            started = time.perf_counter()
+            self._starved.set()
+            item = self._ready.get()
+            self._starved.clear()
+            self.wait_seconds += time.perf_counter() - started
+
+        if item is None:
+            self._finished = True
+            if self.error is not None:
+                raise DetectionError(500, f"Échec du décodage de la vidéo : {self.error}")
+        return item
+
+    def release(self, image: Optional[np.ndarray]) -> None:
+        """Rend le tampon d'un frame à l'anneau"""
+        if image is not None:
+            self._free.put(image)
+
+    def close(self) -> None:
+        """Arrête le lecteur (même en cours de vidéo) et libère le décodeur"""
+        self._stop.set()
+        self._thread.join()
+        self.decoder.release()
+
+    def _take_buffer(self) -> Optional[np.ndarray]:
+        """Tampon libre ; un nouveau tampon si l'appelant attend alors que tous sont pris"""
+        while not self._stop.is_set():
+            try:
+                return self._free.get(timeout=0.05)
+            except queue.Empty:
+                if self._starved.is_set() and self._ready.empty():
+                    self.slots += 1
+                    return np.empty(self.frame_shape, dtype=np.uint8)
+        return None
+
+    def _read_frames(self, number: int) -> None:
+        """Thread lecteur : décode jusqu'à la fin de la vidéo (ou du segment) ou l'arrêt"""
+        try:
+            while not self._stop.is_set() and (self.end_frame is None or number < self.end_frame):
+                sampled, needs_image = self.classify(number)
+                image = None
+                if needs_image:
+                    image = self._take_buffer()
+                    if image is None:
+                        break
+                started = time.perf_counter()
+                if image is not None:
+                    ok, frame = self.decoder.read(image)
+                    if ok and frame is not image:
+                        # Décodeur qui n'écrit pas dans le tampon fourni (format inattendu)
+                        np.copyto(image, frame)
+                else:
+                    ok = self.decoder.grab()
+                self.decode_seconds += time.perf_counter() - started
+                if not ok:
+                    self.release(image)
+                    break
+                self._ready.put((number, image, sampled))
+                number += 1
+        except Exception as exc:
+            self.error = exc
+        finally:
+            self._ready.put(None)
+
+
+def open_frame_reader(video_path: str, start_frame: int, end_frame: Optional[int], fps: float,
+                      width: int, height: int, classify: FrameClassifier, held_frames: int,
+                      size: Optional[Tuple[int, int]] = None, prefetch: int = DECODE_PREFETCH_FRAMES,
+                      backend: str = DECODE_BACKEND):
+    """
+    Lecteur de frames de la vidéo : anticipé (FramePrefetcher) si prefetch > 0, synchrone sinon
+
+    Args:
+        classify: Appelé une fois par frame, dans l'ordre : (échantillonné, image nécessaire)
+        held_frames: Frames que l'appelant retient au plus en même temps (taille initiale de l'anneau)
+        size: (largeur, hauteur) des frames décodés, None pour la résolution source
+    """
+    decoder = open_decoder(video_path, start_frame, fps, width, height, size, backend)
+    if prefetch <= 0:
+        return FrameReader(decoder, start_frame, end_frame, classify)
+    out_width, out_height = size or (width, height)
+    return FramePrefetcher(decoder, start_frame, end_frame, classify, (out_height, out_width, 3),
+                           held_frames, prefetch)
@@ -0,0 +1,802 @@
+"""
+Pipeline de détection VisionTrack
+Exécuté dans les processus workers : lecture vidéo, détection YOLO par lots,
+tracking ByteTrack, annotation (rendering.py) et encodage de la vidéo de sortie
+"""
+
+import math
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from backends import load_model
+from config import (
+    ADAPTIVE_IMGSZ_ENABLED,
+    ADAPTIVE_STRIDE_ENABLED,
+    CONFIDENCE_THRESHOLD,
+    DECODE_MAX_WIDTH,
+    DECODE_PREFETCH_FRAMES,
+    GENERATE_ANNOTATED_VIDEO_BY_DEFAULT,
+    IA_WORKER_THREADS,
+    INFERENCE_BACKEND,
+    INFERENCE_BATCH_SIZE,
+    INFERENCE_IMGSZ,
+    INFERENCE_INT8,
+    MOTION_GATE_ENABLED,
+    MOTION_MIN_AREA,
+    MOTION_PIXEL_THRESHOLD,
+    WARMUP_ITERATIONS,
+    YOLO_MODEL,
+    ZONE_CROP_ENABLED,
+    ZONE_CROP_MARGIN,
+)
+from decoding import open_frame_reader
+from errors import DetectionError
+from motion import MotionGate
+from rendering import ZoneRenderer, open_video_writer, package_hls
+from resolution import InputSizeSelector
+from sampling import FrameSampler, interpolate_tracks, resolve_stride
+from schemas import PolygonZone, Zone
+from tracking import (
+    NO_TRACK_ID,
+    create_tracker,
+    empty_detections,
+    set_tracker_frame_rate,
+    stride_frame_rate,
+    update_tracker,
+)
+
+# Callback de progression : (frame_number, total_frames)
+ProgressCallback = Callable[[int, int], None]
+
+# Annulation demandée par le processus principal, vérifiée entre deux lots
+CancelCallback = Callable[[], bool]
+
+# Étapes chronométrées de chaque job (secondes) : décodage (thread lecteur) et attente
+# du décodeur par la boucle de détection, inférence, suivi, annotation, encodage
+TIMING_STAGES = ("decode", "decode_wait", "inference", "tracking", "annotation", "encode")
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str):
+    """Ajoute la durée du bloc à timings[stage]"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] += time.perf_counter() - started
+
+
+# Modèle chargé une seule fois par processus worker
+model = None
+
+def get_model():
+    """
+    Charge le modèle YOLO du processus courant (backend INFERENCE_BACKEND)
+    et le met en cache pour les appels suivants
+    """
+    global model
+    if model is None:
+        print(f"Chargement du modèle YOLO: {YOLO_MODEL} (backend {INFERENCE_BACKEND}"
+              f"{', INT8' if INFERENCE_INT8 else ''})")
+        model = load_model(threads=IA_WORKER_THREADS)
+        print(f"Modèle {YOLO_MODEL} chargé avec succès!")
+    return model
+
+
+def warm_up(iterations: int = WARMUP_ITERATIONS) -> Dict[str, float]:
+    """
+    Préchauffe le modèle et le tracker du processus courant avant le premier job
+
+    Les premiers appels paient la création du predictor Ultralytics, l'allocation
+    des tampons du moteur et le chargement de la configuration du tracker. Des frames
+    factices au format 16:9 des caméras, à la taille INFERENCE_IMGSZ et par lots de
+    INFERENCE_BATCH_SIZE, passent par le même chemin que les vraies détections.
+
+    Returns:
+        Durée (secondes) de chaque étape : "model_load", "tracker_init", "warmup"
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    yolo_model = get_model()
+    timings["model_load"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    create_tracker()
+    timings["tracker_init"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if iterations > 0:
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 256, (INFERENCE_IMGSZ * 9 // 16, INFERENCE_IMGSZ, 3), dtype=np.uint8)
+        for _ in range(iterations):
+            predict_batch(yolo_model, [frame] * INFERENCE_BATCH_SIZE)
+    timings["warmup"] = time.perf_counter() - started
+
+    print(f"✓ Modèle préchauffé ({iterations} inférence(s) de {INFERENCE_BATCH_SIZE} frame(s)) : "
+          + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+    return timings
+
+
+def run_detection(video_path: str, zone: Optional[Dict] = None,
+                  zones: Optional[List[Dict]] = None,
+                  batch_size: Optional[int] = None,
+                  crop_to_zone: Optional[bool] = None,
+                  zone_margin: Optional[int] = None,
+                  render_video: Optional[bool] = None,
+                  frame_stride: Optional[int] = None,
+                  analysis_fps: Optional[float] = None,
+                  adaptive_stride: Optional[bool] = None,
+                  motion_gate: Optional[bool] = None,
+                  adaptive_imgsz: Optional[bool] = None,
+                  imgsz: Optional[int] = None,
+                  start_frame: int = 0,
+                  end_frame: Optional[int] = None,
+                  progress: Optional[ProgressCallback] = None,
+                  cancelled: Optional[CancelCallback] = None) -> Dict:
+    """
+    Détecte les personnes dans une vidéo (exécution synchrone dans un worker)
+
+    Args:
+        video_path: Chemin de la vidéo sur le volume partagé
+        zone: Zone d'analyse (dict x1, y1, x2, y2) ou None pour la vidéo entière
+        zones: Zones polygonales nommées (dict name, points), dessinées sur la vidéo
+            annotée ; l'inférence recadrée couvre leur rectangle englobant
+        batch_size: Nombre de frames par lot d'inférence (INFERENCE_BATCH_SIZE par défaut)
+        crop_to_zone: Détecter uniquement dans la zone + marge (ZONE_CROP_ENABLED par défaut)
+        zone_margin: Marge en pixels autour de la zone (ZONE_CROP_MARGIN par défaut)
+        render_video: Générer la vidéo annotée (GENERATE_ANNOTATED_VIDEO_BY_DEFAULT par défaut) ;
+            si False, ni dessin ni encodage, la vidéo pourra être rendue plus tard (run_render)
+        frame_stride: Détecter un frame sur frame_stride (FRAME_STRIDE par défaut)
+        analysis_fps: Cadence d'analyse visée, prioritaire sur frame_stride (ANALYSIS_FPS par défaut)
+        adaptive_stride: Pas adaptatif selon l'activité de la scène (ADAPTIVE_STRIDE_ENABLED par défaut)
+        motion_gate: Ne pas détecter les frames sans mouvement (MOTION_GATE_ENABLED par défaut)
+        adaptive_imgsz: Taille d'entrée réduite selon la taille des personnes (ADAPTIVE_IMGSZ_ENABLED par défaut)
+        imgsz: Taille d'entrée de base du modèle (INFERENCE_IMGSZ par défaut)
+        start_frame: Premier frame traité (segment d'une détection découpée, voir chunking.py)
+        end_frame: Frame de fin exclu (fin de la vidéo par défaut)
+        progress: Callback appelé régulièrement avec (frames traités, frames à traiter)
+        cancelled: Renvoie True si le job est annulé (arrêt entre deux lots)
+
+    Returns:
+        Dict compatible avec DetectionResponse (numéros de frame absolus). Les
+        détections couvrent tout le frame (ou toute la région inférée) : la zone ne
+        sert qu'au dessin de la vidéo annotée, le backend filtre par zone lui-même
+        et peut ainsi changer de zone sans nouvelle inférence.
+
+    Raises:
+        DetectionError: si la vidéo est introuvable ou illisible, ou si le job est annulé
+    """
+    session = DetectionSession(
+        video_path, zone=zone, zones=zones, batch_size=batch_size, crop_to_zone=crop_to_zone,
+        zone_margin=zone_margin, render_video=render_video, frame_stride=frame_stride,
+        analysis_fps=analysis_fps, adaptive_stride=adaptive_stride, motion_gate=motion_gate,
+        adaptive_imgsz=adaptive_imgsz, imgsz=imgsz, start_frame=start_frame, end_frame=end_frame, progress=progress
+    )
+    # Modèle déjà chargé au démarrage du worker
+    yolo_model = get_model()
+
+    try:
+        while not session.done:
+            if cancelled is not None and cancelled():
+                raise DetectionError(409, "Traitement annulé")
+            inputs = session.read_batch(session.batch_size)
+            with timed(session.timings, "inference"):
+                predictions = predict_batch(yolo_model, inputs, session.imgsz) if inputs else []
+            session.complete_batch(predictions)
+    finally:
+        session.close()
+
+    return session.finish()
+
+
+class DetectionSession:
+    """
+    Détection en cours sur une vidéo : lecture, échantillonnage, tracker et vidéo annotée
+
+    Le modèle n'est pas appelé ici : read_batch renvoie les frames à détecter,
+    complete_batch reçoit leurs détections. run_detection enchaîne les deux pour
+    une vidéo ; scheduler.py regroupe les frames de plusieurs sessions dans des
+    lots d'inférence partagés, chaque session gardant son propre tracker.
+    """
+
+    def __init__(self, video_path: str, zone: Optional[Dict] = None,
+                 zones: Optional[List[Dict]] = None,
+                 batch_size: Optional[int] = None,
+                 crop_to_zone: Optional[bool] = None,
+                 zone_margin: Optional[int] = None,
+                 render_video: Optional[bool] = None,
+                 frame_stride: Optional[int] = None,
+                 analysis_fps: Optional[float] = None,
+                 adaptive_stride: Optional[bool] = None,
+                 motion_gate: Optional[bool] = None,
+                 adaptive_imgsz: Optional[bool] = None,
+                 imgsz: Optional[int] = None,
+                 start_frame: int = 0,
+                 end_frame: Optional[int] = None,
+                 progress: Optional[ProgressCallback] = None):
+        """Mêmes paramètres que run_detection (DetectionError si la vidéo est illisible)"""
+        self.started_at = time.perf_counter()
+        self.timings = dict.fromkeys(TIMING_STAGES, 0.0)
+        print("\n" + "="*80)
+        print("DÉBUT DE L'ANALYSE VIDÉO")
+        print("="*80)
+
+        zone = Zone(**zone) if zone else None
+        polygons = [PolygonZone(**polygon) for polygon in zones or []]
+
+        print(f"Chemin vidéo reçu : {video_path}")
+        if zone:
+            print(f"Zone d'analyse : x1={zone.x1}, y1={zone.y1}, x2={zone.x2}, y2={zone.y2}")
+        else:
+            print("Zone d'analyse : VIDÉO ENTIÈRE (aucune zone spécifiée)")
+        if polygons:
+            print(f"Zones polygonales : {', '.join(polygon.name for polygon in polygons)}")
+
+        total_frames, fps, width, height = probe_video(video_path)
+        self.fps, self.width, self.height = fps, width, height
+        self.end_frame = end_frame
+        # Sans end_frame, lecture jusqu'à la fin du flux (CAP_PROP_FRAME_COUNT n'est qu'une estimation)
+        self.segment_frames = (total_frames if end_frame is None else min(end_frame, total_frames)) - start_frame
+        if start_frame > 0 or end_frame is not None:
+            print(f"✓ Segment traité : frames {start_frame} à {start_frame + self.segment_frames - 1}")
+
+        # Région passée au modèle : rectangle englobant la zone et les polygones + marge si
+        # demandé (calculée avant le remplacement par la vidéo entière, un recadrage sans
+        # zone n'a pas de sens)
+        crop_to_zone = ZONE_CROP_ENABLED if crop_to_zone is None else crop_to_zone
+        self.region = None
+        bounds = zone_bounds(zone, polygons)
+        if crop_to_zone and bounds is not None:
+            margin = ZONE_CROP_MARGIN if zone_margin is None else zone_margin
+            self.region = crop_region(bounds, width, height, margin)
+            print(f"✓ Inférence restreinte à la zone : ({self.region.x1:.0f}, {self.region.y1:.0f}) -> "
+                  f"({self.region.x2:.0f}, {self.region.y2:.0f}), marge {margin} px")
+
+        # Si aucune zone n'est spécifiée, utiliser la vidéo entière
+        if zone is None:
+            zone = Zone(x1=0, y1=0, x2=width, y2=height)
+            print(f"✓ Zone définie sur vidéo entière : (0, 0) -> ({width}, {height})")
+
+        render_video = GENERATE_ANNOTATED_VIDEO_BY_DEFAULT if render_video is None else render_video
+        self.writer = None
+        self.renderer = None
+        if render_video:
+            self.writer = open_annotated_writer(video_path, fps, width, height)
+            # Calque de zone préparé une seule fois pour toute la vidéo
+            self.renderer = ZoneRenderer(width, height, zone, polygons=polygons)
+        else:
+            print("Mode détection seule : pas de vidéo annotée (rendu possible plus tard via /render)")
+
+        # Décodage réduit (détection seule) : frames décodés à DECODE_MAX_WIDTH de large, sans
+        # descendre sous la taille d'entrée du modèle ; coordonnées ramenées à la source ensuite
+        base_imgsz = imgsz or INFERENCE_IMGSZ
+        decode_size = None
+        self.decode_scale = (1.0, 1.0)
+        scale = max(DECODE_MAX_WIDTH / max(1, width), base_imgsz / max(1, width, height))
+        if self.writer is None and DECODE_MAX_WIDTH > 0 and scale < 1.0:
+            decode_size = (max(2, round(width * scale / 2) * 2), max(2, round(height * scale / 2) * 2))
+            self.decode_scale = (decode_size[0] / width, decode_size[1] / height)
+            print(f"✓ Décodage réduit : {decode_size[0]}x{decode_size[1]} (source {width}x{height})")
+        # Région inférée dans le repère des frames décodés
+        self.decode_region = scale_zone(self.region, *self.decode_scale) if self.region is not None else None
+
+        # Échantillonnage : seul un frame sur `stride` est passé au modèle
+        self.stride = resolve_stride(fps, frame_stride, analysis_fps)
+        adaptive_stride = ADAPTIVE_STRIDE_ENABLED if adaptive_stride is None else adaptive_stride
+        self.sampler = FrameSampler(start_frame, self.stride, adaptive_stride)
+        if self.stride > 1 or adaptive_stride:
+            print(f"✓ Échantillonnage : 1 frame sur {self.stride}"
+                  + (f" (adaptatif jusqu'à {self.sampler.max_stride})" if adaptive_stride else "")
+                  + ", frames intermédiaires interpolés")
+
+        # Filtre de mouvement : sur la région inférée (frame entier sans recadrage), les
+        # détections restant valables pour toute autre zone choisie après coup
+        motion_gate_enabled = MOTION_GATE_ENABLED if motion_gate is None else motion_gate
+        self.motion_gate = None
+        if motion_gate_enabled:
+            self.motion_gate = MotionGate(self.decode_region)
+            print(f"✓ Filtre de mouvement actif (seuil {MOTION_PIXEL_THRESHOLD}, "
+                  f"surface min {MOTION_MIN_AREA:.2%})")
+
+        # Tracker ByteTrack propre à ce job : les track_ids repartent de 1
+        # TRACKER_CONFIG: fichier de configuration ByteTrack (défini dans .env)
+        # Avec un pas > 1, le tracker est réglé sur la cadence réellement analysée pour
+        # conserver la même durée de mémoire des tracks perdus (réajustée si le pas adaptatif change)
+        self.tracker_stride = self.stride
+        self.tracker = create_tracker(frame_rate=stride_frame_rate(self.stride))
+
+        self.batch_size = max(1, batch_size or INFERENCE_BATCH_SIZE)
+        print(f"Inférence par lots de {self.batch_size} frame(s)")
+
+        # Taille d'entrée : on conserve la densité de pixels du frame entier pour que
+        # le coût de l'inférence diminue avec la surface de la région recadrée
+        self.imgsz = base_imgsz
+        if self.region is not None:
+            self.imgsz = region_imgsz(self.region, width, height, base_imgsz)
+            print(f"  - Taille d'entrée du modèle : {self.imgsz} (frame entier : {base_imgsz})")
+
+        # Taille d'entrée adaptative : réduite d'après la hauteur des personnes mesurée
+        # à la taille ci-dessus pendant les premières secondes (puis régulièrement)
+        adaptive_imgsz = ADAPTIVE_IMGSZ_ENABLED if adaptive_imgsz is None else adaptive_imgsz
+        self.resizer = None
+        if adaptive_imgsz:
+            longest_side = (max(self.region.x2 - self.region.x1, self.region.y2 - self.region.y1)
+                            if self.region is not None else max(width, height))
+            self.resizer = InputSizeSelector(self.imgsz, longest_side, fps, start_frame)
+            print(f"✓ Taille d'entrée adaptative (mesure sur {self.resizer.probe_frames} frames, "
+                  f"entre {self.resizer.min_imgsz} et {self.imgsz})")
+
+        self.progress = progress
+        # Liste pour stocker toutes les détections
+        self.all_detections = []
+        self.processed_frames = 0
+        self.inferred_frames = 0
+        # Délai (secondes) entre le décodage de chaque frame détecté et son passage au tracker
+        self.latencies = []
+
+        # Les frames échantillonnés sont décodés (d'avance, voir decoding.py) puis détectés
+        # par lots ; les résultats sont ensuite transmis au tracker dans l'ordre, frame par
+        # frame. Chaque entrée du lot garde les frames sautés qui la précèdent, interpolés
+        # après sa détection. Sans vidéo annotée, les frames sautés ne sont pas décodés (grab).
+        # Le pas adaptatif change d'après les tracks : le choix des frames doit rester dans
+        # ce thread, au fil du tracking, donc sans décodage anticipé
+        prefetch = DECODE_PREFETCH_FRAMES
+        if adaptive_stride and prefetch > 0:
+            prefetch = 0
+            print("INFO : Pas adaptatif : décodage anticipé désactivé (frames choisis au fil du tracking)")
+        held_frames = self.batch_size * (self.sampler.max_stride if self.writer is not None else 1) + 1
+        self.frames = open_frame_reader(video_path, start_frame, end_frame, fps, width, height,
+                                        self._classify, held_frames, decode_size, prefetch)
+        self.batch = []      # (numéro, image, frames sautés précédents, mouvement détecté, instant de lecture)
+        self.skipped = []    # (numéro, image ou None) depuis le dernier frame échantillonné
+        self.inputs = []     # Entrées du modèle du lot en cours (frames en mouvement)
+        self.previous_number, self.previous_tracks = start_frame, empty_detections()
+        self.frame_number = start_frame
+        # Fin de la vidéo (ou du segment) atteinte / tous les frames émis
+        self.exhausted = False
+        self.done = False
+
+    def read_batch(self, size: int) -> List[np.ndarray]:
+        """
+        Décode les frames jusqu'à réunir `size` frames échantillonnés (ou la fin de la vidéo)
+
+        Returns:
+            Entrées du modèle (frames en mouvement, recadrés sur la région), à détecter
+            puis à transmettre à complete_batch dans le même ordre
+        """
+        while len(self.batch) < size and not self.exhausted:
+            item = self.frames.next()
+            if item is None:
+                self.exhausted = True
+                break
+            number, frame, sampled = item
+            if sampled:
+                infer = self.motion_gate is None or self.motion_gate.needs_inference(frame)
+                self.batch.append((number, frame, self.skipped, infer, time.perf_counter()))
+                self.skipped = []
+            else:
+                self.skipped.append((number, frame))
+            self.frame_number = number + 1
+
+        # Seuls les frames en mouvement sont passés au modèle
+        self.inputs = [image if self.decode_region is None else crop_frame(image, self.decode_region)
+                       for _, image, _, infer, _ in self.batch if infer]
+        return self.inputs
+
+    def _classify(self, number: int) -> Tuple[bool, bool]:
+        """
+        (frame échantillonné, image à décoder) ; appelé par le lecteur, une fois par frame
+
+        Avec le décodage anticipé, appelé depuis le thread lecteur : le pas du sampler
+        y est alors fixe (décodage anticipé désactivé en pas adaptatif).
+        """
+        sampled = self.sampler.is_sampled(number)
+        return sampled, sampled or self.writer is not None
+
+    def complete_batch(self, predictions: list) -> None:
+        """Transmet au tracker, frame par frame, les détections (Boxes) du lot lu par read_batch"""
+        predictions = iter(zip(self.inputs, predictions))
+        self.inferred_frames += len(self.inputs)
+        completed_at = time.perf_counter()
+        # Le suivi exclut l'annotation et l'encodage des frames émis pendant le lot
+        output_seconds = self.timings["annotation"] + self.timings["encode"]
+
+        for number, image, gap, infer, read_at in self.batch:
+            if infer:
+                model_input, boxes = next(predictions)
+                tracks = update_tracker(self.tracker, boxes, model_input)
+                if self.decode_region is not None:
+                    region_to_frame(tracks, self.decode_region)
+                if self.decode_scale != (1.0, 1.0):
+                    # Frames décodés réduits : coordonnées ramenées à la résolution source
+                    tracks[:, [0, 2]] /= self.decode_scale[0]
+                    tracks[:, [1, 3]] /= self.decode_scale[1]
+                if self.resizer is not None:
+                    self.resizer.update(tracks, self.imgsz)
+                self.latencies.append(completed_at - read_at)
+            else:
+                # Frame statique : détections précédentes reconduites
+                tracks = self.previous_tracks
+            self.sampler.update(tracks)
+            if self.sampler.stride != self.tracker_stride:
+                self.tracker_stride = self.sampler.stride
+                set_tracker_frame_rate(self.tracker, stride_frame_rate(self.tracker_stride))
+
+            for skipped_number, skipped_image in gap:
+                ratio = (skipped_number - self.previous_number) / (number - self.previous_number)
+                self._emit_frame(skipped_number,
+                                 interpolate_tracks(self.previous_tracks, tracks, ratio) if infer else tracks,
+                                 skipped_image)
+            self._emit_frame(number, tracks, image)
+            self.previous_number, self.previous_tracks = number, tracks
+        self.batch = []
+        self.inputs = []
+        if self.resizer is not None:
+            # Taille du lot suivant (entre deux lots : un lot partagé a une seule taille)
+            self.imgsz = self.resizer.next_imgsz(self.frame_number)
+
+        if self.exhausted:
+            # Frames sautés après le dernier frame détecté : boxes de ce dernier frame
+            for skipped_number, skipped_image in self.skipped:
+                self._emit_frame(skipped_number, self.previous_tracks, skipped_image)
+            self.skipped = []
+            self.done = True
+
+        self.timings["tracking"] += (time.perf_counter() - completed_at
+                                     - (self.timings["annotation"] + self.timings["encode"] - output_seconds))
+
+    def _emit_frame(self, number: int, tracks: np.ndarray, image: Optional[np.ndarray]) -> None:
+        """Enregistre les personnes d'un frame (détecté ou interpolé) et annote celles de la zone"""
+        frame_boxes = filter_tracks(tracks)
+        if self.writer is not None:
+            with timed(self.timings, "annotation"):
+                annotated = self.renderer.render(image, self.renderer.select_boxes(frame_boxes))
+            with timed(self.timings, "encode"):
+                self.writer.write(annotated)
+        # Image copiée par l'encodeur : son tampon peut resservir au décodage
+        self.frames.release(image)
+
+        if frame_boxes:
+            self.all_detections.append({
+                "frame": number,
+                "boxes": frame_boxes
+            })
+
+        self.processed_frames += 1
+        if self.processed_frames % 30 == 0:
+            print(f"Progression : {self.processed_frames}/{self.segment_frames} frames analysés")
+            if self.progress:
+                self.progress(self.processed_frames, self.segment_frames)
+
+    def close(self) -> None:
+        """Libère la lecture et l'encodeur (appelé aussi en cas d'erreur)"""
+        if self.frames is None:
+            return
+        self.frames.close()
+        self.timings["decode"] = self.frames.decode_seconds
+        self.timings["decode_wait"] = self.frames.wait_seconds
+        self.frames = None
+        if self.writer is not None:
+            with timed(self.timings, "encode"):
+                self.writer.release()
+        print("✓ Ressources vidéo libérées")
+
+    def finish(self) -> Dict:
+        """
+        Finalise la vidéo annotée après close()
+
+        Returns:
+            Dict compatible avec DetectionResponse (numéros de frame absolus)
+        """
+        with timed(self.timings, "encode"):
+            annotated_video_path = self.writer.finalize() if self.writer is not None else None
+        hls_playlist_path = package_hls(annotated_video_path)
+        timings = {stage: round(seconds, 3) for stage, seconds in self.timings.items()}
+        timings["total"] = round(time.perf_counter() - self.started_at, 3)
+
+        if self.progress:
+            self.progress(self.processed_frames, self.segment_frames)
+
+        print("\n" + "-"*80)
+        print("RÉSUMÉ DE L'ANALYSE")
+        print("-"*80)
+        print(f"Frames analysés : {self.processed_frames}/{self.segment_frames}")
+        print(f"Frames passés au modèle : {self.inferred_frames}")
+        if self.motion_gate is not None:
+            print(f"Frames statiques non détectés : {self.motion_gate.skipped_frames}")
+        if self.resizer is not None:
+            print(f"Tailles d'entrée : {', '.join(str(change['imgsz']) for change in self.resizer.changes) or self.imgsz}")
+        print(f"Frames avec détections : {len(self.all_detections)}")
+        print("Temps par étape : " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+
+        # Calculer le nombre total de personnes détectées
+        total_detections = sum(len(det["boxes"]) for det in self.all_detections)
+        print(f"Total de détections : {total_detections}")
+
+        print("="*80)
+        print("FIN DE L'ANALYSE")
+        print("="*80 + "\n")
+
+        return {
+            "message": "Détection terminée avec succès",
+            "total_frames": self.processed_frames,
+            "fps": self.fps,
+            "width": self.width,
+            "height": self.height,
+            "detections": self.all_detections,
+            "annotated_video_path": str(annotated_video_path) if annotated_video_path else None,
+            "hls_playlist_path": str(hls_playlist_path) if hls_playlist_path else None,
+            "inference_region": self.region.model_dump() if self.region else None,
+            "inferred_frames": self.inferred_frames,
+            "frame_stride": self.stride,
+            "motion_skipped_frames": self.motion_gate.skipped_frames if self.motion_gate is not None else 0,
+            "imgsz": self.resizer.imgsz if self.resizer is not None else self.imgsz,
+            "imgsz_changes": self.resizer.changes if self.resizer is not None else None,
+            "timings": timings
+        }
+
+
+def run_render(video_path: str, detections: List[Dict], zone: Optional[Dict] = None,
+               zones: Optional[List[Dict]] = None, start_frame: int = 0, end_frame: Optional[int] = None, part: Optional[int] = None,
+               progress: Optional[ProgressCallback] = None,
+               cancelled: Optional[CancelCallback] = None) -> Dict:
+    """
+    Génère la vidéo annotée à partir de détections déjà calculées (sans inférence)
+
+    Args:
+        video_path: Chemin de la vidéo source sur le volume partagé
+        detections: Détections par frame (format FrameDetection)
+        zone: Zone d'analyse utilisée lors de la détection (None pour la vidéo entière)
+        zones: Zones polygonales nommées utilisées lors de la détection
+        start_frame: Premier frame rendu (segment d'une détection découpée)
+        end_frame: Frame de fin exclu (fin de la vidéo par défaut)
+        part: Numéro du segment : écrit {id}_annotated_part{part}.mp4 au lieu de la vidéo finale
+        progress: Callback appelé régulièrement avec (frames rendus, frames à rendre)
+        cancelled: Renvoie True si le job est annulé (vérifié tous les 30 frames)
+
+    Returns:
+        Dict compatible avec RenderResponse
+
+    Raises:
+        DetectionError: si la vidéo est introuvable ou illisible, ou si le job est annulé
+    """
+    print("\n" + "="*80)
+    print("DÉBUT DU RENDU DE LA VIDÉO ANNOTÉE")
+    print("="*80)
+
+    total_frames, fps, width, height = probe_video(video_path)
+    segment_frames = (total_frames if end_frame is None else min(end_frame, total_frames)) - start_frame
+    zone = Zone(**zone) if zone else Zone(x1=0, y1=0, x2=width, y2=height)
+
+    writer = open_annotated_writer(video_path, fps, width, height, part)
+    renderer = ZoneRenderer(width, height, zone, polygons=[PolygonZone(**polygon) for polygon in zones or []])
+    # Seules les personnes de la zone sont dessinées (détections plein cadre acceptées)
+    boxes_by_frame = {detection["frame"]: renderer.select_boxes(detection["boxes"]) for detection in detections}
+    print(f"✓ {len(boxes_by_frame)} frames avec détections à dessiner")
+
+    started_at = time.perf_counter()
+    timings = dict.fromkeys(TIMING_STAGES, 0.0)
+    frame_number = start_frame
+    # Tous les frames sont décodés (d'avance) et dessinés
+    frames = open_frame_reader(video_path, start_frame, end_frame, fps, width, height,
+                               lambda number: (True, True), held_frames=1)
+
+    try:
+        while True:
+            item = frames.next()
+            if item is None:
+                break
+            number, frame, _ = item
+
+            with timed(timings, "annotation"):
+                annotated = renderer.render(frame, boxes_by_frame.get(number, []))
+            with timed(timings, "encode"):
+                writer.write(annotated)
+            frames.release(frame)
+            frame_number = number + 1
+
+            if (frame_number - start_frame) % 30 == 0:
+                print(f"Progression : {frame_number - start_frame}/{segment_frames} frames rendus")
+                if progress:
+                    progress(frame_number - start_frame, segment_frames)
+                if cancelled is not None and cancelled():
+                    raise DetectionError(409, "Traitement annulé")
+    finally:
+        frames.close()
+        timings["decode"] = frames.decode_seconds
+        timings["decode_wait"] = frames.wait_seconds
+        with timed(timings, "encode"):
+            writer.release()
+        print("✓ Ressources vidéo libérées")
+
+    with timed(timings, "encode"):
+        annotated_video_path = writer.finalize()
+    if annotated_video_path is None:
+        raise DetectionError(500, "Échec de l'encodage de la vidéo annotée")
+    # Un segment de rendu découpé est assemblé puis découpé en HLS par chunking.py
+    hls_playlist_path = package_hls(annotated_video_path) if part is None else None
+
+    if progress:
+        progress(frame_number - start_frame, segment_frames)
+
+    timings = {stage: round(seconds, 3) for stage, seconds in timings.items()}
+    timings["total"] = round(time.perf_counter() - started_at, 3)
+    print("Temps par étape : " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items()))
+
+    print("="*80)
+    print("FIN DU RENDU")
+    print("="*80 + "\n")
+
+    return {
+        "message": "Vidéo annotée générée avec succès",
+        "total_frames": frame_number - start_frame,
+        "annotated_video_path": str(annotated_video_path),
+        "hls_playlist_path": str(hls_playlist_path) if hls_playlist_path else None,
+        "timings": timings
+    }
+
+
+# ========== Fonctions utilitaires ==========
+
+
+def probe_video(video_path: str) -> Tuple[int, float, int, int]:
+    """
+    Vérifie que la vidéo est lisible et renvoie (total_frames, fps, width, height)
+
+    Raises:
+        DetectionError: si la vidéo est introuvable ou illisible
+    """
+    # Vérifier que le fichier vidéo existe
+    if not Path(video_path).exists():
+        print(f"ERREUR : Vidéo non trouvée à {video_path}")
+        raise DetectionError(404, f"Vidéo non trouvée : {video_path}")
+
+    print(f"✓ Fichier vidéo trouvé : {Path(video_path).stat().st_size} bytes")
+
+    # Ouvrir la vidéo avec OpenCV
+    cap = cv2.VideoCapture(video_path)
+
+    if not cap.isOpened():
+        print("ERREUR : Impossible d'ouvrir la vidéo avec OpenCV")
+        raise DetectionError(400, "Impossible d'ouvrir la vidéo")
+
+    # Récupérer les informations de la vidéo
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+
+    print(f"✓ Vidéo ouverte avec succès")
+    print(f"  - Total frames : {total_frames}")
+    print(f"  - FPS : {fps}")
+    print(f"  - Résolution : {width}x{height}")
+
+    return total_frames, fps, width, height
+
+
+def open_annotated_writer(video_path: str, fps: float, width: int, height: int,
+                          part: Optional[int] = None):
+    """Crée l'encodeur de la vidéo annotée (DetectionError s'il ne peut pas démarrer)"""
+    writer = open_video_writer(video_path, fps, width, height, part)
+
+    if not writer.is_opened():
+        print("ERREUR : Impossible de créer le VideoWriter")
+        raise DetectionError(500, "Impossible de créer la vidéo annotée")
+
+    print(f"✓ VideoWriter créé avec succès")
+    return writer
+
+
+def predict_batch(yolo_model, frames: List[np.ndarray], imgsz: int = INFERENCE_IMGSZ) -> list:
+    """
+    Exécute la détection YOLO sur un lot de frames en un seul appel
+
+    Returns:
+        Liste des Boxes (numpy) de chaque frame, dans l'ordre du lot
+    """
+    results = yolo_model.predict(
+        source=frames,
+        conf=CONFIDENCE_THRESHOLD,
+        imgsz=imgsz,
+        verbose=False
+    )
+    return [result.boxes.cpu().numpy() for result in results]
+
+
+def zone_bounds(zone: Optional[Zone], polygons: List[PolygonZone]) -> Optional[Zone]:
+    """Rectangle englobant la zone et les zones polygonales (None sans aucune zone)"""
+    rectangles = [zone] if zone is not None else []
+    for polygon in polygons:
+        xs, ys = zip(*polygon.points)
+        rectangles.append(Zone(x1=min(xs), y1=min(ys), x2=max(xs), y2=max(ys)))
+    if not rectangles:
+        return None
+    return Zone(
+        x1=min(min(rectangle.x1, rectangle.x2) for rectangle in rectangles),
+        y1=min(min(rectangle.y1, rectangle.y2) for rectangle in rectangles),
+        x2=max(max(rectangle.x1, rectangle.x2) for rectangle in rectangles),
+        y2=max(max(rectangle.y1, rectangle.y2) for rectangle in rectangles),
+    )
+
+
+def crop_region(zone: Zone, width: int, height: int, margin: int) -> Zone:
+    """Zone agrandie de `margin` pixels, bornée au frame et arrondie au pixel"""
+    return Zone(
+        x1=max(0, int(min(zone.x1, zone.x2)) - margin),
+        y1=max(0, int(min(zone.y1, zone.y2)) - margin),
+        x2=min(width, int(math.ceil(max(zone.x1, zone.x2))) + margin),
+        y2=min(height, int(math.ceil(max(zone.y1, zone.y2))) + margin),
+    )
+
+
+def region_imgsz(region: Zone, width: int, height: int, base_imgsz: int = INFERENCE_IMGSZ) -> int:
+    """
+    Taille d'entrée du modèle pour une région recadrée
+
+    Même échelle que le frame entier redimensionné à base_imgsz, arrondie au
+    multiple de 32 supérieur (stride YOLO).
+    """
+    scale = base_imgsz / max(width, height)
+    longest_side = max(region.x2 - region.x1, region.y2 - region.y1) * scale
+    return max(32, int(math.ceil(longest_side / 32)) * 32)
+
+
+def scale_zone(zone: Zone, scale_x: float, scale_y: float) -> Zone:
+    """Zone dans le repère d'un frame redimensionné"""
+    return Zone(x1=zone.x1 * scale_x, y1=zone.y1 * scale_y, x2=zone.x2 * scale_x, y2=zone.y2 * scale_y)
+
+
+def crop_frame(frame: np.ndarray, region: Zone) -> np.ndarray:
+    """Extrait la région du frame (copie contiguë, attendue par le letterbox Ultralytics)"""
+    return np.ascontiguousarray(frame[int(region.y1):int(region.y2), int(region.x1):int(region.x2)])
+
+
+def region_to_frame(boxes: np.ndarray, region: Zone) -> np.ndarray:
+    """
+    Ramène en place des boxes (colonnes x1, y1, x2, y2) du repère de la région recadrée
+    à celui du frame entier ; même origine entière que crop_frame
+    """
+    boxes[:, [0, 2]] += int(region.x1)
+    boxes[:, [1, 3]] += int(region.y1)
+    return boxes
+
+
+def filter_tracks(tracks: np.ndarray) -> List[Dict]:
+    """
+    Sélectionne les personnes suffisamment confiantes, sur tout le frame
+
+    Args:
+        tracks: Détections suivies (N, 7) renvoyées par update_tracker
+
+    Returns:
+        Boxes au format DetectionBox (dict)
+    """
+    frame_boxes = []
+
+    for x1, y1, x2, y2, confidence, class_id, track_id in tracks.tolist():
+        if int(class_id) != 0:
+            continue
+
+        # Filtrer les détections de faible confiance
+        if confidence < CONFIDENCE_THRESHOLD:
+            continue
+
+        track_id = int(track_id) if track_id != NO_TRACK_ID else None
+
+        frame_boxes.append({
+            "x1": x1,
+            "y1": y1,
+            "x2": x2,
+            "y2": y2,
+            "confidence": confidence,
+            "track_id": track_id
+        })
+
+    return frame_boxes
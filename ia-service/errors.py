@@ -0,0 +1,13 @@
+"""
+Erreurs du service IA VisionTrack
+Module sans dépendance lourde : importable par le processus principal comme par les workers
+"""
+
+
+class DetectionError(Exception):
+    """Erreur métier de la détection, associée au code HTTP à renvoyer au client"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
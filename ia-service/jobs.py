@@ -0,0 +1,678 @@
+"""
+Sous-système de jobs du service IA VisionTrack
+Pool de processus workers (un modèle YOLO chargé par worker) alimenté par une
+file d'attente bornée, avec suivi de l'état et de la progression de chaque job
+"""
+
+import multiprocessing as mp
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from config import (
+    CHUNK_SEGMENTS,
+    IA_JOB_RETENTION,
+    IA_QUEUE_SIZE,
+    IA_WORKER_THREADS,
+    IA_WORKERS,
+    LIVE_MAX_STREAMS,
+    SCHEDULER_MAX_VIDEOS,
+)
+from errors import DetectionError
+
+# Statuts possibles d'un job
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Levée quand la file d'attente a atteint sa capacité maximale"""
+
+
+class ChildJobError(Exception):
+    """Échec d'une sous-tâche d'un job découpé (erreur au format JobError)"""
+
+    def __init__(self, error: Dict[str, Any]):
+        super().__init__(error.get("detail"))
+        self.error = error
+
+
+@dataclass
+class Job:
+    """État d'un job suivi par le processus principal"""
+    job_id: str
+    kind: str
+    payload: Dict[str, Any]
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    worker: Optional[int] = None
+    frame: int = 0
+    total_frames: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[Dict[str, Any]] = None
+    # Sous-tâche d'un job découpé : identifiant du job parent
+    parent_id: Optional[str] = None
+    # Job découpé : frames déjà traités par les sous-tâches des étapes terminées
+    frames_done: int = 0
+    # Flux en direct : dernières statistiques publiées et arrêt demandé
+    live: Optional[Dict[str, Any]] = None
+    stop_requested: bool = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Représentation compatible avec le modèle JobStatus"""
+        percent = (100.0 * self.frame / self.total_frames) if self.total_frames else 0.0
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "worker": self.worker,
+            "progress": {
+                "frame": self.frame,
+                "total_frames": self.total_frames,
+                "percent": round(min(percent, 100.0), 1),
+            },
+            "result": self.result,
+            "error": self.error,
+            "live": self.live,
+        }
+
+
+# ========== Code exécuté dans les processus workers ==========
+
+class _Cancellations:
+    """
+    Jobs annulés, reçus du processus principal sur la file d'annulation du worker
+
+    Chaque annulation vise un job précis : elle ne peut pas interrompre le job
+    suivant du worker, même reçue après la fin du job visé.
+    """
+
+    def __init__(self, cancel_queue):
+        self.cancel_queue = cancel_queue
+        self.job_ids = set()
+
+    def is_cancelled(self, job_id: str) -> bool:
+        while True:
+            try:
+                self.job_ids.add(self.cancel_queue.get_nowait())
+            except queue.Empty:
+                break
+        return job_id in self.job_ids
+
+    def forget(self, job_id: str) -> None:
+        """Job terminé : son annulation n'a plus d'objet"""
+        self.job_ids.discard(job_id)
+
+
+def _run_task(kind: str, payload: Dict[str, Any], progress, publish=None, stop=None,
+              cancelled=None) -> Dict[str, Any]:
+    """Aiguille une tâche vers la fonction de traitement correspondante"""
+    from detection import run_detection, run_render
+    from live import run_stream
+
+    handlers = {
+        "detect": run_detection,
+        "render": run_render,
+        "stream": run_stream,
+    }
+    if kind not in handlers:
+        raise ValueError(f"Type de tâche inconnu : {kind}")
+    # Un flux en direct publie ses statistiques et s'arrête sur demande ; une détection
+    # ou un rendu annulé s'interrompt au lot suivant
+    extra = {"publish": publish, "stop": stop} if kind == "stream" else {"cancelled": cancelled}
+    return handlers[kind](**payload, progress=progress, **extra)
+
+
+def _worker_main(worker_id: int, task_queue, event_queue, stop_event, cancel_queue) -> None:
+    """
+    Boucle principale d'un processus worker
+
+    Charge et préchauffe son propre modèle YOLO, signale qu'il est prêt (avec la
+    durée de chaque étape du démarrage), puis traite les tâches de la file
+    jusqu'à réception de la sentinelle None. `stop_event` est levé par le
+    processus principal pour arrêter le flux en direct en cours ; `cancel_queue`
+    reçoit les identifiants des détections et rendus annulés.
+    """
+    started = time.perf_counter()
+    import torch
+    from detection import warm_up
+
+    torch.set_num_threads(IA_WORKER_THREADS)
+    timings = {"imports": time.perf_counter() - started}
+
+    try:
+        timings.update(warm_up())
+    except Exception as exc:
+        traceback.print_exc()
+        event_queue.put(("worker_failed", worker_id, str(exc)))
+        return
+
+    timings["total"] = time.perf_counter() - started
+    event_queue.put(("worker_ready", worker_id, {stage: round(seconds, 3) for stage, seconds in timings.items()}))
+    print(f"✓ Worker {worker_id} prêt en {timings['total']:.1f}s ({IA_WORKER_THREADS} threads)")
+
+    cancellations = _Cancellations(cancel_queue)
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        if task[1] == "detect" and SCHEDULER_MAX_VIDEOS > 1:
+            deferred, stopping = _run_shared(worker_id, task, task_queue, event_queue, cancellations)
+            if deferred is not None:
+                _run_single(worker_id, deferred, event_queue, stop_event, cancellations)
+            if stopping:
+                break
+        else:
+            _run_single(worker_id, task, event_queue, stop_event, cancellations)
+
+    print(f"✓ Worker {worker_id} arrêté")
+
+
+def _run_single(worker_id: int, task, event_queue, stop_event, cancellations: _Cancellations) -> None:
+    """Exécute une tâche seule dans le worker et remonte son résultat"""
+    job_id, kind, payload = task
+    # Effacé avant "started" : un arrêt demandé ensuite vise bien ce job
+    stop_event.clear()
+    event_queue.put(("started", job_id, worker_id))
+
+    def progress(frame: int, total_frames: int) -> None:
+        event_queue.put(("progress", job_id, (frame, total_frames)))
+
+    def publish(stats: Dict[str, Any]) -> None:
+        event_queue.put(("stream_stats", job_id, stats))
+
+    try:
+        result = _run_task(kind, payload, progress, publish, stop_event,
+                           lambda: cancellations.is_cancelled(job_id))
+        event_queue.put(("completed", job_id, result))
+    except Exception as exc:
+        event_queue.put(("failed", job_id, _task_error(exc)))
+    finally:
+        cancellations.forget(job_id)
+
+
+def _run_shared(worker_id: int, first_task, task_queue, event_queue, cancellations: _Cancellations):
+    """
+    Détecte plusieurs vidéos à la fois, par lots d'inférence partagés (scheduler.py)
+
+    Entre deux lots, les détections en attente dans la file rejoignent les vidéos
+    en cours, dans la limite de SCHEDULER_MAX_VIDEOS. Une tâche d'un autre type
+    (rendu, flux en direct) ou la sentinelle d'arrêt interrompt l'admission :
+    elle est traitée une fois les détections en cours terminées. Une vidéo annulée
+    quitte l'ordonnanceur avant le lot suivant.
+
+    Returns:
+        (tâche à exécuter seule ensuite ou None, sentinelle d'arrêt reçue)
+    """
+    from detection import DetectionSession, get_model
+    from scheduler import SharedBatchScheduler
+
+    scheduler = SharedBatchScheduler(get_model())
+    deferred, stopping = None, False
+
+    def admit(task) -> None:
+        job_id, _, payload = task
+        event_queue.put(("started", job_id, worker_id))
+
+        def progress(frame: int, total_frames: int) -> None:
+            event_queue.put(("progress", job_id, (frame, total_frames)))
+
+        try:
+            scheduler.add(job_id, DetectionSession(**payload, progress=progress))
+        except Exception as exc:
+            event_queue.put(("failed", job_id, _task_error(exc)))
+
+    admit(first_task)
+    try:
+        while len(scheduler):
+            while deferred is None and not stopping and len(scheduler) < SCHEDULER_MAX_VIDEOS:
+                try:
+                    task = task_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if task is None:
+                    stopping = True
+                elif task[1] != "detect":
+                    deferred = task
+                else:
+                    admit(task)
+
+            outcomes = [scheduler.cancel(job_id) for job_id in scheduler.keys()
+                        if cancellations.is_cancelled(job_id)]
+            for job_id, result, error in outcomes + scheduler.step():
+                cancellations.forget(job_id)
+                if error is None:
+                    event_queue.put(("completed", job_id, result))
+                else:
+                    event_queue.put(("failed", job_id, _task_error(error)))
+    finally:
+        scheduler.close()
+
+    return deferred, stopping
+
+
+def _task_error(exc: Exception) -> Dict[str, Any]:
+    """Erreur d'une tâche au format JobError (trace affichée si inattendue)"""
+    if isinstance(exc, DetectionError):
+        return {"status_code": exc.status_code, "detail": exc.detail}
+    traceback.print_exception(exc)
+    return {
+        "status_code": 500,
+        "detail": f"Erreur interne du worker : {exc}",
+    }
+
+
+# ========== Gestionnaire côté processus principal ==========
+
+class JobManager:
+    """
+    Pool de workers + file de jobs bornée
+
+    Les workers tirent les tâches d'une file partagée (équilibrage naturel),
+    et remontent leurs événements (démarrage, progression, résultat) via une
+    seconde file lue par un thread collecteur du processus principal.
+    """
+
+    def __init__(self, workers: int = IA_WORKERS, queue_size: int = IA_QUEUE_SIZE,
+                 retention: int = IA_JOB_RETENTION):
+        self.num_workers = workers
+        self.queue_size = queue_size
+        self.retention = retention
+
+        # spawn : chaque worker démarre un interpréteur propre (fork + PyTorch = risqué)
+        self._ctx = mp.get_context("spawn")
+        self._task_queue = None
+        self._event_queue = None
+
+        self._lock = threading.Lock()
+        # Notifié à chaque fin de job : réveille les coordinateurs de jobs découpés
+        self._job_finished = threading.Condition(self._lock)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._children: Dict[str, list] = {}
+        self._queued = deque()
+        self._processes: Dict[int, Any] = {}
+        # Événement d'arrêt du flux en direct et file d'annulation de chaque worker
+        self._stop_events: Dict[int, Any] = {}
+        self._cancel_queues: Dict[int, Any] = {}
+        # Jobs en cours dans chaque worker (plusieurs détections avec l'ordonnanceur multi-vidéos)
+        self._worker_jobs: Dict[int, set] = {}
+        self._ready_workers = set()
+        # Durée des étapes du dernier démarrage de chaque worker (secondes)
+        self._worker_startup: Dict[int, Dict[str, float]] = {}
+        self._started_at: Optional[float] = None
+        self._first_ready_at: Optional[float] = None
+
+        self._collector = None
+        self._stopping = threading.Event()
+
+    # ---------- Cycle de vie ----------
+
+    def start(self) -> None:
+        """Démarre les processus workers et le thread collecteur"""
+        self._task_queue = self._ctx.Queue()
+        self._event_queue = self._ctx.Queue()
+        self._stopping.clear()
+        self._started_at = time.time()
+
+        for worker_id in range(self.num_workers):
+            self._spawn_worker(worker_id)
+
+        self._collector = threading.Thread(target=self._collect_events, name="job-collector", daemon=True)
+        self._collector.start()
+        print(f"✓ Pool de {self.num_workers} worker(s) démarré (file max : {self.queue_size} jobs)")
+
+    def shutdown(self, timeout: float = 10.0) -> None:
+        """Arrête proprement les workers (sentinelles) puis force l'arrêt si nécessaire"""
+        self._stopping.set()
+        with self._lock:
+            self._job_finished.notify_all()
+        # Les flux en direct ne s'arrêtent que sur demande
+        for stop_event in self._stop_events.values():
+            stop_event.set()
+        for _ in self._processes:
+            self._task_queue.put(None)
+
+        deadline = time.time() + timeout
+        for process in self._processes.values():
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                process.terminate()
+
+        if self._collector:
+            self._collector.join(timeout=2.0)
+        print("✓ Pool de workers arrêté")
+
+    def _spawn_worker(self, worker_id: int) -> None:
+        self._stop_events[worker_id] = self._ctx.Event()
+        self._cancel_queues[worker_id] = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self._task_queue, self._event_queue, self._stop_events[worker_id],
+                  self._cancel_queues[worker_id]),
+            name=f"ia-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+        self._worker_jobs[worker_id] = set()
+
+    # ---------- API publique ----------
+
+    def submit(self, kind: str, payload: Dict[str, Any]) -> Job:
+        """
+        Ajoute un job à la file d'attente
+
+        Une détection avec plusieurs segments (payload "chunks", CHUNK_SEGMENTS par
+        défaut, 0 = un par worker) est coordonnée par un thread dédié qui répartit
+        les segments entre les workers (voir chunking.py).
+
+        Un flux en direct ("stream") occupe un worker jusqu'à son arrêt : au plus
+        LIVE_MAX_STREAMS flux sont acceptés à la fois.
+
+        Raises:
+            QueueFullError: si la file contient déjà queue_size jobs en attente,
+                ou LIVE_MAX_STREAMS flux pour un flux en direct
+        """
+        payload = dict(payload)
+        chunks = payload.pop("chunks", None)
+        chunks = CHUNK_SEGMENTS if chunks is None else chunks
+        segments = self.num_workers if chunks == 0 else chunks
+
+        with self._lock:
+            if len(self._queued) >= self.queue_size:
+                raise QueueFullError(f"File d'attente pleine ({self.queue_size} jobs en attente)")
+            if kind == "stream" and LIVE_MAX_STREAMS == 0:
+                raise QueueFullError("Analyse en direct désactivée (LIVE_MAX_STREAMS = 0 ou un seul worker)")
+            if kind == "stream" and self._active_streams() >= LIVE_MAX_STREAMS:
+                raise QueueFullError(f"Nombre maximal de flux en direct atteint ({LIVE_MAX_STREAMS})")
+
+            job = Job(job_id=str(uuid.uuid4()), kind=kind, payload=payload)
+            self._jobs[job.job_id] = job
+            self._queued.append(job.job_id)
+
+            if kind == "detect" and segments > 1:
+                threading.Thread(
+                    target=self._run_chunked, args=(job, segments),
+                    name=f"chunked-{job.job_id[:8]}", daemon=True
+                ).start()
+            else:
+                self._task_queue.put((job.job_id, kind, payload))
+            return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stop(self, job_id: str) -> Optional[Job]:
+        """
+        Demande l'arrêt d'un job (None si le job n'existe pas)
+
+        Un flux en direct termine le lot en cours puis renvoie son bilan ; une
+        détection ou un rendu est annulé au lot suivant (échec 409). Un job encore
+        en attente s'arrête dès son démarrage.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._request_stop(job)
+            return job
+
+    def _request_stop(self, job: Job) -> None:
+        if job.finished:
+            return
+        job.stop_requested = True
+        if job.status == JOB_RUNNING and job.worker is not None:
+            self._signal_stop(job)
+
+    def _signal_stop(self, job: Job) -> None:
+        """Transmet l'arrêt au worker qui exécute le job"""
+        if job.kind == "stream":
+            self._stop_events[job.worker].set()
+        else:
+            self._cancel_queues[job.worker].put(job.job_id)
+
+    def streams(self) -> list:
+        """Flux en direct en attente ou en cours"""
+        with self._lock:
+            return [job for job in self._jobs.values() if job.kind == "stream" and not job.finished]
+
+    def _active_streams(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.kind == "stream" and not job.finished)
+
+    def queue_position(self, job_id: str) -> int:
+        """Position (1 = prochain job traité) ou 0 si le job n'est plus en attente"""
+        with self._lock:
+            try:
+                return self._queued.index(job_id) + 1
+            except ValueError:
+                return 0
+
+    def queue_status(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.num_workers,
+                "workers_alive": sum(1 for p in self._processes.values() if p.is_alive()),
+                "workers_busy": sum(1 for job_ids in self._worker_jobs.values() if job_ids),
+                "queued": len(self._queued),
+                "running": sum(1 for job in self._jobs.values() if job.status == JOB_RUNNING),
+                "queue_capacity": self.queue_size,
+                "streams": self._active_streams(),
+                "stream_capacity": LIVE_MAX_STREAMS,
+            }
+
+    @property
+    def ready_workers(self) -> int:
+        with self._lock:
+            return len(self._ready_workers)
+
+    @property
+    def is_live(self) -> bool:
+        """Le processus principal traite les événements des workers (thread collecteur actif)"""
+        return self._collector is not None and self._collector.is_alive() and not self._stopping.is_set()
+
+    @property
+    def is_ready(self) -> bool:
+        """Au moins un worker a chargé et préchauffé son modèle"""
+        return self.is_live and self.ready_workers > 0
+
+    def startup_status(self) -> Dict[str, Any]:
+        """Durée des étapes de démarrage de chaque worker et délai avant le premier worker prêt"""
+        with self._lock:
+            return {
+                "ready_after": (round(self._first_ready_at - self._started_at, 3)
+                                if self._first_ready_at and self._started_at else None),
+                "workers": {str(worker_id): stages for worker_id, stages in sorted(self._worker_startup.items())},
+            }
+
+    # ---------- Thread collecteur ----------
+
+    def _collect_events(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                event, key, data = self._event_queue.get(timeout=1.0)
+            except queue.Empty:
+                self._check_workers()
+                continue
+            except (EOFError, OSError):
+                break
+
+            with self._lock:
+                self._handle_event(event, key, data)
+
+    def _handle_event(self, event: str, key: Any, data: Any) -> None:
+        if event == "worker_ready":
+            self._ready_workers.add(key)
+            self._worker_startup[key] = data or {}
+            if self._first_ready_at is None:
+                self._first_ready_at = time.time()
+            return
+        if event == "worker_failed":
+            print(f"ERREUR : Le worker {key} n'a pas pu charger le modèle - {data}")
+            return
+
+        # Occupation des workers, même pour une sous-tâche déjà abandonnée
+        if event == "started":
+            self._worker_jobs[data].add(key)
+        elif event in ("completed", "failed"):
+            for job_ids in self._worker_jobs.values():
+                job_ids.discard(key)
+
+        job = self._jobs.get(key)
+        if job is None:
+            return
+
+        if event == "started":
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            job.worker = data
+            if job.stop_requested:
+                self._signal_stop(job)
+            # Le job découpé démarre avec sa première sous-tâche
+            self._mark_started(self._jobs.get(job.parent_id) if job.parent_id else job)
+        elif event == "stream_stats":
+            job.live = data
+        elif event == "progress":
+            job.frame, job.total_frames = data
+            if job.parent_id in self._children:
+                parent = self._jobs[job.parent_id]
+                parent.frame = parent.frames_done + sum(child.frame for child in self._children[parent.job_id])
+        elif event in ("completed", "failed"):
+            self._finish(job, JOB_COMPLETED if event == "completed" else JOB_FAILED, data)
+
+    def _check_workers(self) -> None:
+        """Détecte les workers morts (crash natif, OOM...) : échec des jobs en cours et redémarrage"""
+        if self._stopping.is_set():
+            return
+        with self._lock:
+            for worker_id, process in list(self._processes.items()):
+                if process.is_alive():
+                    continue
+
+                print(f"ATTENTION : Worker {worker_id} arrêté (code {process.exitcode}), redémarrage...")
+                self._ready_workers.discard(worker_id)
+                for job_id in list(self._worker_jobs.get(worker_id, ())):
+                    job = self._jobs.get(job_id)
+                    if job and not job.finished:
+                        self._finish(job, JOB_FAILED, {
+                            "status_code": 500,
+                            "detail": "Le worker IA s'est arrêté pendant le traitement",
+                        })
+                self._spawn_worker(worker_id)
+
+    def _mark_started(self, job: Job) -> None:
+        if job.status == JOB_QUEUED:
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+        if job.job_id in self._queued:
+            self._queued.remove(job.job_id)
+
+    def _finish(self, job: Job, status: str, data: Any) -> None:
+        """Termine un job (résultat ou erreur) et réveille les coordinateurs en attente"""
+        job.finished_at = time.time()
+        job.status = status
+        if status == JOB_COMPLETED:
+            job.result = data
+        else:
+            job.error = data
+        if job.job_id in self._queued:
+            self._queued.remove(job.job_id)
+        if job.worker is not None:
+            self._worker_jobs.get(job.worker, set()).discard(job.job_id)
+        # Sous-tâche annulée après l'échec d'une autre : plus attendue par son parent
+        if job.parent_id and job.parent_id not in self._children:
+            self._jobs.pop(job.job_id, None)
+        self._job_finished.notify_all()
+        self._prune_finished()
+
+    # ---------- Jobs découpés ----------
+
+    def _run_chunked(self, job: Job, segments: int) -> None:
+        """Thread coordinateur d'une détection découpée en segments"""
+        from chunking import run_chunked_detection
+
+        def set_total_frames(total_frames: int) -> None:
+            with self._lock:
+                job.total_frames = total_frames
+
+        try:
+            result = run_chunked_detection(
+                job.payload, segments,
+                lambda kind, payloads: self._run_children(job, kind, payloads),
+                set_total_frames,
+            )
+            status, data = JOB_COMPLETED, result
+        except ChildJobError as exc:
+            status, data = JOB_FAILED, exc.error
+        except DetectionError as exc:
+            status, data = JOB_FAILED, {"status_code": exc.status_code, "detail": exc.detail}
+        except Exception as exc:
+            traceback.print_exc()
+            status, data = JOB_FAILED, {"status_code": 500, "detail": f"Erreur interne du coordinateur : {exc}"}
+
+        with self._lock:
+            if status == JOB_COMPLETED:
+                job.frame = job.total_frames
+            self._finish(job, status, data)
+
+    def _run_children(self, parent: Job, kind: str, payloads: list) -> list:
+        """
+        Place des sous-tâches dans la file des workers et attend leurs résultats
+
+        Les sous-tâches ne comptent pas dans la capacité de la file (le job parent
+        y a déjà sa place). Au premier échec, les autres sous-tâches sont arrêtées
+        (stop) : elles libèrent leur worker au lot suivant, ou dès leur démarrage.
+
+        Raises:
+            ChildJobError: si une sous-tâche échoue ou si le service s'arrête
+        """
+        with self._lock:
+            children = []
+            for payload in payloads:
+                child = Job(job_id=str(uuid.uuid4()), kind=kind, payload=payload, parent_id=parent.job_id)
+                self._jobs[child.job_id] = child
+                self._task_queue.put((child.job_id, kind, payload))
+                children.append(child)
+            self._children[parent.job_id] = children
+
+            self._job_finished.wait_for(lambda: self._stopping.is_set() or all(c.finished for c in children)
+                                        or any(c.status == JOB_FAILED for c in children))
+
+            # Les sous-tâches ne sont pas conservées une fois l'étape terminée ; celles
+            # encore en attente ou en cours sont arrêtées et retirées à leur fin (_finish)
+            del self._children[parent.job_id]
+            parent.frames_done += sum(child.frame for child in children)
+            for child in children:
+                if child.finished:
+                    self._jobs.pop(child.job_id, None)
+                else:
+                    self._request_stop(child)
+
+            failed = next((child for child in children if child.status == JOB_FAILED), None)
+            if failed is not None:
+                raise ChildJobError(failed.error)
+            if self._stopping.is_set():
+                raise ChildJobError({"status_code": 503, "detail": "Service IA en cours d'arrêt"})
+            return [child.result for child in children]
+
+    def _prune_finished(self) -> None:
+        """Ne conserve que les `retention` derniers jobs terminés"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished and not job.parent_id]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
@@ -0,0 +1,442 @@
+"""
+Analyse de flux vidéo en direct VisionTrack (RTSP, HTTP, caméra locale)
+
+Exécutée dans un processus worker. Un thread lecteur décode le flux en continu
+dans un tampon borné (LIVE_BUFFER_FRAMES frames) ; la boucle de détection y
+prend les frames par lots et leur applique le même pipeline qu'une vidéo
+(predict_batch puis ByteTrack, frame par frame). Quand la détection prend du
+retard, les frames les plus anciens du tampon sont abandonnés au lieu d'être
+mis en file : le retard sur le direct reste borné. L'occupation de la zone est
+agrégée sur une fenêtre glissante et publiée toutes les LIVE_STATS_INTERVAL
+secondes (diffusée par WebSocket par le processus principal).
+"""
+
+import os
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import (
+    INFERENCE_BATCH_SIZE,
+    LIVE_BUFFER_FRAMES,
+    LIVE_READ_TIMEOUT,
+    LIVE_RECONNECT_ATTEMPTS,
+    LIVE_RECONNECT_DELAY,
+    LIVE_RTSP_TRANSPORT,
+    LIVE_STATS_INTERVAL,
+    LIVE_WINDOW_SECONDS,
+)
+from detection import ProgressCallback, filter_tracks, get_model, predict_batch
+from errors import DetectionError
+from schemas import PolygonZone, Zone
+from tracking import create_tracker, update_tracker
+
+# Callback de publication des statistiques glissantes
+StatsCallback = Callable[[Dict], None]
+
+# Cadence supposée d'un flux qui n'annonce pas la sienne (ou une valeur aberrante)
+DEFAULT_STREAM_FPS = 30.0
+
+# Causes de fin d'une analyse en direct
+STOP_REQUESTED = "stopped"
+STOP_MAX_DURATION = "max_duration"
+STOP_ENDED = "ended"
+STOP_DISCONNECTED = "disconnected"
+
+# Frame décodé : (numéro, instant de décodage time.monotonic(), image)
+TimedFrame = Tuple[int, float, np.ndarray]
+
+
+def open_stream(source: str) -> cv2.VideoCapture:
+    """
+    Ouvre un flux : index de caméra ("0"), périphérique (/dev/video0), URL ou fichier
+
+    Les délais d'ouverture et de lecture sont bornés (LIVE_READ_TIMEOUT) : une
+    caméra muette est traitée comme une coupure au lieu de bloquer le worker.
+    """
+    if source.startswith(("rtsp://", "rtsps://")):
+        os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", f"rtsp_transport;{LIVE_RTSP_TRANSPORT}")
+
+    timeout_ms = int(LIVE_READ_TIMEOUT * 1000)
+    capture = cv2.VideoCapture(int(source) if source.isdigit() else source, cv2.CAP_ANY,
+                               [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, timeout_ms, cv2.CAP_PROP_READ_TIMEOUT_MSEC, timeout_ms])
+    if capture.isOpened():
+        # Caméras locales : pas de frames anciens accumulés par le pilote
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return capture
+
+
+class FrameBuffer:
+    """
+    Tampon borné entre le thread lecteur et la détection
+
+    Le lecteur n'attend jamais : un frame ajouté à un tampon plein remplace le
+    plus ancien, compté comme abandonné.
+    """
+
+    def __init__(self, capacity: int = LIVE_BUFFER_FRAMES):
+        self._frames: deque = deque(maxlen=capacity)
+        self._condition = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item: TimedFrame) -> None:
+        with self._condition:
+            if len(self._frames) == self._frames.maxlen:
+                self.dropped += 1
+            self._frames.append(item)
+            self._condition.notify()
+
+    def take(self, count: int, timeout: float) -> List[TimedFrame]:
+        """Jusqu'à `count` frames, du plus ancien au plus récent (liste vide après `timeout` secondes)"""
+        with self._condition:
+            self._condition.wait_for(lambda: self._frames or self.closed, timeout)
+            return [self._frames.popleft() for _ in range(min(count, len(self._frames)))]
+
+    def close(self) -> None:
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+    @property
+    def exhausted(self) -> bool:
+        """Flux terminé et tous ses frames déjà pris"""
+        with self._condition:
+            return self.closed and not self._frames
+
+
+class StreamReader(threading.Thread):
+    """
+    Thread lecteur : décode le flux en continu dans le tampon
+
+    Un fichier local est lu à sa cadence nominale (substitut de caméra pour les
+    essais) et s'arrête à sa fin ; une coupure d'un flux réseau ou d'une caméra
+    déclenche jusqu'à LIVE_RECONNECT_ATTEMPTS reconnexions.
+    """
+
+    def __init__(self, source: str, capture: cv2.VideoCapture, buffer: FrameBuffer, fps: float,
+                 halt: threading.Event, frames_read: int = 0):
+        super().__init__(name="stream-reader", daemon=True)
+        self.source = source
+        self.capture = capture
+        self.buffer = buffer
+        self.fps = fps
+        self.halt = halt
+        self.paced = Path(source).is_file()
+        self.frames_read = frames_read
+        self.reconnections = 0
+        # Cause de fin côté source (None tant que le flux est lu ou si l'arrêt vient de la détection)
+        self.end_reason: Optional[str] = None
+
+    def run(self) -> None:
+        started = time.monotonic()
+        try:
+            while not self.halt.is_set():
+                ok, frame = self.capture.read()
+                if not ok:
+                    if self.paced:
+                        self.end_reason = STOP_ENDED
+                        break
+                    if not self.reconnect():
+                        self.end_reason = STOP_DISCONNECTED
+                        break
+                    continue
+
+                self.buffer.put((self.frames_read, time.monotonic(), frame))
+                self.frames_read += 1
+                if self.paced:
+                    self.halt.wait(max(0.0, started + self.frames_read / self.fps - time.monotonic()))
+        finally:
+            self.capture.release()
+            self.buffer.close()
+
+    def reconnect(self) -> bool:
+        """Rouvre le flux après une coupure (False si toutes les tentatives échouent ou si l'arrêt est demandé)"""
+        self.capture.release()
+        for attempt in range(1, LIVE_RECONNECT_ATTEMPTS + 1):
+            print(f"ATTENTION : Flux interrompu, reconnexion {attempt}/{LIVE_RECONNECT_ATTEMPTS}...")
+            if self.halt.wait(LIVE_RECONNECT_DELAY):
+                return False
+            self.capture = open_stream(self.source)
+            if self.capture.isOpened():
+                self.reconnections += 1
+                print(f"✓ Flux rétabli : {self.source}")
+                return True
+            self.capture.release()
+        print(f"ERREUR : Flux perdu après {LIVE_RECONNECT_ATTEMPTS} tentative(s) de reconnexion")
+        return False
+
+
+class ZoneCounter:
+    """
+    Personnes dans la zone d'analyse et dans chaque zone polygonale
+
+    Mêmes règles que le backend : une personne (centre de sa box) compte si elle
+    est dans la zone rectangulaire ; les polygones sont rastérisés une seule fois
+    (un bit par polygone) et lus au pixel du centre.
+    """
+
+    def __init__(self, width: int, height: int, zone: Optional[Zone], polygons: List[PolygonZone]):
+        self.width = width
+        self.height = height
+        self.zone = zone
+        self.polygon_count = len(polygons)
+        self.bits = None
+        if polygons:
+            self.bits = np.zeros((height, width), dtype=np.uint32)
+            mask = np.zeros((height, width), dtype=np.uint8)
+            for index, polygon in enumerate(polygons):
+                mask[:] = 0
+                cv2.fillPoly(mask, [np.round(np.array(polygon.points)).astype(np.int32)], 1)
+                self.bits |= mask.astype(np.uint32) << np.uint32(index)
+
+    def count(self, boxes: List[Dict]) -> Tuple[List[Dict], np.ndarray]:
+        """Boxes de la zone et nombre de personnes de chaque zone polygonale"""
+        zone_counts = np.zeros(self.polygon_count, dtype=np.int64)
+        if not boxes:
+            return boxes, zone_counts
+
+        corners = np.array([(box["x1"], box["y1"], box["x2"], box["y2"]) for box in boxes], dtype=np.float64)
+        center_x = (corners[:, 0] + corners[:, 2]) / 2
+        center_y = (corners[:, 1] + corners[:, 3]) / 2
+        inside = np.ones(len(boxes), dtype=bool)
+        if self.zone is not None:
+            inside = ((center_x >= self.zone.x1) & (center_x <= self.zone.x2)
+                      & (center_y >= self.zone.y1) & (center_y <= self.zone.y2))
+
+        if self.bits is not None:
+            column = np.floor(center_x).astype(np.int64)
+            row = np.floor(center_y).astype(np.int64)
+            counted = inside & (column >= 0) & (column < self.width) & (row >= 0) & (row < self.height)
+            pixel_bits = self.bits[row[counted], column[counted]]
+            membership = (pixel_bits[:, None] >> np.arange(self.polygon_count, dtype=np.uint32)) & 1
+            zone_counts = membership.sum(axis=0).astype(np.int64)
+
+        return [box for box, keep in zip(boxes, inside.tolist()) if keep], zone_counts
+
+
+class RollingStats:
+    """
+    Occupation de la zone sur une fenêtre glissante
+
+    Un échantillon par frame détecté : (instant, personnes, track_ids, personnes
+    par zone polygonale). Les track_ids présents dans la fenêtre sont comptés
+    (Counter) à l'entrée et à la sortie des échantillons : le nombre de personnes
+    distinctes ne demande pas de reparcourir la fenêtre.
+    """
+
+    def __init__(self, window_seconds: float, zone_names: List[str]):
+        self.window_seconds = window_seconds
+        self.zone_names = zone_names
+        self.samples: deque = deque()
+        self.window_tracks: Counter = Counter()
+        self.all_tracks = set()
+
+    def add(self, timestamp: float, people: int, track_ids: List[int], zone_counts: np.ndarray) -> None:
+        self.samples.append((timestamp, people, track_ids, zone_counts))
+        self.window_tracks.update(track_ids)
+        self.all_tracks.update(track_ids)
+
+    def expire(self, now: float) -> None:
+        """Retire les échantillons sortis de la fenêtre"""
+        while self.samples and self.samples[0][0] < now - self.window_seconds:
+            _, _, track_ids, _ = self.samples.popleft()
+            self.window_tracks.subtract(track_ids)
+            for track_id in track_ids:
+                if self.window_tracks[track_id] <= 0:
+                    del self.window_tracks[track_id]
+
+    def snapshot(self, now: float) -> Dict:
+        """Statistiques de la fenêtre (personnes au dernier frame, maximum, moyenne, personnes suivies)"""
+        self.expire(now)
+        people = np.array([sample[1] for sample in self.samples], dtype=np.int64)
+        zone_counts = (np.array([sample[3] for sample in self.samples], dtype=np.int64)
+                       if self.samples else np.zeros((0, len(self.zone_names)), dtype=np.int64))
+        return {
+            "window_seconds": self.window_seconds,
+            "samples": len(self.samples),
+            "current_people": int(people[-1]) if len(people) else 0,
+            "max_people": int(people.max()) if len(people) else 0,
+            "mean_people": round(float(people.mean()), 3) if len(people) else 0.0,
+            "tracks": len(self.window_tracks),
+            "total_tracks": len(self.all_tracks),
+            "zones": [
+                {
+                    "name": name,
+                    "current_people": int(zone_counts[-1, index]) if len(zone_counts) else 0,
+                    "max_people": int(zone_counts[:, index].max()) if len(zone_counts) else 0,
+                    "mean_people": round(float(zone_counts[:, index].mean()), 3) if len(zone_counts) else 0.0,
+                }
+                for index, name in enumerate(self.zone_names)
+            ],
+        }
+
+
+def run_stream(source: str, zone: Optional[Dict] = None, zones: Optional[List[Dict]] = None,
+               batch_size: Optional[int] = None, window_seconds: Optional[float] = None,
+               max_duration: Optional[float] = None, progress: Optional[ProgressCallback] = None,
+               publish: Optional[StatsCallback] = None, stop=None) -> Dict:
+    """
+    Analyse un flux en direct jusqu'à l'arrêt demandé, la fin du flux ou max_duration
+
+    Args:
+        source: URL du flux (rtsp://, http://, tcp://...), index ou périphérique de caméra,
+            ou fichier local lu à sa cadence nominale
+        zone: Zone d'analyse (dict x1, y1, x2, y2) ou None pour le frame entier
+        zones: Zones polygonales nommées (dict name, points) comptées séparément
+        batch_size: Frames détectés par appel au modèle (INFERENCE_BATCH_SIZE par défaut)
+        window_seconds: Durée de la fenêtre glissante (LIVE_WINDOW_SECONDS par défaut)
+        max_duration: Durée maximale de l'analyse en secondes (illimitée par défaut)
+        progress: Callback appelé à chaque publication avec (frames détectés, 0)
+        publish: Callback recevant les statistiques toutes les LIVE_STATS_INTERVAL secondes
+        stop: Événement (threading ou multiprocessing) demandant l'arrêt de l'analyse
+
+    Returns:
+        Dict compatible avec StreamResponse (bilan et dernières statistiques)
+
+    Raises:
+        DetectionError: si le flux ne peut pas être ouvert ou n'envoie aucune image
+    """
+    print("\n" + "="*80)
+    print("DÉBUT DE L'ANALYSE DU FLUX EN DIRECT")
+    print("="*80)
+    print(f"Source : {source}")
+
+    zone = Zone(**zone) if zone else None
+    polygons = [PolygonZone(**polygon) for polygon in zones or []]
+
+    capture = open_stream(source)
+    if not capture.isOpened():
+        print(f"ERREUR : Impossible d'ouvrir le flux {source}")
+        raise DetectionError(400, f"Impossible d'ouvrir le flux : {source}")
+
+    # Premier frame lu ici : certaines sources n'annoncent leurs dimensions qu'après
+    ok, first_frame = capture.read()
+    if not ok:
+        capture.release()
+        print(f"ERREUR : Aucune image reçue du flux {source}")
+        raise DetectionError(400, f"Aucune image reçue du flux : {source}")
+
+    height, width = first_frame.shape[:2]
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    fps = fps if 1 <= fps <= 240 else DEFAULT_STREAM_FPS
+    window_seconds = window_seconds or LIVE_WINDOW_SECONDS
+    batch_size = max(1, batch_size or INFERENCE_BATCH_SIZE)
+    print(f"✓ Flux ouvert : {width}x{height}, {fps:.1f} FPS annoncés")
+    print(f"  - Tampon : {LIVE_BUFFER_FRAMES} frame(s), lots de {batch_size}, fenêtre de {window_seconds:.0f}s")
+
+    # Tracker propre à ce flux : les track_ids repartent de 1
+    yolo_model = get_model()
+    tracker = create_tracker()
+    counter = ZoneCounter(width, height, zone, polygons)
+    stats = RollingStats(window_seconds, [polygon.name for polygon in polygons])
+
+    buffer = FrameBuffer(LIVE_BUFFER_FRAMES)
+    buffer.put((0, time.monotonic(), first_frame))
+    halt = threading.Event()
+    reader = StreamReader(source, capture, buffer, fps, halt, frames_read=1)
+    reader.start()
+
+    started = time.monotonic()
+    frames_processed = 0
+    sequence = 0
+    # Compteurs de l'intervalle de publication en cours
+    interval_start, interval_read, interval_processed, interval_latency = started, 1, 0, 0.0
+    next_publish = started + LIVE_STATS_INTERVAL
+    stop_reason = STOP_REQUESTED
+    last_stats = None
+
+    def collect(now: float) -> Dict:
+        """Statistiques glissantes + débit et retard de l'intervalle écoulé"""
+        nonlocal sequence, interval_start, interval_read, interval_processed, interval_latency
+        elapsed = max(now - interval_start, 1e-6)
+        sequence += 1
+        current = {
+            "sequence": sequence,
+            "timestamp": time.time(),
+            "uptime_seconds": round(now - started, 3),
+            "width": width,
+            "height": height,
+            "frames_read": reader.frames_read,
+            "frames_processed": frames_processed,
+            "frames_dropped": buffer.dropped,
+            "source_fps": round((reader.frames_read - interval_read) / elapsed, 2),
+            "processing_fps": round(interval_processed / elapsed, 2),
+            # Âge moyen des frames (décodage -> fin du tracking) : retard sur le direct
+            "latency_ms": round(1000 * interval_latency / interval_processed, 1) if interval_processed else None,
+            "reconnections": reader.reconnections,
+            **stats.snapshot(now),
+        }
+        interval_start, interval_read, interval_processed, interval_latency = now, reader.frames_read, 0, 0.0
+        return current
+
+    try:
+        while True:
+            if stop is not None and stop.is_set():
+                stop_reason = STOP_REQUESTED
+                break
+            if max_duration and time.monotonic() - started >= max_duration:
+                stop_reason = STOP_MAX_DURATION
+                break
+
+            batch = buffer.take(batch_size, timeout=min(LIVE_STATS_INTERVAL, 0.5))
+            if batch:
+                predictions = predict_batch(yolo_model, [image for _, _, image in batch])
+                for (_, captured_at, image), boxes in zip(batch, predictions):
+                    tracks = update_tracker(tracker, boxes, image)
+                    in_zone, zone_counts = counter.count(filter_tracks(tracks))
+                    track_ids = [box["track_id"] for box in in_zone if box["track_id"] is not None]
+                    stats.add(captured_at, len(in_zone), track_ids, zone_counts)
+                    interval_latency += time.monotonic() - captured_at
+                frames_processed += len(batch)
+                interval_processed += len(batch)
+            elif buffer.exhausted:
+                stop_reason = reader.end_reason or STOP_ENDED
+                break
+
+            now = time.monotonic()
+            if now >= next_publish:
+                last_stats = collect(now)
+                next_publish = now + LIVE_STATS_INTERVAL
+                if publish:
+                    publish(last_stats)
+                if progress:
+                    progress(frames_processed, 0)
+    finally:
+        halt.set()
+        reader.join(timeout=LIVE_READ_TIMEOUT)
+        print("✓ Flux fermé")
+
+    last_stats = collect(time.monotonic())
+    if publish:
+        publish(last_stats)
+    duration = time.monotonic() - started
+
+    print("\n" + "-"*80)
+    print("RÉSUMÉ DE L'ANALYSE DU FLUX")
+    print("-"*80)
+    print(f"Fin : {stop_reason} après {duration:.1f}s")
+    print(f"Frames lus : {reader.frames_read}, détectés : {frames_processed}, abandonnés : {buffer.dropped}")
+    print(f"Personnes suivies distinctes : {last_stats['total_tracks']}")
+    print("="*80 + "\n")
+
+    return {
+        "message": "Analyse du flux terminée",
+        "source": source,
+        "stop_reason": stop_reason,
+        "duration_seconds": round(duration, 3),
+        "fps": fps,
+        "width": width,
+        "height": height,
+        "frames_read": reader.frames_read,
+        "frames_processed": frames_processed,
+        "frames_dropped": buffer.dropped,
+        "reconnections": reader.reconnections,
+        "total_tracks": last_stats["total_tracks"],
+        "last_stats": last_stats,
+    }
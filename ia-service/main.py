@@ -1,38 +1,51 @@
 """
 Service IA pour VisionTrack
 Utilise YOLOv8n pour détecter les personnes dans les vidéos
+
+L'inférence s'exécute dans un pool de processus workers (voir jobs.py) :
+les endpoints ne font qu'enfiler des jobs et consulter leur état, la boucle
+d'événements reste donc disponible pendant les analyses.
 """
 
-import os
-import subprocess
+import asyncio
+import re
 from pathlib import Path
-from typing import List, Dict, Optional
-
-import cv2
-import numpy as np
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from ultralytics import YOLO
-
-# Configuration from environment variables
-YOLO_MODEL = os.getenv("YOLO_MODEL", "yolov8n.pt")
-CONFIDENCE_THRESHOLD = float(os.getenv("CONFIDENCE_THRESHOLD", "0.5"))
-TRACKER_CONFIG = os.getenv("TRACKER_CONFIG", "bytetrack.yaml")
-
-# VIDEO_CODEC correspond désormais au format final souhaité (H264 par défaut pour compatibilité navigateur)
-VIDEO_CODEC = os.getenv("VIDEO_CODEC", "mp4v").upper()
-H264_PRESET = os.getenv("H264_PRESET", "veryfast")
-H264_CRF = os.getenv("H264_CRF", "23")
-H264_CODECS = {"H264", "AVC1", "X264"}
-VIDEO_WRITER_CODEC_OVERRIDE = os.getenv("VIDEO_WRITER_CODEC")
-NEEDS_H264_TRANSCODE = VIDEO_CODEC in H264_CODECS
-
-# Codec réellement utilisé par OpenCV (mp4v si on doit ensuite transcoder en H.264)
-VIDEO_WRITER_CODEC = (
-    VIDEO_WRITER_CODEC_OVERRIDE.upper()
-    if VIDEO_WRITER_CODEC_OVERRIDE
-    else ("MP4V" if NEEDS_H264_TRANSCODE else VIDEO_CODEC)
+from urllib.parse import urlparse
+
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from config import (
+    ADAPTIVE_BUSY_PEOPLE,
+    ADAPTIVE_IMGSZ_ENABLED,
+    ADAPTIVE_IMGSZ_MIN,
+    ADAPTIVE_IMGSZ_MIN_PERSON_PIXELS,
+    ADAPTIVE_IMGSZ_PROBE_SECONDS,
+    ADAPTIVE_IMGSZ_RECHECK_SECONDS,
+    ADAPTIVE_STRIDE_ENABLED,
+    ADAPTIVE_STRIDE_MAX,
+    ANALYSIS_FPS,
+    CONFIDENCE_THRESHOLD,
+    DECODE_BACKEND,
+    DECODE_MAX_WIDTH,
+    DECODE_PREFETCH_FRAMES,
+    DECODE_THREADS,
+    FRAME_STRIDE,
+    INFERENCE_BACKEND,
+    INFERENCE_IMGSZ,
+    INFERENCE_INT8,
+    MOTION_DOWNSCALE_WIDTH,
+    MOTION_GATE_ENABLED,
+    MOTION_MAX_SKIPPED,
+    MOTION_MIN_AREA,
+    MOTION_PIXEL_THRESHOLD,
+    TRACKER_CONFIG,
+    YOLO_MODEL,
+    ZONE_CROP_ENABLED,
+    ZONE_CROP_MARGIN,
 )
+from jobs import JobManager, QueueFullError
+from schemas import DetectRequest, JobStatus, JobSubmission, QueueStatus, RenderRequest, StreamRequest
 
 # Initialisation de l'application FastAPI
 app = FastAPI(
@@ -41,61 +54,28 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Variable globale pour le modèle (chargement lazy)
-model = None
-
-def get_model():
-    """
-    Charge le modèle YOLO de manière lazy (seulement quand nécessaire)
-    et le met en cache pour les appels suivants
-    """
-    global model
-    if model is None:
-        print(f"Chargement du modèle YOLO: {YOLO_MODEL}")
-        model = YOLO(YOLO_MODEL)
-        print(f"Modèle {YOLO_MODEL} chargé avec succès!")
-    return model
-
+# Pool de workers (démarré avec l'application)
+job_manager = JobManager()
 
-# ========== Modèles Pydantic pour la validation des données ==========
+# Sources acceptées pour l'analyse en direct : URL réseau, caméra locale (index ou
+# périphérique) ou fichier local (substitut de caméra pour les essais)
+STREAM_URL_SCHEMES = {"rtsp", "rtsps", "rtmp", "http", "https", "udp", "tcp", "srt"}
+STREAM_DEVICE_PATTERN = re.compile(r"^(\d+|/dev/video\d+)$")
 
-class Zone(BaseModel):
-    """Modèle pour la zone d'analyse (rectangle)"""
-    x1: float
-    y1: float
-    x2: float
-    y2: float
+# Intervalle de consultation des statistiques d'un flux par les WebSockets (secondes)
+STREAM_SOCKET_POLL_SECONDS = 0.2
 
 
-class DetectRequest(BaseModel):
-    """Requête pour la détection"""
-    video_path: str
-    zone: Optional[Zone] = None
+@app.on_event("startup")
+async def start_workers():
+    """Démarre le pool de workers au lancement du service"""
+    job_manager.start()
 
 
-class DetectionBox(BaseModel):
-    """Bounding box d'une détection"""
-    x1: float
-    y1: float
-    x2: float
-    y2: float
-    confidence: float
-    track_id: Optional[int] = None
-
-
-class FrameDetection(BaseModel):
-    """Détections pour un frame spécifique"""
-    frame: int
-    boxes: List[DetectionBox]
-
-
-class DetectionResponse(BaseModel):
-    """Réponse de détection"""
-    message: str
-    total_frames: int
-    fps: float
-    detections: List[FrameDetection]
-    annotated_video_path: str
+@app.on_event("shutdown")
+async def stop_workers():
+    """Arrête proprement le pool de workers"""
+    job_manager.shutdown()
 
 
 # ========== Endpoints de l'API ==========
@@ -111,312 +91,272 @@ async def root():
     }
 
 
-@app.post("/detect", response_model=DetectionResponse)
+@app.post("/detect", response_model=JobSubmission, status_code=202)
 async def detect_people(request: DetectRequest):
     """
     Endpoint principal pour détecter les personnes dans une vidéo
 
+    L'analyse est placée dans la file d'attente et exécutée par un worker.
+    Suivre l'avancement avec GET /jobs/{job_id}.
+
     Args:
         request: Contient le chemin de la vidéo et la zone d'analyse
 
     Returns:
-        Liste des détections par frame avec statistiques et vidéo annotée
+        Identifiant du job et position dans la file d'attente
+    """
+    # Vérification immédiate pour ne pas occuper un worker inutilement
+    if not Path(request.video_path).exists():
+        print(f"ERREUR : Vidéo non trouvée à {request.video_path}")
+        raise HTTPException(status_code=404, detail=f"Vidéo non trouvée : {request.video_path}")
+
+    payload = {
+        "video_path": request.video_path,
+        "zone": request.zone.model_dump() if request.zone else None,
+        "zones": [polygon.model_dump() for polygon in request.zones] if request.zones else None,
+        "batch_size": request.batch_size,
+        "crop_to_zone": request.crop_to_zone,
+        "zone_margin": request.zone_margin,
+        "render_video": request.render_video,
+        "frame_stride": request.frame_stride,
+        "analysis_fps": request.analysis_fps,
+        "adaptive_stride": request.adaptive_stride,
+        "motion_gate": request.motion_gate,
+        "adaptive_imgsz": request.adaptive_imgsz,
+        "chunks": request.chunks,
+    }
+
+    return submit_job("detect", payload, request.video_path)
+
+
+@app.post("/render", response_model=JobSubmission, status_code=202)
+async def render_annotated_video(request: RenderRequest):
+    """
+    Endpoint pour générer la vidéo annotée à partir de détections existantes
+
+    Aucune inférence : la vidéo source est relue et les boxes fournies sont
+    dessinées puis encodées. Suivre l'avancement avec GET /jobs/{job_id}.
+
+    Args:
+        request: Chemin de la vidéo source, zone d'analyse et détections par frame
+
+    Returns:
+        Identifiant du job et position dans la file d'attente
     """
-    print("\n" + "="*80)
-    print("DÉBUT DE L'ANALYSE VIDÉO")
-    print("="*80)
-
-    video_path = request.video_path
-    zone = request.zone
-
-    print(f"Chemin vidéo reçu : {video_path}")
-    if zone:
-        print(f"Zone d'analyse : x1={zone.x1}, y1={zone.y1}, x2={zone.x2}, y2={zone.y2}")
-    else:
-        print("Zone d'analyse : VIDÉO ENTIÈRE (aucune zone spécifiée)")
-
-    # Vérifier que le fichier vidéo existe
-    if not Path(video_path).exists():
-        print(f"ERREUR : Vidéo non trouvée à {video_path}")
-        raise HTTPException(status_code=404, detail=f"Vidéo non trouvée : {video_path}")
-
-    print(f"✓ Fichier vidéo trouvé : {Path(video_path).stat().st_size} bytes")
-
-    # Ouvrir la vidéo avec OpenCV
-    cap = cv2.VideoCapture(video_path)
-
-    if not cap.isOpened():
-        print("ERREUR : Impossible d'ouvrir la vidéo avec OpenCV")
-        raise HTTPException(status_code=400, detail="Impossible d'ouvrir la vidéo")
-
-    # Récupérer les informations de la vidéo
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    cap.release()
-
-    print(f"✓ Vidéo ouverte avec succès")
-    print(f"  - Total frames : {total_frames}")
-    print(f"  - FPS : {fps}")
-    print(f"  - Résolution : {width}x{height}")
-
-    # Si aucune zone n'est spécifiée, utiliser la vidéo entière
-    if zone is None:
-        zone = Zone(x1=0, y1=0, x2=width, y2=height)
-        print(f"✓ Zone définie sur vidéo entière : (0, 0) -> ({width}, {height})")
-
-    # Créer le répertoire pour les vidéos annotées
-    annotated_dir = Path("/app/shared/annotated")
-    annotated_dir.mkdir(parents=True, exist_ok=True)
-    print(f"✓ Répertoire annotated créé/vérifié : {annotated_dir}")
-
-    # Générer le nom du fichier de sortie pour la vidéo annotée
-    video_id = Path(video_path).stem
-    annotated_video_path = annotated_dir / f"{video_id}_annotated.mp4"
-    writer_output_path = annotated_video_path
-
-    if NEEDS_H264_TRANSCODE:
-        writer_output_path = annotated_dir / f"{video_id}_annotated_raw.mp4"
-        print("Codec H.264 demandé -> génération d'un fichier intermédiaire avant transcodage ffmpeg")
-
-    print(f"Chemin de sortie pour vidéo annotée : {annotated_video_path}")
-    if writer_output_path != annotated_video_path:
-        print(f"Fichier temporaire utilisé pour l'écriture OpenCV : {writer_output_path}")
-
-    # Créer le VideoWriter pour la vidéo annotée
-    print(f"Codec utilisé par OpenCV : {VIDEO_WRITER_CODEC}")
-    fourcc = cv2.VideoWriter_fourcc(*VIDEO_WRITER_CODEC)
-    out = cv2.VideoWriter(str(writer_output_path), fourcc, fps, (width, height))
-
-    if not out.isOpened():
-        print("ERREUR : Impossible de créer le VideoWriter")
-        raise HTTPException(status_code=500, detail="Impossible de créer la vidéo annotée")
-
-    print(f"✓ VideoWriter créé avec succès")
-
-    # Charger le modèle (lazy loading)
-    print("Chargement du modèle YOLO...")
-    yolo_model = get_model()
-    print("✓ Modèle YOLO chargé")
-
-    # Liste pour stocker toutes les détections
-    all_detections = []
-
-    frame_number = 0
-
-    # Configuration de ByteTrack pour le tracking des personnes
-    # persist=True: garde les track_ids stables DANS la vidéo
-    # TRACKER_CONFIG: fichier de configuration ByteTrack (défini dans .env)
-    track_generator = yolo_model.track(
-        source=video_path,
-        stream=True,
-        verbose=False,
-        persist=True,
-        tracker=TRACKER_CONFIG,
-        conf=CONFIDENCE_THRESHOLD
-    )
+    if not Path(request.video_path).exists():
+        print(f"ERREUR : Vidéo non trouvée à {request.video_path}")
+        raise HTTPException(status_code=404, detail=f"Vidéo non trouvée : {request.video_path}")
+
+    payload = {
+        "video_path": request.video_path,
+        "zone": request.zone.model_dump() if request.zone else None,
+        "zones": [polygon.model_dump() for polygon in request.zones] if request.zones else None,
+        "detections": [detection.model_dump() for detection in request.detections],
+    }
+
+    return submit_job("render", payload, request.video_path)
 
+
+def submit_job(kind: str, payload: dict, video_path: str):
+    """Place un job dans la file d'attente (503 + Retry-After si la file est pleine)"""
     try:
-        for result in track_generator:
-            frame = result.orig_img
-            if frame is None:
-                continue
-
-            annotated_frame = frame.copy()
-            frame_height, frame_width = annotated_frame.shape[:2]
-
-            # ========== MASQUE ROUGE SUR LES ZONES NON-SÉLECTIONNÉES ==========
-            mask = np.ones((frame_height, frame_width), dtype=np.uint8) * 255
-            mask[int(zone.y1):int(zone.y2), int(zone.x1):int(zone.x2)] = 0
-
-            red_overlay = np.zeros_like(annotated_frame)
-            red_overlay[:, :] = (0, 0, 255)  # Rouge en BGR
-            alpha = 0.4
-            mask_3channel = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
-            red_blend = cv2.addWeighted(annotated_frame, 1-alpha, red_overlay, alpha, 0)
-            annotated_frame = np.where(mask_3channel == 255, red_blend, annotated_frame)
-
-            cv2.rectangle(annotated_frame,
-                         (int(zone.x1), int(zone.y1)),
-                         (int(zone.x2), int(zone.y2)),
-                         (255, 255, 255), 3)
-
-            frame_boxes = []
-            boxes_obj = result.boxes
-            boxes = boxes_obj if boxes_obj is not None else []
-
-            for box in boxes:
-                class_id = int(box.cls[0])
-                if class_id != 0:
-                    continue
-
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                confidence = float(box.conf[0])
-                track_id = int(box.id[0]) if box.id is not None else None
-
-                # Filtrer les détections de faible confiance
-                if confidence < CONFIDENCE_THRESHOLD:
-                    continue
-
-                center_x = (x1 + x2) / 2
-                center_y = (y1 + y2) / 2
-
-                if is_point_in_zone(center_x, center_y, zone):
-                    frame_boxes.append({
-                        "x1": x1,
-                        "y1": y1,
-                        "x2": x2,
-                        "y2": y2,
-                        "confidence": confidence,
-                        "track_id": track_id
-                    })
-
-                    cv2.rectangle(annotated_frame,
-                                  (int(x1), int(y1)),
-                                  (int(x2), int(y2)),
-                                  (74, 222, 128), 3)
-
-                    # Afficher l'ID de tracking si disponible
-                    if track_id is not None:
-                        label = f"ID:{track_id} {confidence:.2f}"
-                    else:
-                        label = f"Person {confidence:.2f}"
-                    label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
-
-                    cv2.rectangle(annotated_frame,
-                                  (int(x1), int(y1) - label_size[1] - 10),
-                                  (int(x1) + label_size[0], int(y1)),
-                                  (74, 222, 128), -1)
-
-                    cv2.putText(annotated_frame, label,
-                                (int(x1), int(y1) - 5),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (11, 15, 31), 2)
-
-            out.write(annotated_frame)
-
-            if frame_boxes:
-                all_detections.append({
-                    "frame": frame_number,
-                    "boxes": frame_boxes
-                })
-
-            frame_number += 1
-
-            if frame_number % 30 == 0:
-                print(f"Progression : {frame_number}/{total_frames} frames analysés")
-
-    finally:
-        out.release()
-        print("✓ Ressources vidéo libérées")
-
-
-    if NEEDS_H264_TRANSCODE:
-        print("Transcodage H.264 via ffmpeg pour compatibilité navigateur...")
-        conversion_ok = transcode_to_h264(writer_output_path, annotated_video_path)
-
-        # Toujours nettoyer le fichier temporaire raw, que le transcodage réussisse ou non
-        try:
-            if writer_output_path.exists() and writer_output_path != annotated_video_path:
-                if conversion_ok:
-                    writer_output_path.unlink(missing_ok=True)
-                    print(f"✓ Fichier intermédiaire supprimé : {writer_output_path}")
-                else:
-                    print("ATTENTION : Transcodage H.264 échoué, utilisation du fichier MP4V (moins compatible)")
-                    writer_output_path.replace(annotated_video_path)
-                    print(f"✓ Fichier temporaire déplacé vers : {annotated_video_path}")
-        except Exception as cleanup_error:
-            print(f"ATTENTION : Impossible de gérer le fichier temporaire - {cleanup_error}")
-
-
-    print("\n" + "-"*80)
-    print("RÉSUMÉ DE L'ANALYSE")
-    print("-"*80)
-    print(f"Frames analysés : {frame_number}/{total_frames}")
-    print(f"Frames avec détections : {len(all_detections)}")
-
-    # Calculer le nombre total de personnes détectées
-    total_detections = sum(len(det["boxes"]) for det in all_detections)
-    print(f"Total de détections : {total_detections}")
-
-    # Vérifier que le fichier vidéo annoté a bien été créé
-    if annotated_video_path.exists():
-        file_size = annotated_video_path.stat().st_size
-        print(f"✓ Vidéo annotée créée : {annotated_video_path}")
-        print(f"  Taille : {file_size / (1024*1024):.2f} MB")
-    else:
-        print(f"⚠ ATTENTION : Vidéo annotée non trouvée à {annotated_video_path}")
-
-    print("="*80)
-    print("FIN DE L'ANALYSE")
-    print("="*80 + "\n")
-
-    # Réinitialiser le tracker ByteTrack pour la prochaine analyse
-    # On réinitialise complètement le predictor pour éviter les IndexError
-    # Ultralytics recrée automatiquement un nouveau predictor au prochain appel
-    if hasattr(yolo_model, 'predictor'):
-        yolo_model.predictor = None
-        print("✓ Tracker ByteTrack réinitialisé (predictor reset)")
-
-    response_data = {
-        "message": "Détection terminée avec succès",
-        "total_frames": frame_number,
-        "fps": fps,
-        "detections": all_detections,
-        "annotated_video_path": str(annotated_video_path)
+        job = job_manager.submit(kind, payload)
+    except QueueFullError as exc:
+        print(f"ATTENTION : Job refusé - {exc}")
+        return JSONResponse(
+            status_code=503,
+            content={"detail": str(exc)},
+            headers={"Retry-After": "10"},
+        )
+
+    position = job_manager.queue_position(job.job_id)
+    print(f"✓ Job {job.job_id} ({kind}) ajouté à la file (position {position}) : {video_path}")
+
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "queue_position": position,
     }
 
-    print(f"Envoi de la réponse avec {len(all_detections)} détections")
 
-    return response_data
+@app.post("/streams", response_model=JobSubmission, status_code=202)
+async def start_stream(request: StreamRequest):
+    """
+    Endpoint pour analyser un flux en direct (caméra RTSP, flux HTTP, webcam)
+
+    Le flux occupe un worker jusqu'à DELETE /streams/{job_id}, la fin de la source
+    ou max_duration. Les statistiques glissantes sont diffusées sur le WebSocket
+    /streams/{job_id}/ws (et dans le champ "live" de GET /jobs/{job_id}).
+
+    Args:
+        request: Source du flux, zone d'analyse et zones polygonales
+
+    Returns:
+        Identifiant du job et position dans la file d'attente
+    """
+    if not is_stream_source(request.source):
+        print(f"ERREUR : Source de flux non reconnue : {request.source}")
+        raise HTTPException(status_code=400, detail=f"Source de flux non reconnue : {request.source}")
+
+    payload = {
+        "source": request.source,
+        "zone": request.zone.model_dump() if request.zone else None,
+        "zones": [polygon.model_dump() for polygon in request.zones] if request.zones else None,
+        "batch_size": request.batch_size,
+        "window_seconds": request.window_seconds,
+        "max_duration": request.max_duration,
+    }
 
+    return submit_job("stream", payload, request.source)
 
-# ========== Fonctions utilitaires ==========
 
+def is_stream_source(source: str) -> bool:
+    """URL d'un protocole de diffusion, caméra locale ou fichier existant"""
+    return (urlparse(source).scheme.lower() in STREAM_URL_SCHEMES
+            or STREAM_DEVICE_PATTERN.match(source) is not None
+            or Path(source).is_file())
 
-def transcode_to_h264(source_path: Path, destination_path: Path) -> bool:
-    """Convertit une vidéo MP4V en H.264 via ffmpeg."""
-    ffmpeg_cmd = [
-        "ffmpeg",
-        "-y",
-        "-i", str(source_path),
-        "-c:v", "libx264",
-        "-preset", H264_PRESET,
-        "-crf", H264_CRF,
-        "-pix_fmt", "yuv420p",
-        "-movflags", "+faststart",
-        "-an",
-        str(destination_path)
-    ]
 
-    try:
-        result = subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True)
-        print("✓ Transcodage H.264 réussi via ffmpeg")
-        if result.stderr:
-            print(result.stderr)
-        return True
-    except FileNotFoundError:
-        print("ERREUR : ffmpeg est introuvable dans le conteneur")
-    except subprocess.CalledProcessError as exc:
-        print("ERREUR : ffmpeg a échoué à convertir la vidéo en H.264")
-        print(exc.stderr)
+@app.get("/streams")
+async def list_streams():
+    """
+    Endpoint pour lister les flux en direct en attente ou en cours
+
+    Returns:
+        Identifiant, statut, source et dernières statistiques de chaque flux
+    """
+    return {
+        "streams": [
+            {"job_id": job.job_id, "status": job.status, "source": job.payload["source"], "live": job.live}
+            for job in job_manager.streams()
+        ]
+    }
+
+
+@app.delete("/streams/{job_id}")
+async def stop_stream(job_id: str):
+    """
+    Endpoint pour arrêter un flux en direct
+
+    Le worker termine le lot en cours ; le bilan est ensuite disponible dans
+    GET /jobs/{job_id} (result) et envoyé sur le WebSocket avant sa fermeture.
+
+    Args:
+        job_id: Identifiant renvoyé par POST /streams
+
+    Returns:
+        Statut du job au moment de la demande
+    """
+    job = job_manager.get(job_id)
+    if job is None or job.kind != "stream":
+        raise HTTPException(status_code=404, detail="Flux non trouvé")
+    job_manager.stop(job_id)
+    print(f"✓ Arrêt du flux {job_id} demandé")
+    return {"job_id": job_id, "status": job.status, "message": "Arrêt demandé"}
 
-    return False
 
+@app.websocket("/streams/{job_id}/ws")
+async def stream_statistics(websocket: WebSocket, job_id: str):
+    """
+    WebSocket des statistiques glissantes d'un flux en direct
 
-def is_point_in_zone(x: float, y: float, zone: Zone) -> bool:
+    Messages JSON : {"type": "stats", ...StreamStats} à chaque publication, puis
+    {"type": "end", "status", "result", "error"} à la fin du flux (fermeture ensuite).
+    Code de fermeture 4404 si le flux est inconnu.
     """
-    Vérifie si un point (x, y) est dans la zone rectangulaire
+    await websocket.accept()
+    job = job_manager.get(job_id)
+    if job is None or job.kind != "stream":
+        await websocket.close(code=4404, reason="Flux non trouvé")
+        return
+
+    sequence = None
+    try:
+        while True:
+            # Lu avant les statistiques : les dernières publiées précèdent toujours la fin
+            finished = job.finished
+            live = job.live
+            if live is not None and live["sequence"] != sequence:
+                sequence = live["sequence"]
+                await websocket.send_json({"type": "stats", **live})
+            if finished:
+                await websocket.send_json({"type": "end", "status": job.status, "result": job.result,
+                                           "error": job.error})
+                break
+            await asyncio.sleep(STREAM_SOCKET_POLL_SECONDS)
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
+
+
+@app.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    """
+    Endpoint pour consulter l'état d'un job
 
     Args:
-        x: Coordonnée x du point
-        y: Coordonnée y du point
-        zone: Zone rectangulaire définie par (x1, y1, x2, y2)
+        job_id: Identifiant renvoyé par POST /detect
+
+    Returns:
+        Statut, progression, et résultat (détection ou rendu) une fois terminé
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job non trouvé")
+    return job.to_dict()
+
+
+@app.get("/queue", response_model=QueueStatus)
+async def get_queue():
+    """
+    Endpoint pour consulter la profondeur de la file et l'occupation des workers
 
     Returns:
-        True si le point est dans la zone, False sinon
+        Nombre de workers, jobs en attente / en cours et capacité de la file
     """
-    return zone.x1 <= x <= zone.x2 and zone.y1 <= y <= zone.y2
+    return job_manager.queue_status()
+
+
+@app.get("/config")
+async def get_detection_config():
+    """
+    Paramètres du service qui déterminent le résultat d'une détection
+
+    Utilisé par le backend pour construire la clé de son cache de résultats :
+    une même vidéo analysée avec d'autres valeurs doit être recalculée.
+
+    Returns:
+        Modèle, seuils et valeurs par défaut des options de /detect
+    """
+    return {
+        "model": YOLO_MODEL,
+        "inference_backend": INFERENCE_BACKEND,
+        "int8": INFERENCE_INT8,
+        "imgsz": INFERENCE_IMGSZ,
+        "confidence_threshold": CONFIDENCE_THRESHOLD,
+        "tracker_config": TRACKER_CONFIG,
+        "crop_to_zone": ZONE_CROP_ENABLED,
+        "zone_margin": ZONE_CROP_MARGIN,
+        "frame_stride": FRAME_STRIDE,
+        "analysis_fps": ANALYSIS_FPS,
+        "adaptive_stride": ADAPTIVE_STRIDE_ENABLED,
+        "adaptive_stride_max": ADAPTIVE_STRIDE_MAX,
+        "adaptive_busy_people": ADAPTIVE_BUSY_PEOPLE,
+        "motion_gate": MOTION_GATE_ENABLED,
+        "motion_pixel_threshold": MOTION_PIXEL_THRESHOLD,
+        "motion_min_area": MOTION_MIN_AREA,
+        "motion_downscale_width": MOTION_DOWNSCALE_WIDTH,
+        "motion_max_skipped": MOTION_MAX_SKIPPED,
+        "adaptive_imgsz": ADAPTIVE_IMGSZ_ENABLED,
+        "adaptive_imgsz_min": ADAPTIVE_IMGSZ_MIN,
+        "adaptive_imgsz_min_person_pixels": ADAPTIVE_IMGSZ_MIN_PERSON_PIXELS,
+        "adaptive_imgsz_probe_seconds": ADAPTIVE_IMGSZ_PROBE_SECONDS,
+        "adaptive_imgsz_recheck_seconds": ADAPTIVE_IMGSZ_RECHECK_SECONDS,
+        "decode_prefetch_frames": DECODE_PREFETCH_FRAMES,
+        "decode_backend": DECODE_BACKEND,
+        "decode_threads": DECODE_THREADS,
+        "decode_max_width": DECODE_MAX_WIDTH,
+    }
 
 
 @app.get("/health")
@@ -425,13 +365,47 @@ async def health_check():
     Endpoint de vérification de santé du service
 
     Returns:
-        État du service
+        État du service, des workers et durée de leur démarrage
     """
     return {
-        "status": "healthy",
-        "model_loaded": model is not None,
-        "model_name": "YOLOv8n"
+        "status": "healthy" if job_manager.is_live else "unhealthy",
+        "ready": job_manager.is_ready,
+        "model_loaded": job_manager.ready_workers > 0,
+        "model_name": "YOLOv8n",
+        "workers_ready": job_manager.ready_workers,
+        "workers": job_manager.num_workers,
+        "startup": job_manager.startup_status(),
+    }
+
+
+@app.get("/health/live")
+async def liveness_check():
+    """
+    Sonde de vivacité : le processus répond et suit ses workers
+
+    Ne dépend pas du chargement du modèle (un service qui préchauffe est vivant).
+    503 si le thread collecteur est arrêté : le service doit être redémarré.
+    """
+    if not job_manager.is_live:
+        return JSONResponse(status_code=503, content={"status": "unhealthy"})
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Sonde de disponibilité : au moins un worker a chargé et préchauffé son modèle
+
+    503 tant qu'aucun worker n'est prêt : l'orchestrateur n'envoie pas de trafic
+    à une instance dont la première détection paierait le chargement du modèle.
+    """
+    content = {
+        "status": "ready" if job_manager.is_ready else "starting",
+        "workers_ready": job_manager.ready_workers,
+        "workers": job_manager.num_workers,
+        "startup": job_manager.startup_status(),
     }
+    return JSONResponse(status_code=200 if job_manager.is_ready else 503, content=content)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,68 @@
+"""
+Filtre de mouvement placé devant l'inférence YOLO
+
+Chaque frame échantillonné est comparé, en niveaux de gris et en basse
+résolution, au dernier frame passé au modèle. Sans changement significatif, le
+modèle n'est pas appelé et les détections précédentes sont reconduites : une
+vidéo de surveillance immobile ne coûte plus que le décodage et une différence
+d'images de quelques milliers de pixels.
+"""
+
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from config import MOTION_DOWNSCALE_WIDTH, MOTION_MAX_SKIPPED, MOTION_MIN_AREA, MOTION_PIXEL_THRESHOLD
+from schemas import Zone
+
+
+class MotionGate:
+    """
+    Décide pour chaque frame si l'inférence est nécessaire
+
+    Le frame de référence n'est remplacé que lorsqu'un frame est passé au modèle :
+    un changement lent (personne qui s'avance pas à pas) finit donc par dépasser
+    le seuil. Au-delà de `max_skipped` frames consécutifs sans inférence, un frame
+    est tout de même détecté pour resynchroniser le tracker.
+    """
+
+    def __init__(self, region: Optional[Zone] = None, pixel_threshold: int = MOTION_PIXEL_THRESHOLD,
+                 min_area: float = MOTION_MIN_AREA, downscale_width: int = MOTION_DOWNSCALE_WIDTH,
+                 max_skipped: int = MOTION_MAX_SKIPPED):
+        self.region = region
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.downscale_width = downscale_width
+        self.max_skipped = max_skipped
+        self.skipped_frames = 0
+        self._reference: Optional[np.ndarray] = None
+        self._consecutive = 0
+
+    def needs_inference(self, frame: np.ndarray) -> bool:
+        """True si le frame diffère assez du dernier frame détecté (qui devient alors la référence)"""
+        small = self._prepare(frame)
+
+        if self._reference is not None and self._consecutive < self.max_skipped:
+            diff = cv2.absdiff(small, self._reference)
+            changed = np.count_nonzero(diff > self.pixel_threshold)
+            if changed < self.min_area * diff.size:
+                self._consecutive += 1
+                self.skipped_frames += 1
+                return False
+
+        self._reference = small
+        self._consecutive = 0
+        return True
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        """Région surveillée en niveaux de gris, réduite et lissée (bruit de compression)"""
+        if self.region is not None:
+            frame = frame[int(self.region.y1):int(self.region.y2), int(self.region.x1):int(self.region.x2)]
+
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.downscale_width / max(1, width))
+        small = cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
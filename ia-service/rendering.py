@@ -0,0 +1,399 @@
+"""
+Rendu des vidéos annotées VisionTrack
+
+La géométrie de la zone et le calque rouge sont calculés une seule fois par
+vidéo : chaque frame n'est ensuite modifié qu'en place, sur les bandes situées
+hors de la zone, sans allocation de tableau plein cadre. Les zones polygonales
+sont rastérisées une fois en masque : le choix des boxes à dessiner est une
+lecture vectorisée du masque, sans test point-dans-polygone par box. En H.264, les frames
+annotés sont encodés en flux par ffmpeg, sans fichier intermédiaire.
+"""
+
+import queue
+import shutil
+import subprocess
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import (
+    ANNOTATED_DIR,
+    ENCODER_QUEUE_SIZE,
+    H264_CRF,
+    H264_PRESET,
+    HLS_PACKAGING_ENABLED,
+    HLS_SEGMENT_SECONDS,
+    NEEDS_H264_TRANSCODE,
+    VIDEO_WRITER_CODEC,
+)
+from schemas import PolygonZone, Zone
+
+# Opacité du calque rouge appliqué hors de la zone d'analyse
+OVERLAY_ALPHA = 0.4
+OVERLAY_COLOR = (0, 0, 255)  # Rouge en BGR
+ZONE_BORDER_COLOR = (255, 255, 255)
+POLYGON_ZONE_COLOR = (250, 165, 96)  # Bleu clair en BGR
+BOX_COLOR = (74, 222, 128)
+LABEL_TEXT_COLOR = (11, 15, 31)
+
+# Bande rectangulaire du frame : (y1, y2, x1, x2)
+Strip = Tuple[int, int, int, int]
+
+
+def outside_strips(zone: Zone, width: int, height: int) -> List[Strip]:
+    """
+    Découpe la surface hors zone en au plus quatre bandes disjointes
+
+    Haut et bas sur toute la largeur, gauche et droite à hauteur de la zone.
+    Une zone vide (ou hors du frame) laisse le frame entier hors zone.
+    """
+    x1 = min(max(int(zone.x1), 0), width)
+    y1 = min(max(int(zone.y1), 0), height)
+    x2 = min(max(int(zone.x2), 0), width)
+    y2 = min(max(int(zone.y2), 0), height)
+
+    if x2 <= x1 or y2 <= y1:
+        return [(0, height, 0, width)]
+
+    strips = [
+        (0, y1, 0, width),       # haut
+        (y2, height, 0, width),  # bas
+        (y1, y2, 0, x1),         # gauche
+        (y1, y2, x2, width),     # droite
+    ]
+    return [strip for strip in strips if strip[1] > strip[0] and strip[3] > strip[2]]
+
+
+class ZoneRenderer:
+    """
+    Annotation des frames d'une vidéo (zone d'analyse + personnes détectées)
+
+    Les bandes hors zone et leurs calques de couleur sont préparés à la
+    construction ; render() ne fait ensuite que des opérations en place.
+    Avec des zones polygonales, seules les personnes situées dans la zone
+    rectangulaire et dans au moins un polygone sont dessinées.
+    """
+
+    def __init__(self, width: int, height: int, zone: Zone, alpha: float = OVERLAY_ALPHA,
+                 polygons: Optional[List[PolygonZone]] = None):
+        self.width = width
+        self.height = height
+        self.zone = zone
+        self.alpha = alpha
+        self.strips = outside_strips(zone, width, height)
+        # Un calque par bande, réutilisé pour tous les frames
+        self.overlays = [
+            np.full((y2 - y1, x2 - x1, 3), OVERLAY_COLOR, dtype=np.uint8)
+            for y1, y2, x1, x2 in self.strips
+        ]
+        self.zone_corners = ((int(zone.x1), int(zone.y1)), (int(zone.x2), int(zone.y2)))
+
+        # Contours des polygones et masque de leur union (1 = pixel dans une zone)
+        self.polygons = [
+            (polygon.name, np.round(np.array(polygon.points)).astype(np.int32))
+            for polygon in polygons or []
+        ]
+        self.polygon_mask = None
+        if self.polygons:
+            self.polygon_mask = np.zeros((height, width), dtype=np.uint8)
+            cv2.fillPoly(self.polygon_mask, [points for _, points in self.polygons], 1)
+
+    def draw_zone(self, frame: np.ndarray) -> None:
+        """Assombrit en rouge l'extérieur de la zone et trace son contour et ceux des polygones (en place)"""
+        for (y1, y2, x1, x2), overlay in zip(self.strips, self.overlays):
+            region = frame[y1:y2, x1:x2]
+            cv2.addWeighted(region, 1 - self.alpha, overlay, self.alpha, 0, dst=region)
+
+        cv2.rectangle(frame, self.zone_corners[0], self.zone_corners[1], ZONE_BORDER_COLOR, 3)
+
+        for name, points in self.polygons:
+            cv2.polylines(frame, [points], True, POLYGON_ZONE_COLOR, 2)
+            x, y = points[:, 0].min(), points[:, 1].min()
+            cv2.putText(frame, name, (int(x) + 4, int(y) + 18), cv2.FONT_HERSHEY_SIMPLEX, 0.6, POLYGON_ZONE_COLOR, 2)
+
+    def select_boxes(self, boxes: List[Dict]) -> List[Dict]:
+        """
+        Boxes dont le centre est dans la zone (et dans un polygone s'il y en a)
+
+        Test vectorisé sur toutes les boxes du frame : comparaison aux bornes de la
+        zone, puis lecture du masque des polygones au pixel du centre.
+        """
+        if not boxes:
+            return boxes
+
+        corners = np.array([(box["x1"], box["y1"], box["x2"], box["y2"]) for box in boxes], dtype=np.float64)
+        center_x = (corners[:, 0] + corners[:, 2]) / 2
+        center_y = (corners[:, 1] + corners[:, 3]) / 2
+        inside = ((center_x >= self.zone.x1) & (center_x <= self.zone.x2)
+                  & (center_y >= self.zone.y1) & (center_y <= self.zone.y2))
+
+        if self.polygon_mask is not None:
+            column = np.floor(center_x).astype(np.int64)
+            row = np.floor(center_y).astype(np.int64)
+            in_frame = (column >= 0) & (column < self.width) & (row >= 0) & (row < self.height)
+            inside &= in_frame
+            inside[in_frame] &= self.polygon_mask[row[in_frame], column[in_frame]].astype(bool)
+
+        return [box for box, keep in zip(boxes, inside.tolist()) if keep]
+
+    @staticmethod
+    def draw_boxes(frame: np.ndarray, boxes: List[Dict]) -> None:
+        """Trace les bounding boxes et leur étiquette (track_id + confiance)"""
+        for box in boxes:
+            x1, y1 = int(box["x1"]), int(box["y1"])
+            x2, y2 = int(box["x2"]), int(box["y2"])
+            confidence = box["confidence"]
+            track_id = box.get("track_id")
+
+            cv2.rectangle(frame, (x1, y1), (x2, y2), BOX_COLOR, 3)
+
+            # Afficher l'ID de tracking si disponible
+            if track_id is not None:
+                label = f"ID:{track_id} {confidence:.2f}"
+            else:
+                label = f"Person {confidence:.2f}"
+            label_size, _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)
+
+            cv2.rectangle(frame, (x1, y1 - label_size[1] - 10), (x1 + label_size[0], y1), BOX_COLOR, -1)
+            cv2.putText(frame, label, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, LABEL_TEXT_COLOR, 2)
+
+    def render(self, frame: np.ndarray, boxes: List[Dict]) -> np.ndarray:
+        """Annote un frame BGR en place et le renvoie"""
+        self.draw_zone(frame)
+        self.draw_boxes(frame, boxes)
+        return frame
+
+
+def annotated_video_path_for(video_path: str, part: Optional[int] = None) -> Path:
+    """
+    Chemin de la vidéo annotée d'une vidéo source (répertoire créé si besoin)
+
+    Avec `part`, chemin du segment correspondant d'une détection découpée.
+    """
+    annotated_dir = Path(ANNOTATED_DIR)
+    annotated_dir.mkdir(parents=True, exist_ok=True)
+    print(f"✓ Répertoire annotated créé/vérifié : {annotated_dir}")
+    suffix = "" if part is None else f"_part{part:03d}"
+    return annotated_dir / f"{Path(video_path).stem}_annotated{suffix}.mp4"
+
+
+def open_video_writer(video_path: str, fps: float, width: int, height: int, part: Optional[int] = None):
+    """
+    Ouvre l'encodeur de la vidéo annotée
+
+    H.264 : frames envoyés directement à ffmpeg (FfmpegPipeWriter), sans fichier
+    intermédiaire. Autres codecs, ou ffmpeg absent : VideoWriter OpenCV.
+    """
+    annotated_video_path = annotated_video_path_for(video_path, part)
+    print(f"Chemin de sortie pour vidéo annotée : {annotated_video_path}")
+
+    if NEEDS_H264_TRANSCODE:
+        if shutil.which("ffmpeg"):
+            return FfmpegPipeWriter(annotated_video_path, fps, width, height)
+        print("ATTENTION : ffmpeg est introuvable dans le conteneur, écriture MP4V via OpenCV (moins compatible)")
+
+    return OpenCVVideoWriter(annotated_video_path, fps, width, height)
+
+
+class OpenCVVideoWriter:
+    """Écriture de la vidéo annotée avec le VideoWriter OpenCV (codec VIDEO_WRITER_CODEC)"""
+
+    def __init__(self, annotated_video_path: Path, fps: float, width: int, height: int):
+        self.annotated_video_path = annotated_video_path
+        print(f"Codec utilisé par OpenCV : {VIDEO_WRITER_CODEC}")
+        fourcc = cv2.VideoWriter_fourcc(*VIDEO_WRITER_CODEC)
+        self.writer = cv2.VideoWriter(str(annotated_video_path), fourcc, fps, (width, height))
+
+    def is_opened(self) -> bool:
+        return self.writer.isOpened()
+
+    def write(self, frame: np.ndarray) -> None:
+        self.writer.write(frame)
+
+    def release(self) -> None:
+        self.writer.release()
+
+    def finalize(self) -> Optional[Path]:
+        """Chemin de la vidéo annotée, ou None si elle n'a pas été créée"""
+        return report_annotated_video(self.annotated_video_path)
+
+
+class FfmpegPipeWriter:
+    """
+    Encodage H.264 en flux : les frames BGR bruts sont envoyés sur l'entrée
+    standard d'un processus ffmpeg lancé pour toute la vidéo
+
+    write() copie le frame dans un tampon du pool de l'encodeur puis rend la main :
+    un thread dédié pousse les tampons vers ffmpeg, l'encodage se fait donc en
+    parallèle de l'inférence. Le pool est borné (ENCODER_QUEUE_SIZE) : si ffmpeg
+    prend du retard, write() attend qu'un tampon se libère.
+    """
+
+    def __init__(self, annotated_video_path: Path, fps: float, width: int, height: int,
+                 queue_size: int = ENCODER_QUEUE_SIZE):
+        self.annotated_video_path = annotated_video_path
+        self.error: Optional[str] = None
+        self._stderr_tail: deque = deque(maxlen=20)
+
+        ffmpeg_cmd = [
+            "ffmpeg",
+            "-y",
+            "-loglevel", "error",
+            "-f", "rawvideo",
+            "-pix_fmt", "bgr24",
+            "-s", f"{width}x{height}",
+            "-r", f"{fps or 30}",
+            "-i", "-",
+            "-c:v", "libx264",
+            "-preset", H264_PRESET,
+            "-crf", H264_CRF,
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            "-an",
+            str(annotated_video_path)
+        ]
+        if HLS_PACKAGING_ENABLED:
+            # Images clés régulières : le découpage HLS en copie de flux coupe à chaque segment
+            ffmpeg_cmd[-1:-1] = ["-force_key_frames", f"expr:gte(t,n_forced*{HLS_SEGMENT_SECONDS})"]
+        print(f"Encodage H.264 en flux via ffmpeg (file de {queue_size} frames)")
+        self.process = subprocess.Popen(ffmpeg_cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        # Tampons propres à l'encodeur : l'appelant peut réutiliser ses frames dès le retour de write()
+        self._free: queue.Queue = queue.Queue()
+        for _ in range(queue_size):
+            self._free.put(np.empty((height, width, 3), dtype=np.uint8))
+        self._pending: queue.Queue = queue.Queue()
+
+        self._writer_thread = threading.Thread(target=self._feed_ffmpeg, name="ffmpeg-writer", daemon=True)
+        self._stderr_thread = threading.Thread(target=self._drain_stderr, name="ffmpeg-stderr", daemon=True)
+        self._writer_thread.start()
+        self._stderr_thread.start()
+        self._released = False
+
+    def is_opened(self) -> bool:
+        return self.process.poll() is None
+
+    def write(self, frame: np.ndarray) -> None:
+        buffer = self._free.get()
+        np.copyto(buffer, frame)
+        self._pending.put(buffer)
+
+    def release(self) -> None:
+        """Termine le flux : attend l'envoi des frames en file puis la fin de ffmpeg"""
+        if self._released:
+            return
+        self._released = True
+        self._pending.put(None)
+        self._writer_thread.join()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        return_code = self.process.wait()
+        self._stderr_thread.join()
+
+        if return_code != 0 and self.error is None:
+            self.error = f"ffmpeg a terminé avec le code {return_code}"
+
+    def finalize(self) -> Optional[Path]:
+        """Chemin de la vidéo annotée, ou None si l'encodage a échoué"""
+        self.release()
+        if self.error:
+            print(f"ERREUR : ffmpeg a échoué à encoder la vidéo en H.264 - {self.error}")
+            if self._stderr_tail:
+                print("\n".join(self._stderr_tail))
+            self.annotated_video_path.unlink(missing_ok=True)
+            return None
+
+        print("✓ Encodage H.264 réussi via ffmpeg")
+        return report_annotated_video(self.annotated_video_path)
+
+    def _feed_ffmpeg(self) -> None:
+        """Thread d'écriture : vide la file vers l'entrée standard de ffmpeg"""
+        while True:
+            buffer = self._pending.get()
+            if buffer is None:
+                return
+            if self.error is None:
+                try:
+                    self.process.stdin.write(buffer.data)
+                except (BrokenPipeError, OSError) as exc:
+                    # ffmpeg arrêté : on continue de libérer les tampons pour ne pas bloquer write()
+                    self.error = f"flux interrompu ({exc})"
+            self._free.put(buffer)
+
+    def _drain_stderr(self) -> None:
+        """Conserve les dernières lignes d'erreur de ffmpeg (évite un tube plein)"""
+        for line in self.process.stderr:
+            self._stderr_tail.append(line.decode(errors="replace").rstrip())
+
+
+def hls_dir_for(annotated_video_path: Path) -> Path:
+    """Répertoire HLS d'une vidéo annotée (playlist index.m3u8 + segments .ts)"""
+    return annotated_video_path.with_name(f"{annotated_video_path.stem}_hls")
+
+
+def package_hls(annotated_video_path: Optional[Path]) -> Optional[Path]:
+    """
+    Découpe la vidéo annotée en segments HLS (HLS_PACKAGING_ENABLED), sans réencodage
+
+    ffmpeg copie les flux H.264 dans des segments MPEG-TS d'environ
+    HLS_SEGMENT_SECONDS secondes (playlist VOD) : quelques dixièmes de seconde
+    même pour une longue vidéo. Un échec n'affecte pas la vidéo MP4.
+
+    Returns:
+        Chemin de la playlist, ou None (désactivé, vidéo absente ou échec)
+    """
+    if not HLS_PACKAGING_ENABLED or annotated_video_path is None:
+        return None
+    if not NEEDS_H264_TRANSCODE:
+        print("ATTENTION : Découpage HLS ignoré, la vidéo annotée n'est pas en H.264 (VIDEO_CODEC)")
+        return None
+
+    hls_dir = hls_dir_for(annotated_video_path)
+    work_dir = hls_dir.with_name(f".{hls_dir.name}.tmp")
+    shutil.rmtree(work_dir, ignore_errors=True)
+    work_dir.mkdir(parents=True)
+    ffmpeg_cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-i", str(annotated_video_path),
+        "-c", "copy",
+        "-f", "hls",
+        "-hls_time", str(HLS_SEGMENT_SECONDS),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_filename", str(work_dir / "segment_%05d.ts"),
+        str(work_dir / "index.m3u8")
+    ]
+    try:
+        subprocess.run(ffmpeg_cmd, capture_output=True, text=True, check=True)
+        shutil.rmtree(hls_dir, ignore_errors=True)
+        work_dir.rename(hls_dir)
+    except FileNotFoundError:
+        print("ERREUR : ffmpeg est introuvable dans le conteneur, pas de découpage HLS")
+        return None
+    except subprocess.CalledProcessError as exc:
+        print("ERREUR : ffmpeg a échoué à découper la vidéo annotée en HLS")
+        print(exc.stderr)
+        return None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    segments = len(list(hls_dir.glob("*.ts")))
+    print(f"✓ Vidéo annotée découpée en HLS : {segments} segments de ~{HLS_SEGMENT_SECONDS} s ({hls_dir})")
+    return hls_dir / "index.m3u8"
+
+
+def report_annotated_video(annotated_video_path: Path) -> Optional[Path]:
+    """Vérifie que le fichier vidéo annoté a bien été créé"""
+    if annotated_video_path.exists():
+        file_size = annotated_video_path.stat().st_size
+        print(f"✓ Vidéo annotée créée : {annotated_video_path}")
+        print(f"  Taille : {file_size / (1024*1024):.2f} MB")
+        return annotated_video_path
+
+    print(f"⚠ ATTENTION : Vidéo annotée non trouvée à {annotated_video_path}")
+    return None
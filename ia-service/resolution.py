@@ -0,0 +1,95 @@
+"""
+Taille d'entrée adaptative du modèle YOLO
+
+Pendant les premières secondes, les frames sont détectés à la taille de base
+pour mesurer la hauteur des personnes. La plus petite taille d'entrée qui garde
+aux plus petites d'entre elles assez de pixels pour être détectées est ensuite
+utilisée ; la mesure est refaite régulièrement à la taille de base, la scène
+pouvant changer (personnes plus éloignées, foule).
+"""
+
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    ADAPTIVE_IMGSZ_MIN,
+    ADAPTIVE_IMGSZ_MIN_PERSON_PIXELS,
+    ADAPTIVE_IMGSZ_PROBE_SECONDS,
+    ADAPTIVE_IMGSZ_RECHECK_SECONDS,
+    CONFIDENCE_THRESHOLD,
+)
+
+# Centile des hauteurs retenu : les plus petites personnes décident de la taille
+SMALL_PERSON_PERCENTILE = 10
+
+
+class InputSizeSelector:
+    """
+    Choix de la taille d'entrée du modèle, réévalué entre deux lots d'inférence
+
+    Les frames d'une mesure sont détectés à `base_imgsz` ; à la fin de la mesure,
+    la taille retenue est le plus petit multiple de 32 (au moins `min_imgsz`) où la
+    hauteur du 10e centile des personnes atteint `min_person_pixels` dans l'image
+    passée au modèle. Sans personne pendant la mesure, la taille de base est gardée.
+    """
+
+    def __init__(self, base_imgsz: int, longest_side: float, fps: float, start_frame: int,
+                 min_imgsz: int = ADAPTIVE_IMGSZ_MIN,
+                 min_person_pixels: int = ADAPTIVE_IMGSZ_MIN_PERSON_PIXELS,
+                 probe_seconds: float = ADAPTIVE_IMGSZ_PROBE_SECONDS,
+                 recheck_seconds: float = ADAPTIVE_IMGSZ_RECHECK_SECONDS):
+        self.base_imgsz = base_imgsz
+        self.min_imgsz = min(base_imgsz, max(32, min_imgsz))
+        self.min_person_pixels = min_person_pixels
+        # Côté le plus long de l'image passée au modèle (frame entier ou région), en pixels source
+        self.longest_side = max(1.0, longest_side)
+        self.probe_frames = max(1, round(probe_seconds * (fps or 30)))
+        self.recheck_frames = max(self.probe_frames, round(recheck_seconds * (fps or 30)))
+
+        self.imgsz = base_imgsz
+        self.changes: List[Dict] = []
+        self._heights: List[float] = []
+        self._probe_end: Optional[int] = start_frame + self.probe_frames
+        self._next_probe = start_frame + self.recheck_frames
+
+    def update(self, tracks: np.ndarray, imgsz: int) -> None:
+        """Mémorise la hauteur des personnes d'un frame détecté (pendant une mesure uniquement)"""
+        if self._probe_end is None or imgsz != self.base_imgsz:
+            return
+        people = tracks[(tracks[:, 5] == 0) & (tracks[:, 4] >= CONFIDENCE_THRESHOLD)]
+        self._heights.extend((people[:, 3] - people[:, 1]).tolist())
+
+    def next_imgsz(self, frame_number: int) -> int:
+        """Taille d'entrée du prochain lot, dont la lecture reprend au frame `frame_number`"""
+        if self._probe_end is not None and frame_number >= self._probe_end:
+            self._probe_end = None
+            self._next_probe = frame_number + self.recheck_frames
+            self._select(frame_number)
+        elif self._probe_end is None and frame_number >= self._next_probe:
+            # Nouvelle mesure à la taille de base
+            self._probe_end = frame_number + self.probe_frames
+            self._heights = []
+            return self.base_imgsz
+        return self.base_imgsz if self._probe_end is not None else self.imgsz
+
+    def _select(self, frame_number: int) -> None:
+        """Plus petite taille gardant les petites personnes détectables"""
+        person_height = None
+        imgsz = self.base_imgsz
+        if self._heights:
+            person_height = float(np.percentile(self._heights, SMALL_PERSON_PERCENTILE))
+            needed = self.min_person_pixels * self.longest_side / max(1.0, person_height)
+            imgsz = min(self.base_imgsz, max(self.min_imgsz, int(math.ceil(needed / 32)) * 32))
+
+        if imgsz != self.imgsz or not self.changes:
+            self.changes.append({
+                "frame": frame_number,
+                "imgsz": imgsz,
+                "person_height": round(person_height, 1) if person_height is not None else None,
+            })
+            print(f"✓ Taille d'entrée {imgsz} à partir du frame {frame_number} "
+                  + (f"(personnes de {person_height:.0f} px au {SMALL_PERSON_PERCENTILE}e centile)"
+                     if person_height is not None else "(aucune personne mesurée)"))
+        self.imgsz = imgsz
@@ -0,0 +1,106 @@
+"""
+Clips d'exemple du service IA VisionTrack
+
+Générés à partir des images fournies avec Ultralytics (bus.jpg, zidane.jpg) :
+utilisés par les benchmarks et pour calibrer les modèles quantifiés INT8.
+Un clip peut aussi être diffusé par ffmpeg comme une caméra (serve_stream) pour
+essayer l'analyse en direct sans caméra.
+"""
+
+import subprocess
+from pathlib import Path
+from typing import List
+
+import cv2
+import numpy as np
+
+SAMPLE_CLIP_PATH = Path("/tmp/visiontrack_sample.mp4")
+IDLE_CLIP_PATH = Path("/tmp/visiontrack_idle.mp4")
+DISTANT_CLIP_PATH = Path("/tmp/visiontrack_distant.mp4")
+
+
+def make_sample_clip(path: Path = SAMPLE_CLIP_PATH, frames: int = 150, fps: int = 30) -> Path:
+    """Génère (une seule fois) un clip 1280x720 en panoramique sur les images d'exemple Ultralytics"""
+    if path.exists():
+        return path
+
+    from ultralytics.utils import ASSETS
+
+    width, height = 1280, 720
+    scene = np.hstack([
+        cv2.resize(cv2.imread(str(ASSETS / "bus.jpg")), (width, height)),
+        cv2.resize(cv2.imread(str(ASSETS / "zidane.jpg")), (width, height)),
+    ])
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    for i in range(frames):
+        offset = int(i * (scene.shape[1] - width) / max(1, frames - 1))
+        writer.write(np.ascontiguousarray(scene[:, offset:offset + width]))
+    writer.release()
+    print(f"✓ Clip d'exemple généré : {path}")
+    return path
+
+
+def make_idle_clip(path: Path = IDLE_CLIP_PATH, frames: int = 300, moving_ratio: float = 0.2) -> Path:
+    """Génère (une seule fois) un clip de surveillance : court panoramique puis plan fixe"""
+    if path.exists():
+        return path
+
+    moving = read_frames(str(make_sample_clip()), max(1, int(frames * moving_ratio)))
+    height, width = moving[0].shape[:2]
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30, (width, height))
+    for i in range(frames):
+        writer.write(moving[min(i, len(moving) - 1)])
+    writer.release()
+    print(f"✓ Clip d'exemple généré : {path}")
+    return path
+
+
+def make_distant_clip(path: Path = DISTANT_CLIP_PATH, tiles: int = 3) -> Path:
+    """Génère (une seule fois) le clip d'exemple en mosaïque tiles x tiles : des personnes plus petites"""
+    if path.exists():
+        return path
+
+    frames = read_frames(str(make_sample_clip()), 150)
+    height, width = frames[0].shape[:2]
+    tile_size = (width // tiles, height // tiles)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), 30, (tile_size[0] * tiles, tile_size[1] * tiles))
+    for i, frame in enumerate(frames):
+        # Chaque vignette décalée dans le temps pour varier la scène
+        tile_frames = [cv2.resize(frames[(i + 17 * k) % len(frames)], tile_size, interpolation=cv2.INTER_AREA)
+                       for k in range(tiles * tiles)]
+        rows = [np.hstack(tile_frames[row * tiles:(row + 1) * tiles]) for row in range(tiles)]
+        writer.write(np.vstack(rows))
+    writer.release()
+    print(f"✓ Clip d'exemple généré : {path}")
+    return path
+
+
+def read_frames(video_path: str, max_frames: int) -> List[np.ndarray]:
+    """Décode les `max_frames` premiers frames d'une vidéo en mémoire"""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def serve_stream(video_path: str, port: int = 9000) -> subprocess.Popen:
+    """
+    Diffuse un clip en boucle, à sa cadence nominale, comme une caméra réseau
+
+    ffmpeg encode en H.264 (réglages faible latence des caméras) dans un flux
+    MPEG-TS servi sur tcp://127.0.0.1:{port} ; le premier client qui se connecte
+    le reçoit. Arrêter avec process.terminate().
+    """
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "fatal",
+        "-re", "-stream_loop", "-1", "-i", video_path, "-an",
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "zerolatency", "-pix_fmt", "yuv420p",
+        "-f", "mpegts", f"tcp://127.0.0.1:{port}?listen=1",
+    ]
+    print(f"✓ Flux de substitution : {video_path} -> tcp://127.0.0.1:{port}")
+    return subprocess.Popen(command, stdin=subprocess.DEVNULL)
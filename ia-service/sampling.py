@@ -0,0 +1,107 @@
+"""
+Échantillonnage des frames pour le comptage de personnes VisionTrack
+
+Le modèle n'est appelé que sur un frame sur `stride` ; les frames intermédiaires
+reçoivent les boxes des tracks présents aux deux extrémités, interpolées
+linéairement. En mode adaptatif, le pas diminue dès que la scène s'anime
+(nouvelles personnes, foule) et augmente quand elle est calme ou vide.
+"""
+
+from typing import Optional, Set
+
+import numpy as np
+
+from config import ADAPTIVE_BUSY_PEOPLE, ADAPTIVE_STRIDE_MAX, ANALYSIS_FPS, FRAME_STRIDE
+from tracking import NO_TRACK_ID, empty_detections
+
+
+def resolve_stride(fps: float, frame_stride: Optional[int] = None, analysis_fps: Optional[float] = None) -> int:
+    """
+    Pas d'échantillonnage de base (1 = tous les frames)
+
+    analysis_fps (cadence d'analyse visée) est prioritaire sur frame_stride ;
+    sans l'un ni l'autre, ANALYSIS_FPS puis FRAME_STRIDE du service s'appliquent.
+    """
+    if analysis_fps is None and frame_stride is None:
+        analysis_fps = ANALYSIS_FPS or None
+        frame_stride = FRAME_STRIDE
+
+    if analysis_fps:
+        return max(1, int(round((fps or 30) / analysis_fps)))
+    return max(1, frame_stride or 1)
+
+
+class FrameSampler:
+    """
+    Choix des frames passés au modèle
+
+    Le pas adaptatif varie entre `stride` et `max_stride` ; il est réévalué à
+    chaque lot d'inférence (les frames d'un lot sont choisis avant sa détection).
+    """
+
+    def __init__(self, start_frame: int, stride: int = 1, adaptive: bool = False,
+                 max_stride: int = ADAPTIVE_STRIDE_MAX, busy_people: int = ADAPTIVE_BUSY_PEOPLE):
+        self.base_stride = stride
+        self.max_stride = max(stride, max_stride) if adaptive else stride
+        self.busy_people = busy_people
+        self.stride = stride
+        self.next_frame = start_frame
+        self._track_ids: Set[int] = set()
+
+    def is_sampled(self, frame_number: int) -> bool:
+        """True si le frame doit être détecté (avance alors au prochain frame échantillonné)"""
+        if frame_number < self.next_frame:
+            return False
+        self.next_frame = frame_number + self.stride
+        return True
+
+    def update(self, tracks: np.ndarray) -> None:
+        """
+        Ajuste le pas d'après les tracks d'un frame détecté (mode adaptatif)
+
+        - scène animée (personnes apparues ou disparues, ou au moins `busy_people`) : pas de base
+        - scène vide : pas doublé
+        - scène stable : pas augmenté d'un frame
+        """
+        if self.max_stride == self.base_stride:
+            return
+
+        track_ids = {int(track_id) for track_id in tracks[:, 6] if track_id != NO_TRACK_ID}
+        if len(tracks) >= self.busy_people or track_ids != self._track_ids:
+            stride = self.base_stride
+        elif len(tracks) == 0:
+            stride = self.stride * 2
+        else:
+            stride = self.stride + 1
+        self._track_ids = track_ids
+
+        # Le prochain frame déjà choisi est conservé, le nouveau pas s'applique ensuite
+        self.stride = min(stride, self.max_stride)
+
+
+def interpolate_tracks(previous: np.ndarray, current: np.ndarray, ratio: float) -> np.ndarray:
+    """
+    Boxes d'un frame intermédiaire entre deux frames détectés
+
+    Seuls les tracks présents aux deux extrémités (même track_id) sont interpolés ;
+    les détections sans track_id ne sont pas propagées.
+
+    Args:
+        previous: Tracks (N, 7) du frame détecté précédent
+        current: Tracks (M, 7) du frame détecté suivant
+        ratio: Position du frame intermédiaire entre les deux (0 < ratio < 1)
+    """
+    if len(previous) == 0 or len(current) == 0:
+        return empty_detections()
+
+    previous_rows = {int(row[6]): row for row in previous if row[6] != NO_TRACK_ID}
+    rows = []
+    for row in current:
+        start = previous_rows.get(int(row[6])) if row[6] != NO_TRACK_ID else None
+        if start is None:
+            continue
+        interpolated = row.copy()
+        interpolated[:5] = start[:5] + (row[:5] - start[:5]) * ratio
+        rows.append(interpolated)
+
+    return np.array(rows, dtype=np.float32) if rows else empty_detections()
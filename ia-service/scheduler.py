@@ -0,0 +1,158 @@
+"""
+Ordonnanceur multi-vidéos VisionTrack
+Un worker détecte plusieurs vidéos à la fois avec un seul modèle : les frames
+de chaque vidéo sont regroupés dans des lots d'inférence partagés, servis à tour
+de rôle, et chaque vidéo garde son propre tracker ByteTrack (DetectionSession),
+sans échange de track_ids entre vidéos.
+"""
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import SCHEDULER_BATCH_SIZE
+from detection import DetectionSession, predict_batch
+from errors import DetectionError
+
+# Vidéo terminée : (clé, résultat ou None, erreur ou None)
+Outcome = Tuple[Any, Optional[Dict], Optional[Exception]]
+
+
+class ScheduledVideo:
+    """Session de détection suivie par l'ordonnanceur, avec ses statistiques de partage"""
+
+    def __init__(self, key: Any, session: DetectionSession):
+        self.key = key
+        self.session = session
+        self.admitted_at = time.perf_counter()
+        # Lots partagés auxquels la vidéo a participé et nombre de vidéos dans chacun
+        self.batches = 0
+        self.batch_videos = 0
+        self.max_videos = 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiques d'ordonnancement (compatibles avec SchedulerStats)"""
+        latencies = np.array(self.session.latencies) * 1000
+        return {
+            "shared_batches": self.batches,
+            "mean_batch_videos": round(self.batch_videos / self.batches, 2) if self.batches else 0.0,
+            "max_concurrent_videos": self.max_videos,
+            "latency_ms_mean": round(float(latencies.mean()), 1) if latencies.size else 0.0,
+            "latency_ms_p95": round(float(np.percentile(latencies, 95)), 1) if latencies.size else 0.0,
+            "latency_ms_max": round(float(latencies.max()), 1) if latencies.size else 0.0,
+            "duration_seconds": round(time.perf_counter() - self.admitted_at, 3),
+        }
+
+
+class SharedBatchScheduler:
+    """
+    Lots d'inférence partagés entre les vidéos d'un worker
+
+    À chaque lot, chaque vidéo fournit au plus batch_size / N frames échantillonnés
+    (N vidéos en cours, au moins un frame) : une vidéo longue ne retarde pas les
+    autres. Les vidéos servies tournent d'un lot à l'autre ; seules celles qui ont
+    la même taille d'entrée que la première (recadrage sur zone) partagent un lot,
+    les autres passent au lot suivant.
+    """
+
+    def __init__(self, yolo_model, batch_size: int = SCHEDULER_BATCH_SIZE):
+        self.model = yolo_model
+        self.batch_size = max(1, batch_size)
+        self.videos: Deque[ScheduledVideo] = deque()
+        self.batches = 0
+
+    def __len__(self) -> int:
+        return len(self.videos)
+
+    def add(self, key: Any, session: DetectionSession) -> None:
+        """Ajoute une vidéo, servie dès le prochain lot"""
+        self.videos.append(ScheduledVideo(key, session))
+
+    def keys(self) -> List[Any]:
+        """Clés des vidéos en cours"""
+        return [video.key for video in self.videos]
+
+    def cancel(self, key: Any) -> Outcome:
+        """Retire une vidéo annulée avant la fin de sa détection"""
+        video = next(video for video in self.videos if video.key == key)
+        return self._fail(video, DetectionError(409, "Traitement annulé"))
+
+    def step(self) -> List[Outcome]:
+        """
+        Lit, détecte et suit un lot partagé
+
+        Returns:
+            Vidéos terminées pendant ce lot : résultat (avec "scheduler") ou erreur.
+            Une erreur du modèle fait échouer toutes les vidéos du lot.
+        """
+        if not self.videos:
+            return []
+
+        quota = max(1, self.batch_size // len(self.videos))
+        imgsz = self.videos[0].session.imgsz
+        members = [video for video in self.videos if video.session.imgsz == imgsz][:self.batch_size]
+        concurrent = len(self.videos)
+        outcomes = []
+
+        # Frames de chaque vidéo, concaténés dans l'ordre de service
+        inputs, slices = [], []
+        for video in members:
+            try:
+                frames = video.session.read_batch(quota)
+            except Exception as exc:
+                outcomes.append(self._fail(video, exc))
+                continue
+            slices.append((video, len(inputs), len(inputs) + len(frames)))
+            inputs.extend(frames)
+
+        started = time.perf_counter()
+        try:
+            predictions = predict_batch(self.model, inputs, imgsz) if inputs else []
+        except Exception as exc:
+            return outcomes + [self._fail(video, exc) for video, _, _ in slices]
+        inference_seconds = time.perf_counter() - started
+        self.batches += 1
+
+        for video, start, end in slices:
+            # Temps d'inférence du lot réparti selon les frames de chaque vidéo
+            if inputs:
+                video.session.timings["inference"] += inference_seconds * (end - start) / len(inputs)
+            video.batches += 1
+            video.batch_videos += len(slices)
+            video.max_videos = max(video.max_videos, concurrent)
+            try:
+                video.session.complete_batch(predictions[start:end])
+            except Exception as exc:
+                outcomes.append(self._fail(video, exc))
+                continue
+            if video.session.done:
+                outcomes.append(self._finish(video))
+
+        # Tour suivant : la vidéo de tête passe en dernier
+        if self.videos:
+            self.videos.rotate(-1)
+        return outcomes
+
+    def close(self) -> None:
+        """Libère les vidéos encore en cours (arrêt du worker)"""
+        while self.videos:
+            self.videos.popleft().session.close()
+
+    def _finish(self, video: ScheduledVideo) -> Outcome:
+        self.videos.remove(video)
+        video.session.close()
+        try:
+            result = video.session.finish()
+        except Exception as exc:
+            return video.key, None, exc
+        result["scheduler"] = video.stats()
+        print(f"✓ Vidéo {video.key} terminée : {video.batches} lot(s) partagé(s), "
+              f"latence moyenne {result['scheduler']['latency_ms_mean']} ms")
+        return video.key, result, None
+
+    def _fail(self, video: ScheduledVideo, exc: Exception) -> Outcome:
+        self.videos.remove(video)
+        video.session.close()
+        return video.key, None, exc
@@ -0,0 +1,269 @@
+"""
+Modèles Pydantic du service IA VisionTrack
+Partagés entre l'API FastAPI et les processus workers
+"""
+
+from typing import Annotated, List, Optional, Tuple, Union
+
+from pydantic import BaseModel, Field
+
+# Coordonnée d'un sommet de zone polygonale (pixels du frame, jusqu'à la 8K)
+Coordinate = Annotated[float, Field(ge=0, le=8192)]
+
+
+class Zone(BaseModel):
+    """Modèle pour la zone d'analyse (rectangle)"""
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+
+
+class PolygonZone(BaseModel):
+    """Zone nommée de forme quelconque (polygone fermé, sommets en pixels)"""
+    name: str = Field(min_length=1, max_length=64)
+    points: List[Tuple[Coordinate, Coordinate]] = Field(min_length=3, max_length=64)
+
+
+class DetectRequest(BaseModel):
+    """Requête pour la détection"""
+    video_path: str
+    zone: Optional[Zone] = None
+    # Zones polygonales nommées (portes, allées...) : dessinées sur la vidéo annotée et
+    # incluses dans la région inférée ; le backend en calcule les statistiques
+    zones: Optional[List[PolygonZone]] = Field(default=None, max_length=32)
+    # Taille des lots d'inférence (INFERENCE_BATCH_SIZE du service si absent)
+    batch_size: Optional[int] = Field(default=None, ge=1, le=64)
+    # Détection uniquement sur la zone (+ marge) au lieu du frame entier (ZONE_CROP_ENABLED si absent)
+    crop_to_zone: Optional[bool] = None
+    zone_margin: Optional[int] = Field(default=None, ge=0)
+    # Générer la vidéo annotée (GENERATE_ANNOTATED_VIDEO_BY_DEFAULT si absent)
+    render_video: Optional[bool] = None
+    # Échantillonnage : un frame détecté sur frame_stride, ou cadence d'analyse visée
+    # (analysis_fps, prioritaire) ; FRAME_STRIDE / ANALYSIS_FPS du service si absents
+    frame_stride: Optional[int] = Field(default=None, ge=1, le=60)
+    analysis_fps: Optional[float] = Field(default=None, gt=0)
+    # Pas adaptatif selon l'activité de la scène (ADAPTIVE_STRIDE_ENABLED si absent)
+    adaptive_stride: Optional[bool] = None
+    # Sauter l'inférence sur les frames sans mouvement (MOTION_GATE_ENABLED si absent)
+    motion_gate: Optional[bool] = None
+    # Taille d'entrée réduite d'après la taille des personnes (ADAPTIVE_IMGSZ_ENABLED si absent)
+    adaptive_imgsz: Optional[bool] = None
+    # Segments traités en parallèle par les workers (CHUNK_SEGMENTS si absent, 0 = un par worker)
+    chunks: Optional[int] = Field(default=None, ge=0, le=64)
+
+
+class DetectionBox(BaseModel):
+    """Bounding box d'une détection"""
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    confidence: float
+    track_id: Optional[int] = None
+
+
+class FrameDetection(BaseModel):
+    """Détections pour un frame spécifique"""
+    frame: int
+    boxes: List[DetectionBox]
+
+
+class ImgszChange(BaseModel):
+    """Taille d'entrée retenue à l'issue d'une mesure (taille adaptative)"""
+    frame: int
+    imgsz: int
+    # Hauteur (pixels source) des petites personnes (10e centile), None sans personne mesurée
+    person_height: Optional[float] = None
+
+
+class SchedulerStats(BaseModel):
+    """Détection menée avec d'autres vidéos dans des lots partagés (SCHEDULER_MAX_VIDEOS > 1)"""
+    shared_batches: int
+    # Vidéos présentes en moyenne dans les lots de cette vidéo, et au plus en même temps
+    mean_batch_videos: float
+    max_concurrent_videos: int
+    # Délai entre le décodage d'un frame détecté et son passage au tracker (ms)
+    latency_ms_mean: float
+    latency_ms_p95: float
+    latency_ms_max: float
+    duration_seconds: float
+
+
+class StageTimings(BaseModel):
+    """Temps passé par étape du traitement (secondes)"""
+    # Décodage par le lecteur (thread lecteur si DECODE_PREFETCH_FRAMES > 0) ; attente du
+    # décodeur par la boucle de traitement (proche de 0 quand le décodage anticipé suffit)
+    decode: float = 0.0
+    decode_wait: float = 0.0
+    inference: float = 0.0
+    # Tracker, interpolation des frames sautés et agrégation des détections
+    tracking: float = 0.0
+    annotation: float = 0.0
+    encode: float = 0.0
+    total: float = 0.0
+
+
+class DetectionResponse(BaseModel):
+    """Réponse de détection"""
+    message: str
+    total_frames: int
+    fps: float
+    # Dimensions du frame (repère des coordonnées des boxes)
+    width: Optional[int] = None
+    height: Optional[int] = None
+    # Personnes détectées sur tout le frame (la zone ne filtre que la vidéo annotée)
+    detections: List[FrameDetection]
+    # None en mode détection seule (render_video=False)
+    annotated_video_path: Optional[str] = None
+    # Playlist HLS de la vidéo annotée (HLS_PACKAGING_ENABLED)
+    hls_playlist_path: Optional[str] = None
+    # Région réellement passée au modèle (zone + marge) si l'inférence est restreinte à la zone
+    inference_region: Optional[Zone] = None
+    # Frames réellement passés au modèle (les autres sont interpolés)
+    inferred_frames: Optional[int] = None
+    # Pas d'échantillonnage de base (1 = tous les frames)
+    frame_stride: int = 1
+    # Frames échantillonnés non détectés faute de mouvement (détections reconduites)
+    motion_skipped_frames: int = 0
+    # Taille d'entrée du modèle (dernière retenue en mode adaptatif) et ses changements
+    imgsz: Optional[int] = None
+    imgsz_changes: Optional[List[ImgszChange]] = None
+    # Lots partagés avec d'autres vidéos (ordonnanceur multi-vidéos), None sinon
+    scheduler: Optional[SchedulerStats] = None
+    timings: Optional[StageTimings] = None
+
+
+class RenderRequest(BaseModel):
+    """Requête de rendu de la vidéo annotée à partir de détections existantes"""
+    video_path: str
+    zone: Optional[Zone] = None
+    zones: Optional[List[PolygonZone]] = Field(default=None, max_length=32)
+    # Seules les boxes dont le centre est dans la zone (ou une zone polygonale) sont dessinées
+    detections: List[FrameDetection]
+
+
+class RenderResponse(BaseModel):
+    """Réponse de rendu"""
+    message: str
+    total_frames: int
+    annotated_video_path: str
+    hls_playlist_path: Optional[str] = None
+    timings: Optional[StageTimings] = None
+
+
+class StreamRequest(BaseModel):
+    """Requête d'analyse d'un flux en direct (RTSP, HTTP, caméra locale)"""
+    # URL du flux (rtsp://, http://, tcp://...), index ("0") ou périphérique (/dev/video0) de
+    # caméra, ou fichier local lu à sa cadence nominale (substitut de caméra pour les essais)
+    source: str = Field(min_length=1, max_length=2048)
+    zone: Optional[Zone] = None
+    # Zones polygonales nommées, comptées séparément dans les statistiques
+    zones: Optional[List[PolygonZone]] = Field(default=None, max_length=32)
+    batch_size: Optional[int] = Field(default=None, ge=1, le=64)
+    # Fenêtre glissante des statistiques (LIVE_WINDOW_SECONDS si absent)
+    window_seconds: Optional[float] = Field(default=None, ge=1, le=86400)
+    # Durée maximale de l'analyse (illimitée si absent, arrêt par DELETE /streams/{job_id})
+    max_duration: Optional[float] = Field(default=None, gt=0)
+
+
+class StreamZoneStats(BaseModel):
+    """Occupation d'une zone polygonale sur la fenêtre glissante"""
+    name: str
+    current_people: int
+    max_people: int
+    mean_people: float
+
+
+class StreamStats(BaseModel):
+    """Statistiques glissantes d'un flux en direct, publiées toutes les LIVE_STATS_INTERVAL secondes"""
+    sequence: int
+    timestamp: float
+    uptime_seconds: float
+    width: int
+    height: int
+    frames_read: int
+    frames_processed: int
+    # Frames abandonnés faute de pouvoir les détecter à temps
+    frames_dropped: int
+    source_fps: float
+    processing_fps: float
+    # Âge moyen des frames à la fin du tracking (retard sur le direct)
+    latency_ms: Optional[float] = None
+    reconnections: int
+    window_seconds: float
+    samples: int
+    current_people: int
+    max_people: int
+    mean_people: float
+    # Personnes suivies distinctes dans la fenêtre et depuis le début
+    tracks: int
+    total_tracks: int
+    zones: List[StreamZoneStats] = []
+
+
+class StreamResponse(BaseModel):
+    """Bilan d'une analyse en direct terminée"""
+    message: str
+    source: str
+    # stopped (DELETE), max_duration, ended (fin du fichier), disconnected (reconnexions épuisées)
+    stop_reason: str
+    duration_seconds: float
+    fps: float
+    width: int
+    height: int
+    frames_read: int
+    frames_processed: int
+    frames_dropped: int
+    reconnections: int
+    total_tracks: int
+    last_stats: StreamStats
+
+
+class JobProgress(BaseModel):
+    """Progression d'un job (frames traités)"""
+    frame: int = 0
+    total_frames: int = 0
+    percent: float = 0.0
+
+
+class JobError(BaseModel):
+    """Erreur d'un job échoué (code HTTP équivalent + message)"""
+    status_code: int
+    detail: str
+
+
+class JobSubmission(BaseModel):
+    """Réponse à la soumission d'un job"""
+    job_id: str
+    status: str
+    queue_position: int
+
+
+class JobStatus(BaseModel):
+    """État complet d'un job"""
+    job_id: str
+    kind: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    worker: Optional[int] = None
+    progress: JobProgress
+    result: Optional[Union[DetectionResponse, RenderResponse, StreamResponse]] = None
+    error: Optional[JobError] = None
+    # Flux en direct : dernières statistiques publiées
+    live: Optional[StreamStats] = None
+
+
+class QueueStatus(BaseModel):
+    """État de la file d'attente et du pool de workers"""
+    workers: int
+    workers_alive: int
+    workers_busy: int
+    queued: int
+    running: int
+    queue_capacity: int
+    # Flux en direct en cours (chacun occupe un worker) et maximum accepté
+    streams: int = 0
+    stream_capacity: int = 0
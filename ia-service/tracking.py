@@ -0,0 +1,90 @@
+"""
+Tracking ByteTrack découplé de l'inférence YOLO
+Permet d'exécuter la détection par lots (batch) tout en alimentant le tracker
+frame par frame, dans l'ordre, exactement comme le fait model.track()
+"""
+
+import numpy as np
+from ultralytics.trackers.basetrack import BaseTrack
+from ultralytics.trackers.track import TRACKER_MAP
+from ultralytics.utils import IterableSimpleNamespace, yaml_load
+from ultralytics.utils.checks import check_yaml
+
+from config import TRACKER_CONFIG
+
+# Colonnes du tableau de détections renvoyé par update_tracker
+# [x1, y1, x2, y2, confidence, class_id, track_id]  (track_id = -1 si non suivi)
+TRACK_COLUMNS = 7
+NO_TRACK_ID = -1
+
+
+def create_tracker(tracker_config: str = TRACKER_CONFIG, frame_rate: int = 30):
+    """
+    Crée un tracker indépendant pour une vidéo
+
+    Ultralytics instancie ses trackers avec frame_rate=30 quel que soit le FPS
+    réel : on conserve cette valeur par défaut pour garder les mêmes track_ids.
+
+    Ultralytics tire les track_ids d'un compteur global au processus
+    (BaseTrack._count), remis à zéro par chaque nouveau tracker : chaque tracker
+    garde ici son propre compteur (track_id_count), installé le temps de ses
+    mises à jour (update_tracker). Plusieurs vidéos suivies dans le même worker
+    (ordonnanceur multi-vidéos) numérotent ainsi leurs tracks indépendamment.
+    """
+    cfg = IterableSimpleNamespace(**yaml_load(check_yaml(tracker_config)))
+    if cfg.tracker_type not in TRACKER_MAP:
+        raise ValueError(f"Tracker non supporté : {cfg.tracker_type}")
+    tracker = TRACKER_MAP[cfg.tracker_type](args=cfg, frame_rate=frame_rate)
+    tracker.track_id_count = 0
+    return tracker
+
+
+def stride_frame_rate(stride: int) -> int:
+    """Cadence réellement analysée avec un pas d'échantillonnage (sur la base de 30 de create_tracker)"""
+    return max(1, round(30 / max(1, stride)))
+
+
+def set_tracker_frame_rate(tracker, frame_rate: int) -> None:
+    """
+    Règle la mémoire des tracks perdus sur une nouvelle cadence analysée (pas adaptatif)
+
+    Même calcul que le constructeur BYTETracker ; les tracks en cours sont conservés.
+    """
+    tracker.max_time_lost = int(frame_rate / 30.0 * tracker.args.track_buffer)
+
+
+def empty_detections() -> np.ndarray:
+    return np.zeros((0, TRACK_COLUMNS), dtype=np.float32)
+
+
+def update_tracker(tracker, boxes, frame: np.ndarray) -> np.ndarray:
+    """
+    Associe les détections d'un frame aux tracks existants
+
+    Reproduit on_predict_postprocess_end d'Ultralytics : le tracker n'est pas
+    mis à jour sur un frame sans détection, et si aucun track n'est confirmé
+    les détections sont conservées sans track_id.
+
+    Args:
+        tracker: Tracker créé par create_tracker
+        boxes: Boxes Ultralytics du frame (converties en numpy)
+        frame: Image BGR du frame (utilisée par la compensation de mouvement BoT-SORT)
+
+    Returns:
+        Tableau (N, 7) : x1, y1, x2, y2, confidence, class_id, track_id
+    """
+    if len(boxes) == 0:
+        return empty_detections()
+
+    # Compteur de track_ids propre au tracker (voir create_tracker)
+    BaseTrack._count = tracker.track_id_count
+    try:
+        tracks = tracker.update(boxes, frame)
+    finally:
+        tracker.track_id_count = BaseTrack._count
+    if len(tracks) == 0:
+        untracked = np.full((len(boxes), 1), NO_TRACK_ID, dtype=np.float32)
+        return np.hstack([boxes.xyxy, boxes.conf[:, None], boxes.cls[:, None], untracked]).astype(np.float32)
+
+    # Colonnes Ultralytics : x1, y1, x2, y2, track_id, score, cls, idx
+    return tracks[:, [0, 1, 2, 3, 5, 6, 4]].astype(np.float32)